@@ -3,6 +3,10 @@ import dash_bootstrap_components as dbc
 from authentication import login_page
 from dashboard import dashboard_page
 from frontend.callback import register_callbacks
+from backend.telemetry import configure_logging
+
+# Phase and solver telemetry as JSON lines; job workers re-import this module, so they log too
+configure_logging()
 
 # Initialize the Dash app
 app = Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.DARKLY])
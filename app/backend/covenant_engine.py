@@ -0,0 +1,122 @@
+# Description: Vectorized evaluation of asset covenants over whole loan tapes.
+
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from backend.models import Facility, AssetCovenant
+
+# Mirrors AssetCovenant._helper; unknown operators never match
+_OPS = {
+    '==': np.equal,
+    '!=': np.not_equal,
+    '<=': np.less_equal,
+    '>=': np.greater_equal,
+}
+
+
+class CompatibilityMatrix:
+    """Bit-packed loan x facility compatibility, one packed row per facility."""
+
+    def __init__(self, packed: np.ndarray, num_loans: int):
+        self.packed = packed
+        self.num_loans = num_loans
+        self.num_facilities = packed.shape[0]
+
+    @classmethod
+    def from_masks(cls, masks: List[np.ndarray], num_loans: int) -> "CompatibilityMatrix":
+        if not masks:
+            return cls(np.zeros((0, (num_loans + 7) // 8), dtype=np.uint8), num_loans)
+        return cls(np.packbits(np.vstack(masks), axis=1), num_loans)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.num_loans, self.num_facilities
+
+    @property
+    def nnz(self) -> int:
+        return int(np.unpackbits(self.packed, axis=1, count=self.num_loans).sum())
+
+    def facility_mask(self, j: int) -> np.ndarray:
+        """Boolean mask of the loans facility j accepts."""
+        return np.unpackbits(self.packed[j], count=self.num_loans).astype(bool)
+
+    def to_dense(self, dtype=np.float64) -> np.ndarray:
+        """Dense (num_loans, num_facilities) 0/1 matrix, float like the original asset_acc_matrix."""
+        return np.unpackbits(self.packed, axis=1, count=self.num_loans).T.astype(dtype)
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Loan and facility indices of every compatible pair, ordered by loan."""
+        return np.nonzero(np.unpackbits(self.packed, axis=1, count=self.num_loans).T)
+
+    def take(self, rows: np.ndarray) -> "CompatibilityMatrix":
+        """Compatibility of a subset of the loans (index array), in the given order."""
+        rows = np.asarray(rows)
+        unpacked = np.unpackbits(self.packed, axis=1, count=self.num_loans)[:, rows]
+        return CompatibilityMatrix(np.packbits(unpacked, axis=1), len(rows))
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype)
+
+
+class _ColumnCache:
+    """Pulls each loan column out of the source once, as a NumPy array."""
+
+    def __init__(self, loans: Any):
+        self.loans = loans
+        self.columns: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, prop: str) -> np.ndarray:
+        if prop not in self.columns:
+            self.columns[prop] = np.asarray(self.loans[prop])
+        return self.columns[prop]
+
+
+def _compare(column: np.ndarray, op: str, val: Any) -> np.ndarray:
+    if op not in _OPS:
+        return np.zeros(len(column), dtype=bool)
+    return np.asarray(_OPS[op](column, val), dtype=bool)
+
+
+def _covenant_key(covenant: AssetCovenant) -> Tuple:
+    return (covenant.constr_prop, covenant.constr_op, covenant.constr_val,
+            tuple(covenant.crit_prop), tuple(covenant.crit_op), tuple(covenant.crit_val))
+
+
+def asset_covenant_mask(covenant: AssetCovenant, columns: Any) -> np.ndarray:
+    """Vectorized AssetCovenant.asset_check over every loan in `columns`."""
+    constr = _compare(columns[covenant.constr_prop], covenant.constr_op, covenant.constr_val)
+    applies = np.ones(len(constr), dtype=bool)
+    for prop, op, val in zip(covenant.crit_prop, covenant.crit_op, covenant.crit_val):
+        applies &= _compare(columns[prop], op, val)
+    # Loans outside the criteria are unconstrained by this covenant
+    return constr | ~applies
+
+
+def facility_asset_mask(facility: Facility, columns: Any, num_loans: int,
+                        cache: Dict[Tuple, np.ndarray] = None) -> np.ndarray:
+    """Vectorized Facility.asset_check: loans passing all of a facility's asset covenants."""
+    mask = np.ones(num_loans, dtype=bool)
+    for covenant in facility.asset_covenants:
+        key = _covenant_key(covenant)
+        if cache is None or key not in cache:
+            covenant_mask = asset_covenant_mask(covenant, columns)
+            if cache is not None:
+                cache[key] = covenant_mask
+        else:
+            covenant_mask = cache[key]
+        mask &= covenant_mask
+    return mask
+
+
+def build_compatibility_matrix(loans: Any, facilities: List[Facility]) -> CompatibilityMatrix:
+    """
+    Build the loan x facility compatibility matrix in bulk.
+
+    `loans` is anything that returns a column for `loans[prop]`, e.g. a DataFrame.
+    Identical covenants shared between facilities are evaluated only once.
+    """
+    columns = _ColumnCache(loans)
+    num_loans = len(loans)
+    cache = {}
+    masks = [facility_asset_mask(facility, columns, num_loans, cache) for facility in facilities]
+    return CompatibilityMatrix.from_masks(masks, num_loans)
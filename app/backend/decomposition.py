@@ -0,0 +1,95 @@
+# Description: Helpers for solving a large loan pool in batches against residual covenant headroom.
+
+from typing import Any, Dict, List
+import numpy as np
+from backend.loan_book import LoanBook
+from backend.models import Facility
+from backend.solvers import HighsBackend
+
+
+def _order_by_objective(loans: LoanBook, steps: List[Dict], seed: int) -> np.ndarray:
+    # Most valuable loans for the first loan-level objective come first
+    for step in steps:
+        if step['Input'] != 'facility_cost':
+            values = np.nan_to_num(np.asarray(loans[step['Input']], dtype=float))
+            if step['Type'] == 'Max':
+                values = -values
+            return np.argsort(values, kind='stable')
+    return np.arange(len(loans))
+
+
+def _order_as_input(loans: LoanBook, steps: List[Dict], seed: int) -> np.ndarray:
+    return np.arange(len(loans))
+
+
+def _order_random(loans: LoanBook, steps: List[Dict], seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).permutation(len(loans))
+
+
+BATCH_ORDERS = {
+    'objective': _order_by_objective,
+    'input': _order_as_input,
+    'random': _order_random,
+}
+
+
+def make_batches(loans: LoanBook, steps: List[Dict], batch_size: int,
+                 batch_order: str = 'objective', seed: int = 0) -> List[np.ndarray]:
+    """Loan indices of each batch, following one of the BATCH_ORDERS policies."""
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    order = BATCH_ORDERS[batch_order](loans, steps, seed)
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def take_loans(asset_acc_matrix: Any, rows: np.ndarray) -> Any:
+    """Compatibility rows of a batch, from a CompatibilityMatrix or dense 0/1 matrix."""
+    if hasattr(asset_acc_matrix, 'take'):
+        return asset_acc_matrix.take(rows)
+    return np.asarray(asset_acc_matrix)[rows]
+
+
+def working_facilities(facilities: List[Facility]) -> List[Facility]:
+    """
+    Copies of the facilities whose pool covenants can absorb batch assignments
+    without touching the originals; asset covenants are shared.
+    """
+    copies = []
+    for facility in facilities:
+        copy = Facility(facility.facility_id, facility.facility_cost, facility.facility_size)
+        copy.asset_covenants = facility.asset_covenants
+        copy.pool_covenants = [covenant.take(slice(None)) for covenant in facility.pool_covenants]
+        copies.append(copy)
+    return copies
+
+
+def batch_facilities(working: List[Facility], rows: np.ndarray, used: np.ndarray) -> List[Facility]:
+    """
+    Facilities restricted to one batch. Covenants carry the residual headroom left by
+    earlier batches, and facilities already in use have no further facility cost.
+    """
+    batch = []
+    for j, facility in enumerate(working):
+        copy = Facility(facility.facility_id, 0 if used[j] else facility.facility_cost, facility.facility_size)
+        copy.asset_covenants = facility.asset_covenants
+        copy.pool_covenants = [covenant.take(rows) for covenant in facility.pool_covenants]
+        batch.append(copy)
+    return batch
+
+
+def lp_relaxation_bound(loans: LoanBook, facilities: List[Facility], asset_acc_matrix: Any,
+                        step: Dict, formulation: str = 'standard') -> float:
+    """Optimal value of the monolithic LP relaxation for one objective, or None if unsolved."""
+    relaxation = HighsBackend("LP_bound", loans, facilities, asset_acc_matrix, relaxed=True,
+                              formulation=formulation)
+    relaxation.set_objective(step['Type'], step['Input'])
+    relaxation.optimize()
+    return relaxation.objective_value if relaxation.is_optimal else None
+
+
+def bound_gap(value: float, bound: float, objective_type: str) -> float:
+    """Relative distance of a batched objective value from the LP bound (0 is optimal)."""
+    if value is None or bound is None:
+        return None
+    difference = bound - value if objective_type == 'Max' else value - bound
+    return max(difference, 0.0) / max(abs(bound), 1e-9)
@@ -1,5 +1,9 @@
+import logging
+import numpy as np
 import pandas as pd
-from backend.models import Loan
+from backend.loan_book import LoanBook, LOAN_FIELDS
+
+logger = logging.getLogger("loan_optimizer.existing_loans")
 
 def load_existing_loans(facilities, existing_loans_df):
     """Load existing loans from CSV into facilities, assigning based on facility_id."""
@@ -10,71 +14,40 @@ def load_existing_loans(facilities, existing_loans_df):
         if len(existing_loans_df) == 0:  # Check if the file is empty
             return
 
-        # Columns required to instantiate the Loan class
-        required_columns = [
-            'LOAN_ID', 'ORIG_CHN', 'SELLER', 'orig_rt', 'orig_amt', 'orig_trm',
-            'orig_date', 'first_pay', 'oltv', 'ocltv', 'num_bo', 'dti',
-            'CSCORE_B', 'CSCORE_C', 'FTHB_FLG', 'purpose', 'PROP_TYP',
-            'NUM_UNIT', 'occ_stat', 'state', 'zip_3', 'mi_pct', 'prod_type',
-            'MI_TYPE', 'relo_flg'
-        ]
-
-        for _, row in existing_loans_df.iterrows():
-            # Extract facility_id and loan data
-            facility_id = row['facility_id']
-            loan_data = {key: row[key] for key in required_columns}
+        # One columnar book for the whole file, split by facility_id
+        book = LoanBook.from_frame(existing_loans_df)
+        facility_ids = pd.to_numeric(existing_loans_df['facility_id'], errors='coerce').to_numpy()
 
-            # Create Loan object
-            loan = Loan(**loan_data)
+        for facility_id, facility in enumerate(facilities):
+            rows = np.flatnonzero(facility_ids == facility_id)
+            if len(rows):
+                facility.add_existing_loans(book.take(rows))
 
-            # Assign the loan to the appropriate facility
-            if facility_id < len(facilities):
-                facilities[facility_id].add_existing_loans([loan])
-                
     except Exception as e:
-        print(f"Error loading existing loans: {str(e)}")
-        
+        logger.error("Error loading existing loans: %s", e)
+
+def new_assignments_frame(assignments, new_loans):
+    """The assigned new loans alone, in the combined format (facility_id first)."""
+    pairs = np.asarray(assignments, dtype=np.int64).reshape(-1, 2)
+    frame = new_loans.take(pairs[:, 0]).to_frame()
+    frame.insert(0, 'facility_id', pairs[:, 1])
+    return frame
+
 def update_existing_loans_csv(facilities, existing_loans_df):
     """Update existing loans CSV by appending new loans while preserving existing ones."""
-    
-    existing_data = existing_loans_df.to_dict('records')
+
     # Collect all current loans from facilities
-    new_data = []
+    frames = []
     for facility_id, facility in enumerate(facilities):
-        for loan in facility.existing_loans:
-            loan_dict = {
-                'facility_id': facility_id,
-                'LOAN_ID': loan.LOAN_ID,
-                'ORIG_CHN': loan.ORIG_CHN,
-                'SELLER': loan.SELLER,
-                'orig_rt': loan.orig_rt,
-                'orig_amt': loan.orig_amt,
-                'orig_trm': loan.orig_trm,
-                'orig_date': loan.orig_date,
-                'first_pay': loan.first_pay,
-                'oltv': loan.oltv,
-                'ocltv': loan.ocltv,
-                'num_bo': loan.num_bo,
-                'dti': loan.dti,
-                'CSCORE_B': loan.CSCORE_B,
-                'CSCORE_C': loan.CSCORE_C,
-                'FTHB_FLG': loan.FTHB_FLG,
-                'purpose': loan.purpose,
-                'PROP_TYP': loan.PROP_TYP,
-                'NUM_UNIT': loan.NUM_UNIT,
-                'occ_stat': loan.occ_stat,
-                'state': loan.state,
-                'zip_3': loan.zip_3,
-                'mi_pct': loan.mi_pct,
-                'prod_type': loan.prod_type,
-                'MI_TYPE': loan.MI_TYPE,
-                'relo_flg': loan.relo_flg,
-            }
-            new_data.append(loan_dict)
+        if len(facility.existing_loans):
+            frame = facility.existing_loans.to_frame()
+            frame.insert(0, 'facility_id', facility_id)
+            frames.append(frame)
 
     # Combine existing and new data
-    
-    combined_df = pd.DataFrame(new_data)
+    if not frames:
+        return pd.DataFrame(columns=['facility_id'] + LOAN_FIELDS)
+    combined_df = pd.concat(frames, ignore_index=True)
 
     # Write the updated DataFrame to the CSV file
-    return combined_df
\ No newline at end of file
+    return combined_df
@@ -0,0 +1,154 @@
+# Description: Parsed, cached expression language for the pool covenant `a` and `b` columns.
+#
+# Expressions are written against `random_df`, the loan table, e.g.
+#     random_df['CSCORE_B'].to_list()
+#     ((random_df['state']=='CA')*(random_df['orig_amt'])).to_list()
+#     [1]*len(random_df)
+# and are compiled once into NumPy code. Only column lookups, constants, arithmetic,
+# comparisons, `&`/`|`/`~`, `len(random_df)`, `[value]*n` (n at most the number of loans)
+# and `.to_list()` are allowed.
+
+import ast
+from functools import lru_cache
+from typing import Any, Callable, Dict
+import numpy as np
+import pandas as pd
+
+TABLE_NAME = 'random_df'
+
+_BINOPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.BitAnd: np.bitwise_and,
+    ast.BitOr: np.bitwise_or,
+}
+
+_CMPOPS = {
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+}
+
+# Methods that only convert a column between pandas, NumPy and list form
+_CONVERSIONS = ('to_list', 'tolist', 'to_numpy')
+
+
+class ExpressionError(ValueError):
+    """An expression uses syntax outside the covenant expression language."""
+
+
+class ColumnTable:
+    """Column access over a loan table, each column converted to a NumPy array once."""
+
+    def __init__(self, source: Any, rows: np.ndarray = None, parent: "ColumnTable" = None):
+        self.source = source
+        self.rows = rows
+        self.parent = parent
+        self.columns: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self.columns:
+            column = self.parent[name] if self.parent is not None else np.asarray(self.source[name])
+            self.columns[name] = column if self.rows is None else column[self.rows]
+        return self.columns[name]
+
+    def __len__(self):
+        return len(self.source) if self.rows is None else len(self.rows)
+
+    def take(self, rows: np.ndarray) -> "ColumnTable":
+        """Table of a subset of rows; columns are sliced from this table's arrays."""
+        return ColumnTable(self.source, rows, parent=self)
+
+
+def group_by_facility(existing_loans_df: pd.DataFrame) -> Dict[Any, ColumnTable]:
+    """One ColumnTable per facility_id, from a single group-by over the existing loans."""
+    base = ColumnTable(existing_loans_df)
+    groups = existing_loans_df.groupby('facility_id', sort=False).indices
+    return {facility_id: base.take(rows) for facility_id, rows in groups.items()}
+
+
+def _is_table(node: ast.AST) -> bool:
+    return isinstance(node, ast.Name) and node.id == TABLE_NAME
+
+
+def _compile(node: ast.AST) -> Callable[[Any], Any]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (bool, int, float, str)):
+        value = node.value
+        return lambda table: value
+
+    # random_df['column']
+    if isinstance(node, ast.Subscript) and _is_table(node.value):
+        key = node.slice
+        if isinstance(key, ast.Constant) and isinstance(key.value, str):
+            column = key.value
+            return lambda table: table[column]
+        raise ExpressionError("Columns must be selected with a string constant")
+
+    if isinstance(node, ast.Call) and not node.keywords:
+        # len(random_df)
+        if isinstance(node.func, ast.Name) and node.func.id == 'len' and len(node.args) == 1 and _is_table(node.args[0]):
+            return lambda table: len(table)
+        # <expr>.to_list()
+        if isinstance(node.func, ast.Attribute) and node.func.attr in _CONVERSIONS and not node.args:
+            return _compile(node.func.value)
+
+    if isinstance(node, ast.BinOp):
+        # [value] * n and n * [value]
+        if isinstance(node.op, ast.Mult) and (isinstance(node.left, ast.List) or isinstance(node.right, ast.List)):
+            items, count = (node.left, node.right) if isinstance(node.left, ast.List) else (node.right, node.left)
+            if len(items.elts) != 1:
+                raise ExpressionError("List repetition needs a single-element list")
+            value, times = _compile(items.elts[0]), _compile(count)
+
+            def repeat(table):
+                # At most one value per loan, so an expression cannot allocate beyond its table
+                repeats = int(times(table))
+                if not 0 <= repeats <= len(table):
+                    raise ExpressionError(f"List repetition of {repeats} exceeds the {len(table)} loans")
+                return np.full(repeats, value(table))
+
+            return repeat
+        if type(node.op) in _BINOPS:
+            op, left, right = _BINOPS[type(node.op)], _compile(node.left), _compile(node.right)
+            return lambda table: op(left(table), right(table))
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand)
+        if isinstance(node.op, ast.USub):
+            return lambda table: np.negative(operand(table))
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        if isinstance(node.op, ast.Invert):
+            return lambda table: np.invert(operand(table))
+
+    if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in _CMPOPS:
+        op, left, right = _CMPOPS[type(node.ops[0])], _compile(node.left), _compile(node.comparators[0])
+        return lambda table: op(left(table), right(table))
+
+    raise ExpressionError(f"Unsupported expression syntax: {ast.unparse(node)}")
+
+
+@lru_cache(maxsize=None)
+def compile_expression(text: str) -> Callable[[Any], np.ndarray]:
+    """
+    Compile an expression once; the result maps a loan table to a float array with
+    one value per loan. Compiled expressions are cached by their text.
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {text}") from e
+    body = _compile(tree.body)
+
+    def evaluate(table: Any) -> np.ndarray:
+        result = np.asarray(body(table), dtype=float)
+        if result.ndim == 0:
+            result = np.full(len(table), float(result))
+        return result
+
+    return evaluate
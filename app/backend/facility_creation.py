@@ -1,6 +1,11 @@
+import logging
 from typing import List, Dict, Any
 import pandas as pd
 from backend.models import Facility, AssetCovenant, PoolCovenant
+from backend.expressions import ColumnTable, compile_expression, group_by_facility
+from backend import telemetry
+
+logger = logging.getLogger("loan_optimizer.facilities")
 
 def clean_string(s):
     """Clean quoted strings from CSV."""
@@ -12,34 +17,47 @@ def clean_string(s):
     return s
 
 def evaluate_expression(expr, random_df):
-    """Safely evaluate expressions that may contain DataFrame operations."""
+    """Evaluate a covenant expression to one value per loan in random_df (a table or ColumnTable)."""
     if pd.isna(expr):
         return None
     try:
-        # For any expression containing random_df
-        if isinstance(expr, str):
-            return eval(expr, {'random_df': random_df})
-        # For numeric values
+        table = random_df if isinstance(random_df, ColumnTable) else ColumnTable(random_df)
+        # Numeric values apply to every loan
         if isinstance(expr, (int, float)):
-            return expr
-        return expr
+            expr = repr(expr)
+        return compile_expression(str(expr))(table)
     except Exception as e:
-        print(f"Error evaluating expression: {expr}")
-        print(f"Error details: {str(e)}")
+        logger.error("Error evaluating expression %s: %s", expr, e)
         return None
 
-def create_facilities_from_config(config_df, existing_loans_df, random_df: pd.DataFrame) -> Dict[str, Any]:
+@telemetry.phase("facility_creation")
+def create_facilities_from_config(config_df, existing_loans_df, random_df: Any) -> Dict[str, Any]:
     """
     Creates facilities from a configuration file with support for various expression types.
     """
     # Read the configuration file
     existing_loans_df = existing_loans_df.dropna(subset=[existing_loans_df.columns[0]])
 
+    # Column tables for the new loans and, grouped once, the existing loans of each facility
+    new_table = ColumnTable(random_df)
+    existing_tables = group_by_facility(existing_loans_df) if len(existing_loans_df) > 0 else {}
+    evaluated = {}
+
+    def evaluate_cached(expr, table_key, table):
+        # Covenants repeat the same expressions across facilities
+        key = (expr, table_key)
+        if key not in evaluated:
+            evaluated[key] = evaluate_expression(expr, table)
+        return evaluated[key]
+
+    # Largest facility_space per facility, for rows that leave it blank
+    max_space = config_df.groupby('Number')["facility_space"].max()
+
     # Initialize dictionary to store facilities
     facilities = {}
 
     # Process each row in the configuration
-    for _, row in config_df.iterrows():
+    for row in config_df.to_dict('records'):
         command = row['Command']
         cost = row['Cost']
         facility_num = row['Number']
@@ -47,7 +65,7 @@ def create_facilities_from_config(config_df, existing_loans_df, random_df: pd.Da
         facility_size = row["facility_space"]
         
         if pd.isna(facility_size):
-            facility_size = config_df[config_df['Number'] == facility_num]["facility_space"].max(skipna=True)
+            facility_size = max_space.get(facility_num)
             if pd.isna(facility_size):  # If facility_size is still NaN, assign a default value (e.g., 0)
                 facility_size = 0
 
@@ -66,7 +84,7 @@ def create_facilities_from_config(config_df, existing_loans_df, random_df: pd.Da
                 # Handle critical properties if they exist
                 crit_prop = [] if pd.isna(row['crit_prop']) else row['crit_prop'].split(',')
                 crit_op = [] if pd.isna(row['crit_op']) else row['crit_op'].split(',')
-                crit_val = [] if pd.isna(row['crit_val']) else [float(x) for x in row['crit_val'].split(',')]
+                crit_val = [] if pd.isna(row['crit_val']) else [float(x) for x in str(row['crit_val']).split(',')]
 
                 covenant = AssetCovenant(
                     constr_prop=constr_prop,
@@ -82,8 +100,8 @@ def create_facilities_from_config(config_df, existing_loans_df, random_df: pd.Da
             # Check if we have the necessary parameters
             if pd.notna(row['a']) and pd.notna(row['b']) and pd.notna(row['c']):
                 # Directly evaluate whatever expressions are in the a and b columns
-                a_param = evaluate_expression(row['a'], random_df)
-                b_param = evaluate_expression(row['b'], random_df)
+                a_param = evaluate_cached(row['a'], None, new_table)
+                b_param = evaluate_cached(row['b'], None, new_table)
 
                 if a_param is not None and b_param is not None:
                     # Handle NaN values for constr_type and constr_op
@@ -98,9 +116,10 @@ def create_facilities_from_config(config_df, existing_loans_df, random_df: pd.Da
                         constr_op=constr_op
                     )
 
-                    if len(existing_loans_df) > 0:
-                        a_e = evaluate_expression(row['a'], existing_loans_df[existing_loans_df['facility_id']==facility_num])
-                        b_e = evaluate_expression(row['b'], existing_loans_df[existing_loans_df['facility_id']==facility_num])
+                    if facility_num in existing_tables:
+                        existing_table = existing_tables[facility_num]
+                        a_e = evaluate_cached(row['a'], facility_num, existing_table)
+                        b_e = evaluate_cached(row['b'], facility_num, existing_table)
                         covenant.update_params(a_new=a_e,b_new=b_e)
 
                     facilities[facility_name].add_pool_covenants(covenant)
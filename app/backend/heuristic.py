@@ -0,0 +1,90 @@
+# Description: Greedy loan allocator, used as a fast preview and as a MIP start.
+
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from backend.loan_book import LoanBook
+from backend.models import Facility
+from backend.model_builder import build_assignment_problem
+
+# Covenant rows may be filled up to their RHS plus this much
+FEASIBILITY_TOL = 1e-6
+
+
+def loan_priority(loans: LoanBook, optimization_steps: List[Dict]) -> np.ndarray:
+    """Loan indices, best first by the loan-level objectives in their given order."""
+    keys = []
+    for step in optimization_steps:
+        if step['Input'] == 'facility_cost':
+            continue
+        values = np.asarray(loans[step['Input']], dtype=float)
+        values = -values if step['Type'] == 'Max' else values
+        keys.append(np.where(np.isnan(values), np.inf, values))
+    if not keys:
+        return np.arange(len(loans))
+    # np.lexsort sorts by the last key first
+    return np.lexsort(keys[::-1])
+
+
+def greedy_allocate(
+    loans: LoanBook,
+    facilities: List[Facility],
+    asset_acc_matrix: Any,
+    optimization_steps: List[Dict]
+) -> Tuple[List[Tuple[int, int]], bool]:
+    """
+    Assign loans one at a time in priority order, each to the first compatible facility
+    whose pool covenants still have headroom for it. With a facility_cost objective,
+    facilities already in use come first, then the cheapest.
+
+    Returns the (loan, facility) pairs ordered by loan and whether every pool covenant
+    holds; covenants the existing book already breaks can stay broken.
+    """
+    problem = build_assignment_problem(len(loans), facilities, asset_acc_matrix)
+    coefficients = problem.covenant_matrix.tocsc()
+    slack = problem.covenant_rhs.copy()
+
+    uses_cost = any(step['Input'] == 'facility_cost' for step in optimization_steps)
+    costs = np.array([float(facility.facility_cost) for facility in facilities])
+    used = np.zeros(len(facilities), dtype=bool)
+
+    # Variables are ordered by loan, so each loan's candidates are one contiguous slice
+    bounds = np.searchsorted(problem.loan_idx, np.arange(len(loans) + 1))
+    assignments = []
+    for i in loan_priority(loans, optimization_steps):
+        candidates = np.arange(bounds[i], bounds[i + 1])
+        if not len(candidates):
+            continue
+        if uses_cost:
+            facility = problem.facility_idx[candidates]
+            candidates = candidates[np.lexsort((costs[facility], ~used[facility]))]
+        for var in candidates:
+            rows = coefficients.indices[coefficients.indptr[var]:coefficients.indptr[var + 1]]
+            values = coefficients.data[coefficients.indptr[var]:coefficients.indptr[var + 1]]
+            # A loan may use up headroom, or only move a covenant towards feasibility
+            if np.all((values <= slack[rows] + FEASIBILITY_TOL) | (values <= 0)):
+                slack[rows] -= values
+                j = int(problem.facility_idx[var])
+                used[j] = True
+                assignments.append((int(i), j))
+                break
+
+    assignments.sort()
+    return assignments, bool(np.all(slack >= -FEASIBILITY_TOL))
+
+
+def objective_values(assignments: List[Tuple[int, int]], loans: LoanBook,
+                     facilities: List[Facility], optimization_steps: List[Dict]) -> List[float]:
+    """Value of every objective step for a given allocation."""
+    pairs = np.asarray(assignments, dtype=np.int64).reshape(-1, 2)
+    values = []
+    for step in optimization_steps:
+        if step['Input'] == 'facility_cost':
+            values.append(float(sum(float(facilities[j].facility_cost) for j in np.unique(pairs[:, 1]))))
+        else:
+            values.append(float(np.asarray(loans[step['Input']], dtype=float)[pairs[:, 0]].sum()))
+    return values
+
+
+def objective_gaps(heuristic_values: List[float], mip_values: List[float]) -> List[float]:
+    """Relative distance of each heuristic objective value from the MIP value."""
+    return [abs(mip - heuristic) / max(abs(mip), 1e-9) for heuristic, mip in zip(heuristic_values, mip_values)]
@@ -0,0 +1,226 @@
+# Description: Background jobs. Each optimization run gets its own worker process, so the
+# Dash server stays responsive, runs can be cancelled by terminating the worker or asked to
+# stop early with what they have, and finished results are kept in memory until they are
+# fetched or evicted.
+
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    job_id: str
+    target: Callable
+    args: tuple
+    kwargs: dict
+    status: str = QUEUED
+    phase: str = ''
+    submitted: float = 0.0
+    started: float = None
+    finished: float = None
+    result: Any = None
+    partial: Any = None
+    error: str = None
+    process: Any = None
+    stop_event: Any = None
+
+
+def _run_job(job_id: str, target: Callable, args: tuple, kwargs: dict, messages: Any, stop_event: Any):
+    """Worker process body: run the target, reporting phases, partial results and the outcome on `messages`."""
+    def progress(phase: str):
+        messages.put((job_id, 'phase', phase))
+
+    def publish(partial: Any):
+        messages.put((job_id, 'partial', partial))
+
+    try:
+        result = target(*args, progress=progress, publish=publish, stopped=stop_event.is_set, **kwargs)
+    except Exception as e:
+        traceback.print_exc()
+        messages.put((job_id, FAILED, str(e)))
+    else:
+        messages.put((job_id, DONE, result))
+
+
+class JobManager:
+    """
+    A process pool for optimization runs. At most `max_workers` jobs run at once, the
+    rest wait in submission order. Targets are called as
+    `target(*args, progress=..., publish=..., stopped=...)` in a fresh (spawned) process and
+    must be importable module-level functions; `publish` hands an intermediate result (e.g. a
+    preview) to status() while the job still runs, and `stopped()` turns true after stop().
+    """
+
+    def __init__(self, max_workers: int = 2, keep_finished: int = 20, poll_interval: float = 0.2):
+        self.max_workers = max_workers
+        self.keep_finished = keep_finished
+        self.poll_interval = poll_interval
+        self.context = multiprocessing.get_context('spawn')
+        self.messages = self.context.Queue()
+        self.jobs: Dict[str, Job] = OrderedDict()
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.monitor = threading.Thread(target=self._monitor, name="job-monitor", daemon=True)
+        self.monitor.start()
+
+    def submit(self, target: Callable, *args, **kwargs) -> str:
+        """Queue a job and return its id."""
+        job = Job(job_id=uuid.uuid4().hex[:12], target=target, args=args, kwargs=kwargs, submitted=time.time())
+        with self.lock:
+            self.jobs[job.job_id] = job
+            self.pending.append(job.job_id)
+            self._start_pending()
+        return job.job_id
+
+    def add_finished(self, result: Any) -> str:
+        """Record an already available result (e.g. from a cache) as a finished job."""
+        now = time.time()
+        job = Job(job_id=uuid.uuid4().hex[:12], target=None, args=(), kwargs={}, submitted=now, started=now)
+        with self.lock:
+            self.jobs[job.job_id] = job
+            self._finish(job, DONE, result=result)
+        return job.job_id
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        """Status, current phase, elapsed seconds, last published partial result and error message of a job."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return {'status': None, 'phase': '', 'elapsed': 0.0, 'partial': None, 'error': None}
+            start = job.started or job.submitted
+            return {
+                'status': job.status,
+                'phase': job.phase,
+                'elapsed': (job.finished or time.time()) - start,
+                'partial': job.partial,
+                'error': job.error,
+            }
+
+    def result(self, job_id: str) -> Any:
+        """Result of a finished job, or None."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return job.result if job is not None and job.status == DONE else None
+
+    def stop(self, job_id: str) -> bool:
+        """Ask a running job to finish early with what it has; unlike cancel, the job still returns a result."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != RUNNING:
+                return False
+            job.stop_event.set()
+            return True
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a queued job or terminate a running one."""
+        process = None
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            if job.status == QUEUED:
+                self.pending.remove(job_id)
+            else:
+                process = job.process
+                process.terminate()
+            self._finish(job, CANCELLED)
+            self._start_pending()
+        # Waiting for the worker to exit must not hold up the other callers
+        if process is not None:
+            process.join(timeout=5)
+        return True
+
+    def _finish(self, job: Job, status: str, result: Any = None, error: str = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished = time.time()
+        job.process = None
+        job.stop_event = None
+        # Keep only the most recent finished jobs
+        finished = [job_id for job_id, other in self.jobs.items() if other.status in FINISHED]
+        for job_id in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self.jobs[job_id]
+
+    def _running(self) -> int:
+        return sum(job.status == RUNNING for job in self.jobs.values())
+
+    def _start_pending(self):
+        while self.pending and self._running() < self.max_workers:
+            job = self.jobs[self.pending.popleft()]
+            job.stop_event = self.context.Event()
+            job.process = self.context.Process(
+                target=_run_job,
+                args=(job.job_id, job.target, job.args, job.kwargs, self.messages, job.stop_event),
+                daemon=True
+            )
+            job.process.start()
+            job.status = RUNNING
+            job.started = time.time()
+
+    def _handle(self, message: tuple):
+        job_id, kind, payload = message
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != RUNNING:
+                return
+            if kind == 'phase':
+                job.phase = payload
+                return
+            if kind == 'partial':
+                job.partial = payload
+                return
+            process = job.process
+        # The worker exits right after its outcome; wait for it outside the lock, so
+        # submit(), status(), stop() and cancel() are not held up meanwhile
+        process.join(timeout=5)
+        with self.lock:
+            if job.status == RUNNING:
+                self._finish(job, kind, result=payload if kind == DONE else None,
+                             error=payload if kind == FAILED else None)
+                self._start_pending()
+
+    def _drain(self):
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                return
+            self._handle(message)
+
+    def _reap(self):
+        """Fail the jobs whose worker died without reporting (e.g. killed), after handling what they did report."""
+        with self.lock:
+            dead = [job for job in self.jobs.values() if job.status == RUNNING and not job.process.is_alive()]
+        if dead:
+            self._drain()
+        with self.lock:
+            for job in dead:
+                if job.status == RUNNING:
+                    self._finish(job, FAILED, error=f"Worker exited with code {job.process.exitcode}")
+            self._start_pending()
+
+    def _monitor(self):
+        while True:
+            try:
+                message = self.messages.get(timeout=self.poll_interval)
+            except queue.Empty:
+                message = None
+            if message is not None:
+                self._handle(message)
+            self._reap()
@@ -0,0 +1,167 @@
+# Description: Columnar (struct-of-arrays) storage for loan tapes.
+
+from typing import Any, Dict, Iterable, Iterator, List
+import sys
+import numpy as np
+import pandas as pd
+
+# Loan fields and the column dtype each is stored as. Integer columns fall back to
+# float64 when the tape has missing values; string columns are object arrays whose
+# repeated values share one Python string.
+LOAN_COLUMNS = {
+    'LOAN_ID': 'str',
+    'ORIG_CHN': 'str',
+    'SELLER': 'str',
+    'orig_rt': 'float64',
+    'orig_amt': 'float64',
+    'orig_trm': 'int64',
+    'orig_date': 'str',
+    'first_pay': 'str',
+    'oltv': 'float64',
+    'ocltv': 'float64',
+    'num_bo': 'int64',
+    'dti': 'float64',
+    'CSCORE_B': 'int64',
+    'CSCORE_C': 'float64',
+    'FTHB_FLG': 'str',
+    'purpose': 'str',
+    'PROP_TYP': 'str',
+    'NUM_UNIT': 'int64',
+    'occ_stat': 'str',
+    'state': 'str',
+    'zip_3': 'int64',
+    'mi_pct': 'float64',
+    'prod_type': 'str',
+    'MI_TYPE': 'float64',
+    'relo_flg': 'str',
+}
+
+LOAN_FIELDS = list(LOAN_COLUMNS)
+
+
+def _to_column(values: Any, dtype: str) -> np.ndarray:
+    """Convert raw column values to the declared storage type."""
+    series = pd.Series(values).reset_index(drop=True)
+    if dtype == 'str':
+        codes, uniques = pd.factorize(series)
+        uniques = np.array([v if isinstance(v, str) else str(v) for v in uniques] + [None], dtype=object)
+        return uniques[codes]
+    numeric = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64')
+    if dtype == 'int64' and not np.isnan(numeric).any():
+        return numeric.astype('int64')
+    return numeric
+
+
+class LoanView:
+    """Read-only row view of a LoanBook, usable wherever a Loan is read."""
+    __slots__ = ('_book', '_row')
+
+    def __init__(self, book: "LoanBook", row: int):
+        self._book = book
+        self._row = row
+
+    def __getattr__(self, field):
+        if field.startswith('_'):
+            raise AttributeError(field)
+        try:
+            return self._book.columns[field][self._row]
+        except KeyError:
+            raise AttributeError(field) from None
+
+    def __repr__(self):
+        return f"LoanView(LOAN_ID={self.LOAN_ID!r})"
+
+
+class LoanBook:
+    """
+    A set of loans stored as one typed NumPy array per field.
+
+    Indexing with a field name returns that column, with an int a LoanView row, and
+    with a slice, index array or boolean mask a new LoanBook.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+        self._index = None
+
+    @classmethod
+    def empty(cls) -> "LoanBook":
+        return cls({field: np.empty(0, dtype=object if dtype == 'str' else dtype)
+                    for field, dtype in LOAN_COLUMNS.items()})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "LoanBook":
+        return cls({field: _to_column(df[field], dtype) for field, dtype in LOAN_COLUMNS.items()})
+
+    @classmethod
+    def from_loans(cls, loans: Iterable[Any]) -> "LoanBook":
+        records = [{field: getattr(loan, field) for field in LOAN_FIELDS} for loan in loans]
+        if not records:
+            return cls.empty()
+        return cls.from_frame(pd.DataFrame(records, columns=LOAN_FIELDS))
+
+    @classmethod
+    def concat(cls, books: List["LoanBook"]) -> "LoanBook":
+        books = [book for book in books if len(book)]
+        if not books:
+            return cls.empty()
+        if len(books) == 1:
+            return books[0]
+        # Columns every book has, e.g. the loan fields plus a tape's facility_id
+        shared = [column for column in books[0].columns if all(column in book.columns for book in books)]
+        columns = {}
+        for field in shared:
+            parts = [book.columns[field] for book in books]
+            if len({part.dtype for part in parts}) > 1:
+                parts = [part.astype('float64') for part in parts]
+            columns[field] = np.concatenate(parts)
+        return cls(columns)
+
+    def __len__(self):
+        return len(self.columns['LOAN_ID'])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError(key)
+            return LoanView(self, int(key))
+        return self.take(key)
+
+    def __iter__(self) -> Iterator[LoanView]:
+        return (LoanView(self, row) for row in range(len(self)))
+
+    def take(self, rows: Any) -> "LoanBook":
+        """Sub-book of the given rows (slice, index array or boolean mask)."""
+        return LoanBook({field: column[rows] for field, column in self.columns.items()})
+
+    def index_of(self, loan_id: Any) -> int:
+        """Row position of a LOAN_ID."""
+        if self._index is None:
+            self._index = {loan: row for row, loan in enumerate(self.columns['LOAN_ID'])}
+        return self._index[str(loan_id)]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columns, columns=list(self.columns))
+
+    @property
+    def nbytes(self) -> int:
+        """Array storage plus the distinct string objects the object columns point to."""
+        total = 0
+        for column in self.columns.values():
+            total += column.nbytes
+            if column.dtype == object:
+                total += sum(sys.getsizeof(v) for v in {id(v): v for v in column if v is not None}.values())
+        return total
+
+
+def as_loan_book(loans: Any) -> LoanBook:
+    """Accept a LoanBook, a loan DataFrame or a sequence of Loan objects."""
+    if isinstance(loans, LoanBook):
+        return loans
+    if isinstance(loans, pd.DataFrame):
+        return LoanBook.from_frame(loans)
+    return LoanBook.from_loans(loans)
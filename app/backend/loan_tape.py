@@ -0,0 +1,147 @@
+# Description: Chunked, schema-typed reading of loan tapes (CSV and Parquet) into LoanBooks.
+#
+# Columns are read with their declared types instead of inferred ones, so text fields
+# such as LOAN_ID keep their leading zeros, and each chunk is converted to columnar
+# storage as soon as it is read. Only the declared columns are kept.
+#
+# A tape is a path or an in-memory buffer (bytes, memoryview or a binary file object),
+# parsed without a copy to disk. Gzip and zstd compressed CSV tapes are decompressed
+# while they are read; the format is detected from the content, not the file name.
+
+import csv
+import gzip
+import io
+import os
+from contextlib import ExitStack, contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Tuple, Union
+import pandas as pd
+from backend.loan_book import LOAN_COLUMNS, LoanBook, _to_column
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet tapes need pyarrow; CSV tapes do not
+    pa = None
+    pq = None
+
+try:
+    import zstandard
+except ImportError:  # Only zstd-compressed tapes need zstandard
+    zstandard = None
+
+# A loan tape: a file path, the tape's bytes or a seekable binary file object
+TapeSource = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
+# Extra columns of the existing-loans file, read ahead of the loan fields
+EXISTING_LOAN_COLUMNS = {'facility_id': 'int64'}
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq', '.arrow', '.feather')
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+PARQUET_MAGIC = b'PAR1'
+
+
+class LoanTapeError(ValueError):
+    """A loan tape is missing declared columns or is in an unsupported format."""
+
+
+def tape_schema(extra_columns: Dict[str, str] = None) -> Dict[str, str]:
+    """Declared storage type of every column to read, extra columns first."""
+    return {**(extra_columns or {}), **LOAN_COLUMNS}
+
+
+def _read_dtype(dtype: str):
+    # Integer columns are read as float so missing values do not fail the chunk;
+    # _to_column narrows them back to int64 when a column has none
+    return str if dtype == 'str' else 'float64'
+
+
+def _check_columns(columns: List[str], schema: Dict[str, str], name: str):
+    missing = [column for column in schema if column not in columns]
+    if missing:
+        raise LoanTapeError(f"{name} is missing columns: {', '.join(missing)}")
+
+
+def _source_name(source: TapeSource) -> str:
+    return os.path.basename(source) if isinstance(source, str) else "uploaded tape"
+
+
+@contextmanager
+def open_tape(source: TapeSource) -> Iterator[Tuple[BinaryIO, bool]]:
+    """
+    A binary stream of the tape's decompressed content, and whether it is Parquet.
+    Bytes are wrapped without a copy; only files opened here are closed here.
+    """
+    with ExitStack() as stack:
+        if isinstance(source, str):
+            stream = stack.enter_context(open(source, "rb"))
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            stream = io.BytesIO(source)
+        else:
+            stream = source
+        magic = stream.read(4)
+        stream.seek(-len(magic), io.SEEK_CUR)
+
+        if magic.startswith(GZIP_MAGIC):
+            yield gzip.GzipFile(fileobj=stream, mode="rb"), False
+        elif magic == ZSTD_MAGIC:
+            if zstandard is None:
+                raise LoanTapeError("Reading zstd-compressed loan tapes requires zstandard")
+            yield zstandard.ZstdDecompressor().stream_reader(stream, closefd=False), False
+        else:
+            yield stream, magic == PARQUET_MAGIC or (isinstance(source, str)
+                                                     and source.lower().endswith(PARQUET_EXTENSIONS))
+
+
+def _to_book(chunk: pd.DataFrame, schema: Dict[str, str]) -> LoanBook:
+    return LoanBook({column: _to_column(chunk[column], dtype) for column, dtype in schema.items()})
+
+
+def _csv_chunks(stream: BinaryIO, schema: Dict[str, str], chunk_rows: int, name: str) -> Iterator[pd.DataFrame]:
+    # The header is read off the stream itself, so a compressed or in-memory tape is
+    # only passed over once
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    header = next(csv.reader([text.readline()]), [])
+    _check_columns(header, schema, name)
+    yield from pd.read_csv(
+        text,
+        header=None,
+        names=header,
+        usecols=list(schema),
+        dtype={column: _read_dtype(dtype) for column, dtype in schema.items()},
+        chunksize=chunk_rows
+    )
+
+
+def _parquet_chunks(stream: BinaryIO, schema: Dict[str, str], chunk_rows: int, name: str) -> Iterator[pd.DataFrame]:
+    if pq is None:
+        raise LoanTapeError("Reading Parquet loan tapes requires pyarrow")
+    parquet_file = pq.ParquetFile(stream)
+    _check_columns(parquet_file.schema_arrow.names, schema, name)
+    target = pa.schema([(column, pa.string() if dtype == 'str' else pa.float64())
+                        for column, dtype in schema.items()])
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=list(schema)):
+        yield pa.Table.from_batches([batch]).select(list(schema)).cast(target).to_pandas()
+
+
+def iter_loan_tape(source: TapeSource, extra_columns: Dict[str, str] = None,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[LoanBook]:
+    """Read a loan tape (path or buffer) chunk by chunk, yielding one typed LoanBook per chunk."""
+    schema = tape_schema(extra_columns)
+    with open_tape(source) as (stream, is_parquet):
+        read_chunks = _parquet_chunks if is_parquet else _csv_chunks
+        for chunk in read_chunks(stream, schema, chunk_rows, _source_name(source)):
+            yield _to_book(chunk, schema)
+
+
+def read_loan_tape(source: TapeSource, extra_columns: Dict[str, str] = None,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> LoanBook:
+    """Read a whole loan tape into one LoanBook, holding at most one raw chunk at a time."""
+    schema = tape_schema(extra_columns)
+    books = [book for book in iter_loan_tape(source, extra_columns, chunk_rows) if len(book)]
+    if not books:
+        return _to_book(pd.DataFrame(columns=list(schema)), schema)
+    return LoanBook.concat(books)
@@ -0,0 +1,195 @@
+# Description: Solver-independent sparse description of the loan assignment model.
+
+from dataclasses import dataclass
+from typing import Any, List, Tuple
+import numpy as np
+import scipy.sparse as sp
+from backend.models import Facility
+
+# How facility usage binaries are linked to the pairs and whether covenant rows are scaled:
+# 'standard' links with one big-M row per facility (M = number of loans), 'bounded' with
+# M = the facility's compatible loans, 'tight' with one x <= used row per pair; the last
+# two also scale every covenant row to a largest coefficient of 1.
+FORMULATIONS = ('standard', 'bounded', 'tight')
+
+
+@dataclass
+class AssignmentProblem:
+    """
+    The assignment MIP in matrix form, with one binary variable per compatible
+    (loan, facility) pair. Every row is stored as `matrix @ x <= rhs`.
+    """
+    num_loans: int
+    num_facilities: int
+    loan_idx: np.ndarray        # loan index of each variable
+    facility_idx: np.ndarray    # facility index of each variable
+    one_per_loan: sp.csr_matrix
+    one_per_loan_rhs: np.ndarray
+    covenant_matrix: sp.csr_matrix
+    covenant_rhs: np.ndarray
+    covenant_index: List[Tuple[int, int]]  # (facility, pool covenant) of each covenant row
+    covenant_scale: np.ndarray  # factor each covenant row (and RHS) was multiplied by
+    formulation: str = 'standard'
+
+    @property
+    def num_vars(self) -> int:
+        return len(self.loan_idx)
+
+    def field_coefficients(self, values: Any) -> np.ndarray:
+        """Per-variable coefficients from a per-loan vector (e.g. a LoanBook column)."""
+        return np.asarray(values, dtype=float)[self.loan_idx]
+
+    def facility_matrix(self) -> sp.csr_matrix:
+        """(num_facilities x num_vars) incidence of variables on facilities."""
+        return sp.csr_matrix(
+            (np.ones(self.num_vars), (self.facility_idx, np.arange(self.num_vars))),
+            shape=(self.num_facilities, self.num_vars)
+        )
+
+    def usage_links(self) -> Tuple[sp.csr_matrix, sp.csr_matrix]:
+        """
+        Rows linking the pairs to the facility usage binaries `used`, in the problem's
+        formulation, as `pair_matrix @ x + usage_matrix @ used <= 0`.
+        """
+        if self.formulation == 'tight':
+            pair_matrix = sp.identity(self.num_vars, format='csr')
+            usage_matrix = sp.csr_matrix(
+                (-np.ones(self.num_vars), (np.arange(self.num_vars), self.facility_idx)),
+                shape=(self.num_vars, self.num_facilities)
+            )
+            return pair_matrix, usage_matrix
+        if self.formulation == 'bounded':
+            big_m = np.bincount(self.facility_idx, minlength=self.num_facilities).astype(float)
+        else:
+            big_m = np.full(self.num_facilities, float(self.num_loans))
+        return self.facility_matrix(), sp.diags(-big_m, format='csr')
+
+    def covenants(self, facilities: List[Facility]) -> Tuple[sp.csr_matrix, np.ndarray]:
+        """
+        Covenant rows and RHS for the facilities' current covenant limits, scaled like the
+        built rows. Used to update a built model after covenant limits changed.
+        """
+        covenant_matrix, covenant_rhs, _ = covenant_rows(facilities, self.loan_idx, self.facility_idx)
+        scale = sp.diags(self.covenant_scale, format='csr')
+        return scale @ covenant_matrix, covenant_rhs * self.covenant_scale
+
+    def assignment_vector(self, values: np.ndarray) -> np.ndarray:
+        """Facility of every loan (-1 if unassigned) from the solved pair variable values."""
+        chosen = np.flatnonzero(np.asarray(values)[:self.num_vars] > 0.5)
+        vector = np.full(self.num_loans, -1, dtype=np.int64)
+        vector[self.loan_idx[chosen]] = self.facility_idx[chosen]
+        return vector
+
+
+def assignment_vector(assignments: Any, num_loans: int) -> np.ndarray:
+    """Facility of every loan, -1 if unassigned, from (loan, facility) pairs."""
+    pairs = np.asarray(assignments, dtype=np.int64).reshape(-1, 2)
+    vector = np.full(num_loans, -1, dtype=np.int64)
+    vector[pairs[:, 0]] = pairs[:, 1]
+    return vector
+
+
+def assignment_pairs(vector: np.ndarray) -> List[Tuple[int, int]]:
+    """(loan, facility) pairs of an assignment vector, ordered by loan."""
+    loans = np.flatnonzero(vector >= 0)
+    return list(zip(loans.tolist(), vector[loans].tolist()))
+
+
+def compatible_pairs(asset_acc_matrix: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """Loan and facility indices of compatible pairs, from a CompatibilityMatrix or dense 0/1 matrix."""
+    if hasattr(asset_acc_matrix, 'pairs'):
+        loan_idx, facility_idx = asset_acc_matrix.pairs()
+    else:
+        loan_idx, facility_idx = np.nonzero(np.asarray(asset_acc_matrix) > 0)
+    return loan_idx.astype(np.int64), facility_idx.astype(np.int64)
+
+
+def _covenant_row(pool_covenant, loans: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Coefficients for the given new loans and the RHS of one pool covenant, as `<=`."""
+    flip_ineq = 1 - 2*pool_covenant.constr_op  # -1 if geq, 1 otherwise
+    c = float(pool_covenant.c)
+    a = np.asarray(pool_covenant.a, dtype=float)[loans]
+    b = np.asarray(pool_covenant.b, dtype=float)[loans]
+
+    if pool_covenant.constr_type:
+        # Type 1 constraint: Weighted sum type
+        coef = a * b
+    else:
+        # Type 0 constraint: Ratio type
+        coef = (a - c) * b
+    # Existing loans only enter through the covenant's aggregated RHS
+    return coef * flip_ineq, pool_covenant.rhs() * flip_ineq
+
+
+def covenant_rows(facilities: List[Facility], loan_idx: np.ndarray,
+                  facility_idx: np.ndarray) -> Tuple[sp.csr_matrix, np.ndarray, List[Tuple[int, int]]]:
+    """Pool covenant rows over the pair variables, their RHS and (facility, covenant) of each row."""
+    rows, cols, data, rhs, covenant_index = [], [], [], [], []
+    for j, facility in enumerate(facilities):
+        columns = np.flatnonzero(facility_idx == j)
+        for k, pool_covenant in enumerate(facility.pool_covenants):
+            # Restricted to the facility's variables and without zero coefficients
+            coef, row_rhs = _covenant_row(pool_covenant, loan_idx[columns])
+            nonzero = coef != 0
+            rows.append(np.full(int(nonzero.sum()), len(rhs)))
+            cols.append(columns[nonzero])
+            data.append(coef[nonzero])
+            rhs.append(row_rhs)
+            covenant_index.append((j, k))
+    covenant_matrix = sp.csr_matrix(
+        (np.concatenate(data) if data else [], (np.concatenate(rows) if rows else [], np.concatenate(cols) if cols else [])),
+        shape=(len(rhs), len(loan_idx))
+    )
+    return covenant_matrix, np.asarray(rhs, dtype=float), covenant_index
+
+
+def scale_rows(matrix: sp.csr_matrix, rhs: np.ndarray) -> Tuple[sp.csr_matrix, np.ndarray, np.ndarray]:
+    """Divide every row by its largest absolute coefficient; rows without coefficients are kept."""
+    largest = abs(matrix).max(axis=1).toarray().ravel() if matrix.shape[1] else np.zeros(matrix.shape[0])
+    scale = np.divide(1.0, largest, out=np.ones_like(largest), where=largest > 0)
+    return sp.diags(scale, format='csr') @ matrix, rhs * scale, scale
+
+
+def build_assignment_problem(
+    num_loans: int,
+    facilities: List[Facility],
+    asset_acc_matrix: Any,
+    formulation: str = 'standard'
+) -> AssignmentProblem:
+    """Assemble the sparse assignment model for the compatible pairs only."""
+    if formulation not in FORMULATIONS:
+        raise ValueError(f"Unknown formulation {formulation!r}, expected one of {', '.join(FORMULATIONS)}")
+    num_facilities = len(facilities)
+    loan_idx, facility_idx = compatible_pairs(asset_acc_matrix)
+    num_vars = len(loan_idx)
+
+    # One facility per loan: only loans with more than one compatible facility need a row
+    counts = np.bincount(loan_idx, minlength=num_loans)
+    keep = counts[loan_idx] > 1
+    shared_loans, row_of_var = np.unique(loan_idx[keep], return_inverse=True)
+    one_per_loan = sp.csr_matrix(
+        (np.ones(int(keep.sum())), (row_of_var, np.flatnonzero(keep))),
+        shape=(len(shared_loans), num_vars)
+    )
+
+    # Pool covenants, restricted to each facility's variables
+    covenant_matrix, covenant_rhs, covenant_index = covenant_rows(facilities, loan_idx, facility_idx)
+    if formulation == 'standard':
+        covenant_scale = np.ones(len(covenant_rhs))
+    else:
+        # Ratio covenants mix dollar amounts with scores, so raw coefficients span many magnitudes
+        covenant_matrix, covenant_rhs, covenant_scale = scale_rows(covenant_matrix, covenant_rhs)
+
+    return AssignmentProblem(
+        num_loans=num_loans,
+        num_facilities=num_facilities,
+        loan_idx=loan_idx,
+        facility_idx=facility_idx,
+        one_per_loan=one_per_loan,
+        one_per_loan_rhs=np.ones(len(shared_loans)),
+        covenant_matrix=covenant_matrix,
+        covenant_rhs=covenant_rhs,
+        covenant_index=covenant_index,
+        covenant_scale=covenant_scale,
+        formulation=formulation,
+    )
@@ -1,5 +1,8 @@
 # Description: This file contains the classes for the Facility, Loan, AssetCovenant, and PoolCovenant objects.
 
+import numpy as np
+from backend.loan_book import LoanBook, as_loan_book
+
 class Loan:
     def __init__(self, LOAN_ID, ORIG_CHN, SELLER, orig_rt, orig_amt, orig_trm,
                  orig_date, first_pay, oltv, ocltv, num_bo, dti, CSCORE_B,
@@ -39,7 +42,11 @@ class Facility:
         self.facility_size = facility_size
         self.asset_covenants = []
         self.pool_covenants = []
-        self.existing_loans = []
+        self.existing_loans = LoanBook.empty()
+        # Loans held in a portfolio store but not loaded into existing_loans: count, orig_amt and CSCORE_B sums
+        self.stored_count = 0
+        self.stored_value = 0.0
+        self.stored_score = 0.0
 
     def add_asset_covenants(self, asset_covenant):
         self.asset_covenants.append(asset_covenant)
@@ -48,7 +55,13 @@ class Facility:
         self.pool_covenants.append(pool_covenant)
 
     def add_existing_loans(self, existing_loans):
-        self.existing_loans.extend(existing_loans)
+        self.existing_loans = LoanBook.concat([self.existing_loans, as_loan_book(existing_loans)])
+
+    def assign_new_loans(self, new_loans, loan_indices):
+        """Add loans of the current tape (by index) and fold them into the pool covenant aggregates."""
+        self.add_existing_loans(new_loans.take(loan_indices))
+        for pool_covenant in self.pool_covenants:
+            pool_covenant.add_new_loans(loan_indices)
 
     def asset_check(self, new_loan):
         return all(asset_covenant.asset_check(new_loan) for asset_covenant in self.asset_covenants)  # Checks all Asset Covenants
@@ -89,9 +102,41 @@ class PoolCovenant:
         self.c = c
         self.constr_type = constr_type
         self.constr_op = constr_op
-        self.a_e = []
-        self.b_e = []
+        # Running aggregates over the facility's existing loans
+        self.existing_ab = 0.0  # sum of a_e * b_e
+        self.existing_b = 0.0   # sum of b_e
+        self.existing_count = 0
 
     def update_params(self, a_new, b_new):
-        self.a_e.extend(a_new)
-        self.b_e.extend(b_new)
+        a_new = np.asarray(a_new, dtype=float)
+        b_new = np.asarray(b_new, dtype=float)
+        self.existing_ab += float(np.dot(a_new, b_new))
+        self.existing_b += float(b_new.sum())
+        self.existing_count += len(b_new)
+
+    def add_new_loans(self, loan_indices):
+        """Count loans of the current tape (positions in a and b) as existing loans."""
+        self.update_params(np.asarray(self.a, dtype=float)[loan_indices],
+                           np.asarray(self.b, dtype=float)[loan_indices])
+
+    def take(self, loan_indices):
+        """Covenant over a subset of the current tape, with the same existing-loan aggregates."""
+        covenant = PoolCovenant(
+            a=np.asarray(self.a, dtype=float)[loan_indices],
+            b=np.asarray(self.b, dtype=float)[loan_indices],
+            c=self.c,
+            constr_type=self.constr_type,
+            constr_op=self.constr_op
+        )
+        covenant.existing_ab = self.existing_ab
+        covenant.existing_b = self.existing_b
+        covenant.existing_count = self.existing_count
+        return covenant
+
+    def rhs(self):
+        """Constant right-hand side for the new loans' terms, before flipping for constr_op."""
+        if self.constr_type:
+            # Type 1: sum(a*b x) + sum(a_e*b_e) <= c
+            return float(self.c) - self.existing_ab
+        # Type 0: sum((a - c)*b x) <= sum((c - a_e)*b_e)
+        return float(self.c) * self.existing_b - self.existing_ab
@@ -1,19 +1,50 @@
-from typing import List, Dict, Any, Tuple
+import logging
+import time
+from typing import List, Dict, Any, Tuple, Callable
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
-from gurobipy import Model, GRB, quicksum
-from backend.models import Loan, Facility
-from backend.existing_loans_handle import load_existing_loans, update_existing_loans_csv
+from gurobipy import Model, GRB, GurobiError, quicksum
+from backend.models import Facility
+from backend.loan_book import LoanBook, as_loan_book
+from backend.model_builder import AssignmentProblem, assignment_pairs, assignment_vector, build_assignment_problem
+from backend.solvers import SolverBackend, HighsBackend
+from backend.decomposition import (make_batches, take_loans, working_facilities, batch_facilities,
+                                   lp_relaxation_bound, bound_gap)
+from backend.heuristic import greedy_allocate, objective_values, objective_gaps
+from backend.existing_loans_handle import load_existing_loans, new_assignments_frame, update_existing_loans_csv
+from backend import telemetry
+
+logger = logging.getLogger("loan_optimizer.optimization")
+
+# Gurobi status codes by name, for the solve telemetry
+GUROBI_STATUS_NAMES = {getattr(GRB.Status, name): name for name in dir(GRB.Status) if name.isupper()}
+
+def loan_values(loans: LoanBook, field: str) -> List[float]:
+    """A loan field as plain floats, ready for Gurobi coefficients."""
+    return np.asarray(loans[field], dtype=float).tolist()
+
+@dataclass
+class PairVars:
+    """Assignment variables of a sparse model: one binary per compatible (loan, facility) pair."""
+    problem: AssignmentProblem
+    x: Any  # MVar over problem.loan_idx / problem.facility_idx
+    covenants: List[Any] = None  # Constr of every covenant row, in problem order
+    facility_used: Any = None    # MVar of facility usage binaries, once facility_cost is used
 
 def create_base_model(
     name: str,
-    loans_to_assign: List[Loan],
+    loans_to_assign: LoanBook,
     facilities: List[Facility],
-    asset_acc_matrix: List[List[int]]
+    asset_acc_matrix: List[List[int]],
+    formulation: str = 'standard'
 ) -> tuple[Model, Any]:
     """Create a base Gurobi model with common constraints."""
+    if formulation != 'standard':
+        raise ValueError(f"The {formulation!r} formulation needs the sparse model builder")
     num_loans = len(loans_to_assign)
     num_facilities = len(facilities)
+    asset_acc_matrix = np.asarray(asset_acc_matrix)
     
     model = Model(name)
     x = model.addVars(num_loans, num_facilities, vtype=GRB.BINARY, name="x")
@@ -45,12 +76,9 @@ def create_base_model(
                     x[i, j] * float(pool_covenant.a[i]) * float(pool_covenant.b[i])
                     for i in range(len(pool_covenant.b))
                 )
-                existing_sum = quicksum(
-                    float(pool_covenant.a_e[i]) * float(pool_covenant.b_e[i])
-                    for i in range(len(pool_covenant.b_e))
-                )
+                # Existing loans are already aggregated into the RHS
                 model.addConstr(
-                    (left_sum + existing_sum) * flip_ineq <= float(pool_covenant.c) * flip_ineq
+                    left_sum * flip_ineq <= pool_covenant.rhs() * flip_ineq
                 )
             else:
                 # Type 0 constraint: Ratio type
@@ -58,30 +86,99 @@ def create_base_model(
                     x[i, j] * (float(pool_covenant.a[i]) - float(pool_covenant.c)) * float(pool_covenant.b[i])
                     for i in range(len(pool_covenant.b))
                 )
-                right_sum = quicksum(
-                    (float(pool_covenant.c) - float(pool_covenant.a_e[i])) * float(pool_covenant.b_e[i])
-                    for i in range(len(pool_covenant.b_e))
-                )
                 model.addConstr(
-                    left_sum * flip_ineq <= right_sum * flip_ineq
+                    left_sum * flip_ineq <= pool_covenant.rhs() * flip_ineq
                 )
     
     return model, x
 
+def create_sparse_model(
+    name: str,
+    loans_to_assign: LoanBook,
+    facilities: List[Facility],
+    asset_acc_matrix: Any,
+    formulation: str = 'standard'
+) -> tuple[Model, PairVars]:
+    """Create the base model through the matrix API, with variables only for compatible pairs."""
+    problem = build_assignment_problem(len(loans_to_assign), facilities, asset_acc_matrix, formulation)
+
+    model = Model(name)
+    x = model.addMVar(problem.num_vars, vtype=GRB.BINARY, name="x")
+
+    # One facility per loan, for loans compatible with more than one facility
+    if problem.one_per_loan.shape[0]:
+        model.addMConstr(problem.one_per_loan, x, GRB.LESS_EQUAL, problem.one_per_loan_rhs, name="OneFacilityPerLoan")
+
+    # Pool covenants, with the existing-loan terms already folded into the RHS (scaled rows outside 'standard')
+    covenants = []
+    if problem.covenant_matrix.shape[0]:
+        covenants = model.addMConstr(problem.covenant_matrix, x, GRB.LESS_EQUAL, problem.covenant_rhs,
+                                     name="PoolCovenant").tolist()
+
+    return model, PairVars(problem, x, covenants)
+
+MODEL_BUILDERS = {
+    'dense': create_base_model,
+    'sparse': create_sparse_model,
+}
+
+def objective_expression(
+    model: Model,
+    x: Any,
+    input_field: str,
+    loans_to_assign: LoanBook,
+    facilities: List[Facility]
+):
+    """Linear expression of one objective input; facility_cost adds the facility usage variables."""
+    num_loans = len(loans_to_assign)
+    num_facilities = len(facilities)
+
+    if isinstance(x, PairVars):
+        problem = x.problem
+        if input_field == 'facility_cost':
+            # The usage variables are added once; later calls only re-read the costs
+            if x.facility_used is None:
+                x.facility_used = model.addMVar(num_facilities, vtype=GRB.BINARY, name="facility_used")
+                if problem.num_vars:
+                    # Without compatible pairs there is nothing to link
+                    pair_matrix, usage_matrix = problem.usage_links()
+                    model.addConstr(pair_matrix @ x.x + usage_matrix @ x.facility_used <= 0, name="FacilityUsage")
+            costs = np.array([float(facility.facility_cost) for facility in facilities])
+            return costs @ x.facility_used
+        return problem.field_coefficients(loans_to_assign[input_field]) @ x.x
+
+    if input_field == 'facility_cost':
+        # Create facility usage variables
+        facility_used = model.addVars(num_facilities, vtype=GRB.BINARY, name="facility_used")
+        
+        # Add facility usage constraints
+        for j in range(num_facilities):
+            model.addConstr(
+                quicksum(x[i, j] for i in range(num_loans)) <= num_loans * facility_used[j],
+                f"FacilityUsage_{j}"
+            )
+            
+        # Facility costs of the used facilities
+        return quicksum(float(facilities[j].facility_cost) * facility_used[j] 
+                        for j in range(num_facilities))
+
+    # Standard objective for other fields
+    values = loan_values(loans_to_assign, input_field)
+    return quicksum(values[i] * x[i, j]
+                    for i in range(num_loans)
+                    for j in range(num_facilities))
+
 def set_objective(
     model: Model,
     x: Any,
     objective_type: str,
     input_field: str,
-    loans_to_assign: List[Loan],
+    loans_to_assign: LoanBook,
     facilities: List[Facility],
     prev_objectives: List[Dict] = None,
     tolerance: float = 1e-4
 ):
     """Set the objective function based on the optimization parameters."""
-    num_loans = len(loans_to_assign)
-    num_facilities = len(facilities)
-    
     # Add constraints from previous optimization steps
     if prev_objectives:
         for prev_obj in prev_objectives:
@@ -89,52 +186,465 @@ def set_objective(
                 continue
             
             model.addConstr(
-                quicksum(float(getattr(loans_to_assign[i], prev_obj['input'])) * x[i, j]
-                        for i in range(num_loans)
-                        for j in range(num_facilities)) >= float(prev_obj['value']) - tolerance
+                objective_expression(model, x, prev_obj['input'], loans_to_assign, facilities)
+                >= float(prev_obj['value']) - tolerance
             )
     
     # Set new objective
     sense = GRB.MAXIMIZE if objective_type == 'Max' else GRB.MINIMIZE
-    
-    if input_field == 'facility_cost':
-        # Create facility usage variables
-        facility_used = model.addVars(num_facilities, vtype=GRB.BINARY, name="facility_used")
-        
-        # Add facility usage constraints
-        for j in range(num_facilities):
-            model.addConstr(
-                quicksum(x[i, j] for i in range(num_loans)) <= num_loans * facility_used[j],
-                f"FacilityUsage_{j}"
-            )
-            
-        # Set objective to minimize facility costs
-        model.setObjective(
-            quicksum(float(facilities[j].facility_cost) * facility_used[j] 
-                    for j in range(num_facilities)),
-            sense
+    model.setObjective(objective_expression(model, x, input_field, loans_to_assign, facilities), sense)
+
+def check_hierarchical_order(optimization_steps: List[Dict]):
+    """
+    Reject orders the hierarchical model would solve differently from the sequential
+    modes: a facility_cost step before other steps would hold them at its own optimum,
+    while the sequential modes leave it unlocked.
+    """
+    for step in optimization_steps[:-1]:
+        if step['Input'] == 'facility_cost':
+            raise ValueError(f"Hierarchical mode needs facility_cost as the last step, but step {step['Order']} "
+                             "minimizes it; use mode='persistent' for this order")
+
+def set_hierarchical_objectives(
+    model: Model,
+    x: Any,
+    optimization_steps: List[Dict],
+    loans_to_assign: LoanBook,
+    facilities: List[Facility],
+    tolerance: float = 1e-4
+):
+    """
+    Set every step as a native Gurobi objective, highest priority first. Each level
+    may degrade by at most `tolerance` (absolute) while the lower levels are optimized.
+    The sequential modes never lock facility_cost, so it may only be the last level
+    (see check_hierarchical_order).
+    """
+    check_hierarchical_order(optimization_steps)
+    model_sense = GRB.MAXIMIZE if optimization_steps[0]['Type'] == 'Max' else GRB.MINIMIZE
+    model.ModelSense = model_sense
+    for index, step in enumerate(optimization_steps):
+        sense = GRB.MAXIMIZE if step['Type'] == 'Max' else GRB.MINIMIZE
+        model.setObjectiveN(
+            objective_expression(model, x, step['Input'], loans_to_assign, facilities),
+            index,
+            priority=len(optimization_steps) - index,
+            weight=1.0 if sense == model_sense else -1.0,
+            abstol=tolerance,
+            reltol=0.0,
+            name=f"Step_{step['Order']}"
         )
+
+def extract_assignment_vector(model: Model, x: Any, num_loans: int, num_facilities: int) -> np.ndarray:
+    """Facility of every loan (-1 if unassigned) in the solved model, read in one bulk attribute call."""
+    if isinstance(x, PairVars):
+        return x.problem.assignment_vector(x.x.X)
+    # addVars orders the dense variables by loan, then facility
+    chosen = np.asarray(model.getAttr('X', list(x.values()))).reshape(num_loans, num_facilities) > 0.5
+    return np.where(chosen.any(axis=1), chosen.argmax(axis=1), -1).astype(np.int64)
+
+def extract_assignments(model: Model, x: Any, num_loans: int, num_facilities: int) -> List[Tuple[int, int]]:
+    """(loan, facility) pairs selected in the solved model, ordered by loan."""
+    return assignment_pairs(extract_assignment_vector(model, x, num_loans, num_facilities))
+
+def set_mip_start(x: Any):
+    """Use the current solution of the assignment variables as the next MIP start."""
+    if isinstance(x, PairVars):
+        x.x.Start = x.x.X
     else:
-        # Standard objective for other fields
-        model.setObjective(
-            quicksum(float(getattr(loans_to_assign[i], input_field)) * x[i, j]
-                    for i in range(num_loans)
-                    for j in range(num_facilities)),
-            sense
-        )
+        for var in x.values():
+            var.Start = var.X
+
+def set_assignment_start(x: Any, assignments: List[Tuple[int, int]], num_facilities: int):
+    """Use a given allocation, e.g. from the greedy allocator, as the MIP start."""
+    pairs = np.asarray(assignments, dtype=np.int64).reshape(-1, 2)
+    if isinstance(x, PairVars):
+        # Pair variables are ordered by loan, then facility
+        keys = x.problem.loan_idx * num_facilities + x.problem.facility_idx
+        start = np.zeros(x.problem.num_vars)
+        start[np.searchsorted(keys, pairs[:, 0] * num_facilities + pairs[:, 1])] = 1.0
+        x.x.Start = start
+    else:
+        chosen = set(map(tuple, pairs.tolist()))
+        for key, var in x.items():
+            var.Start = 1.0 if key in chosen else 0.0
+
+def _model_attribute(model: Model, name: str) -> Any:
+    # Some attributes are undefined for a status or model type (MIPGap of a multi-objective model)
+    try:
+        return model.getAttr(name)
+    except (AttributeError, GurobiError):
+        return None
+
+def gurobi_stats(model: Model) -> Dict[str, Any]:
+    """SolverBackend.stats of a Gurobi model after optimize()."""
+    node_count = _model_attribute(model, 'NodeCount')
+    return {
+        'num_vars': model.NumVars,
+        'num_constrs': model.NumConstrs,
+        'num_nonzeros': model.NumNZs,
+        'runtime': model.Runtime,
+        'mip_gap': _model_attribute(model, 'MIPGap') if model.SolCount > 0 else None,
+        'node_count': None if node_count is None else int(node_count),
+        'status': GUROBI_STATUS_NAMES.get(model.Status, str(model.Status)),
+    }
+
+def _known_bound(bound: float) -> float:
+    """A Gurobi objective bound, or None while there is none (+-GRB.INFINITY or inf)."""
+    return None if bound is None or abs(bound) >= GRB.INFINITY else bound
+
+def solve_callback(incumbent: Callable[[float, float], None] = None, stopped: Callable[[], bool] = None,
+                   report_interval: float = 1.0) -> Callable:
+    """
+    Gurobi callback for SolverBackend.optimize: reports every new incumbent, and a moved
+    bound at most every `report_interval` seconds, as incumbent(value, bound), and
+    terminates the solve (keeping its incumbent) once stopped() is true. None if unused.
+    """
+    if incumbent is None and stopped is None:
+        return None
+    reported = {'runtime': 0.0, 'bound': None}
+
+    def report(value: float, bound: float):
+        incumbent(value, _known_bound(bound))
+
+    def callback(model, where):
+        if stopped is not None and where != GRB.Callback.MESSAGE and stopped():
+            model.terminate()
+            return
+        if incumbent is None:
+            return
+        if where == GRB.Callback.MIPSOL:
+            bound = model.cbGet(GRB.Callback.MIPSOL_OBJBND)
+            report(model.cbGet(GRB.Callback.MIPSOL_OBJ), bound)
+        elif where == GRB.Callback.MIP and model.cbGet(GRB.Callback.MIP_SOLCNT) > 0:
+            bound, runtime = model.cbGet(GRB.Callback.MIP_OBJBND), model.cbGet(GRB.Callback.RUNTIME)
+            if bound == reported['bound'] or runtime - reported['runtime'] < report_interval:
+                return
+            report(model.cbGet(GRB.Callback.MIP_OBJBST), bound)
+        else:
+            return
+        reported['runtime'], reported['bound'] = model.cbGet(GRB.Callback.RUNTIME), bound
+
+    return callback
+
+def _report_final(model: Model, incumbent: Callable[[float, float], None]):
+    """Report the incumbent and bound a Gurobi solve ended with."""
+    if incumbent is not None and model.SolCount > 0:
+        incumbent(model.ObjVal, _known_bound(_model_attribute(model, 'ObjBound')))
+
+class GurobiBackend(SolverBackend):
+    """The assignment model in Gurobi, built by the dense or sparse model builder."""
+    name = 'gurobi'
+
+    def __init__(self, name: str, loans_to_assign: LoanBook, facilities: List[Facility],
+                 asset_acc_matrix: Any, builder: str = 'sparse', formulation: str = 'standard',
+                 threads: int = None, time_limit: float = None):
+        self.loans_to_assign = loans_to_assign
+        self.facilities = facilities
+        self.model, self.x = MODEL_BUILDERS[builder](name, loans_to_assign, facilities, asset_acc_matrix,
+                                                     formulation)
+        self.model.setParam('OutputFlag', 0)
+        if threads is not None:
+            self.model.setParam('Threads', threads)
+        if time_limit is not None:
+            self.model.setParam('TimeLimit', time_limit)
+        self._expressions = {}
+        self.locks = []
+
+    def _expression(self, input_field: str):
+        # Built once per input, so facility usage variables are only added once
+        if input_field not in self._expressions:
+            self._expressions[input_field] = objective_expression(
+                self.model, self.x, input_field, self.loans_to_assign, self.facilities)
+        return self._expressions[input_field]
+
+    def add_lock(self, input_field: str, value: float, tolerance: float):
+        self.locks.append(self.model.addConstr(self._expression(input_field) >= float(value) - tolerance))
+
+    def clear_locks(self):
+        self.model.remove(self.locks)
+        self.locks = []
+
+    def update_parameters(self):
+        if not isinstance(self.x, PairVars):
+            raise ValueError("Parameter updates need the sparse model builder")
+        # The facility_cost objective is rebuilt from the new costs on the same usage variables
+        self._expressions.pop('facility_cost', None)
+        problem = self.x.problem
+        covenant_matrix, covenant_rhs = problem.covenants(self.facilities)
+        for row, constr in enumerate(self.x.covenants):
+            new_row, old_row = covenant_matrix[row], problem.covenant_matrix[row]
+            if (new_row != old_row).nnz:
+                # Ratio covenants carry their limit in the coefficients: replace just that row
+                self.model.remove(constr)
+                self.x.covenants[row] = self.model.addConstr(new_row @ self.x.x <= covenant_rhs[row]).tolist()[0]
+            elif covenant_rhs[row] != problem.covenant_rhs[row]:
+                constr.RHS = covenant_rhs[row]
+        problem.covenant_matrix, problem.covenant_rhs = covenant_matrix, covenant_rhs
+
+    def set_objective(self, objective_type: str, input_field: str):
+        sense = GRB.MAXIMIZE if objective_type == 'Max' else GRB.MINIMIZE
+        self.model.setObjective(self._expression(input_field), sense)
+
+    def set_start(self):
+        set_mip_start(self.x)
+
+    def set_start_assignments(self, assignments: List[Tuple[int, int]]):
+        set_assignment_start(self.x, assignments, len(self.facilities))
+
+    def set_limits(self, time_limit: float = None, mip_gap: float = None):
+        if time_limit is not None:
+            self.model.setParam('TimeLimit', max(time_limit, 0.0))
+        if mip_gap is not None:
+            self.model.setParam('MIPGap', mip_gap)
+
+    def optimize(self, incumbent: Callable[[float, float], None] = None, stopped: Callable[[], bool] = None):
+        callback = solve_callback(incumbent, stopped)
+        if callback is None:
+            self.model.optimize()
+        else:
+            self.model.optimize(callback)
+        _report_final(self.model, incumbent)
+
+    @property
+    def is_optimal(self) -> bool:
+        return self.model.Status == GRB.OPTIMAL
+
+    @property
+    def has_solution(self) -> bool:
+        return self.model.SolCount > 0
+
+    @property
+    def objective_value(self) -> float:
+        return self.model.ObjVal
+
+    def assignment_vector(self) -> np.ndarray:
+        return extract_assignment_vector(self.model, self.x, len(self.loans_to_assign), len(self.facilities))
+
+    def stats(self) -> Dict[str, Any]:
+        return gurobi_stats(self.model)
+
+SOLVER_BACKENDS = {
+    'gurobi': GurobiBackend,
+    'highs': HighsBackend,
+}
+
+def _step_result(step: Dict, obj_value: float, assignment: np.ndarray, status: str = 'OPTIMAL') -> Dict[str, Any]:
+    """
+    One solved optimization step; `assignment` is the facility of every loan, -1 if unassigned.
+    A status other than OPTIMAL means the step stopped early at its best incumbent.
+    """
+    return {
+        'step': step['Order'],
+        'objective_type': step['Type'],
+        'input_field': step['Input'],
+        'objective_value': obj_value,
+        'assignment': assignment,
+        'status': status
+    }
+
+def relative_gap(value: float, bound: float) -> float:
+    """Relative distance of an incumbent from its bound, as Gurobi computes MIPGap."""
+    if value is None or bound is None:
+        return None
+    return abs(bound - value) / max(abs(value), 1e-10)
+
+def _step_time_limit(step_time_limit: float, run_time_limit: float, run_start: float) -> float:
+    """Time limit of the next step: the per-step budget, capped by what is left of the run's."""
+    if run_time_limit is None:
+        return step_time_limit
+    remaining = run_time_limit - (time.perf_counter() - run_start)
+    return remaining if step_time_limit is None else min(step_time_limit, remaining)
+
+def _incumbent_reporter(incumbent: Callable[[Dict[str, Any]], None], step: Dict) -> Callable:
+    """Backend incumbent(value, bound) callback that reports a record of the step to `incumbent`."""
+    if incumbent is None:
+        return None
+
+    def report(value: float, bound: float):
+        incumbent({'step': step['Order'], 'objective': f"{step['Type']} {step['Input']}",
+                   'incumbent': value, 'bound': bound, 'gap': relative_gap(value, bound)})
+
+    return report
+
+def solve_steps(
+    backend: SolverBackend,
+    optimization_steps: List[Dict],
+    tolerance: float = 1e-4,
+    build: Callable[[Dict], SolverBackend] = None,
+    rebuild: bool = False,
+    solver: str = None,
+    step_time_limit: float = None,
+    run_time_limit: float = None,
+    run_start: float = None,
+    mip_gap: float = None,
+    incumbent: Callable[[Dict[str, Any]], None] = None,
+    stopped: Callable[[], bool] = None,
+    start: List[Tuple[int, int]] = None
+) -> Tuple[List[Dict[str, Any]], bool, SolverBackend]:
+    """
+    Solve the steps lexicographically: every step locks the earlier steps' values to
+    `value - tolerance` or better (facility_cost steps are never locked).
+
+    The steps run on `backend`, warm-starting each from the previous one and adding only
+    the latest lock. build(step) makes a fresh backend, which then gets every lock: for
+    every step with rebuild, when backend is None, and after a step without a solution.
+    start is an allocation the first step starts from. The budgets, incumbent and stopped
+    are those of optimize_sequential; a step that stops early keeps and locks its incumbent,
+    and a step proven infeasible ends the steps, as the later ones only add locks.
+
+    Returns a _step_result (with the solve's 'seconds') for every step tried, with
+    objective_value and assignment None for a step without a solution; whether the steps
+    ended early; and the backend of the last step, for the caller to re-use.
+    """
+    run_start = time.perf_counter() if run_start is None else run_start
+    stopped_early = False
+    results = []
+    prev_objectives = []
+    for step in optimization_steps:
+        if stopped is not None and stopped():
+            logger.warning("Stopped before step %s, keeping the steps solved so far", step['Order'])
+            stopped_early = True
+            break
+        time_limit = _step_time_limit(step_time_limit, run_time_limit, run_start)
+        if time_limit is not None and time_limit <= 0:
+            logger.warning("Run time budget used up before step %s", step['Order'])
+            stopped_early = True
+            break
+        logger.info("Starting optimization step %s: %s %s", step['Order'], step['Type'], step['Input'])
+
+        if rebuild or backend is None:
+            with telemetry.phase("model_build", step=step['Order']):
+                backend = build(step)
+            locks = prev_objectives
+        else:
+            # Same model: only the latest objective needs locking, and the last solution is a valid start
+            locks = prev_objectives[-1:]
+            if backend.has_solution:
+                backend.set_start()
+
+        if start is not None and not prev_objectives:
+            backend.set_start_assignments(start)
+
+        # Add constraints from previous optimization steps
+        for prev_obj in locks:
+            if prev_obj['input'] != 'facility_cost':
+                backend.add_lock(prev_obj['input'], prev_obj['value'], tolerance)
+        backend.set_objective(step['Type'], step['Input'])
+        if time_limit is not None or mip_gap is not None:
+            backend.set_limits(time_limit, mip_gap)
+
+        solve_start = time.perf_counter()
+        with telemetry.phase("solve", step=step['Order']):
+            backend.optimize(incumbent=_incumbent_reporter(incumbent, step), stopped=stopped)
+        seconds = time.perf_counter() - solve_start
+        stats = backend.stats()
+        telemetry.record_solve(step['Order'], f"{step['Type']} {step['Input']}", stats,
+                               solver=solver or backend.name)
+
+        # A step that stopped early still has its best incumbent, which the next steps lock
+        if backend.has_solution:
+            obj_value = backend.objective_value
+            if not backend.is_optimal:
+                logger.warning("Step %s stopped early (%s), keeping its incumbent %s", step['Order'], stats['status'],
+                               obj_value)
+                stopped_early = True
+            prev_objectives.append({
+                'input': step['Input'],
+                'value': obj_value
+            })
+            with telemetry.phase("extraction", step=step['Order']):
+                result = _step_result(step, obj_value, backend.assignment_vector(),
+                                      'OPTIMAL' if backend.is_optimal else stats['status'])
+        else:
+            logger.warning("Step %s found no solution (%s)", step['Order'], stats['status'])
+            stopped_early = True
+            result = _step_result(step, None, None, stats['status'])
+            if stats['status'] in ('INFEASIBLE', 'INF_OR_UNBD'):
+                # The later steps only add locks to the same constraints, so they are infeasible too
+                results.append({**result, 'seconds': seconds})
+                break
+            if build is not None:
+                # Nothing to warm-start from, so the next step starts from a fresh model
+                backend = None
+        results.append({**result, 'seconds': seconds})
+    return results, stopped_early, backend
+
+def facility_statistics(assignment: np.ndarray, loans_to_assign: LoanBook,
+                        num_facilities: int) -> Dict[int, Dict[str, Any]]:
+    """Total amount, average credit score and loan count of every facility given new loans."""
+    assigned = assignment >= 0
+    facility = assignment[assigned]
+    counts = np.bincount(facility, minlength=num_facilities)
+    amounts = np.bincount(facility, weights=np.asarray(loans_to_assign['orig_amt'], dtype=float)[assigned],
+                          minlength=num_facilities)
+    scores = np.bincount(facility, weights=np.asarray(loans_to_assign['CSCORE_B'], dtype=float)[assigned],
+                         minlength=num_facilities)
+    return {
+        int(j): {
+            'total_amount': float(amounts[j]),
+            'avg_credit_score': float(scores[j] / counts[j]),
+            'num_loans': int(counts[j])
+        }
+        for j in np.flatnonzero(counts)
+    }
+
+def solution_details(assignment: np.ndarray, loans_to_assign: LoanBook, facilities: List[Facility]) -> Dict[str, Any]:
+    """Result fields of the final assignment: pairs, loans per facility, unassigned loans and statistics."""
+    num_facilities = len(facilities)
+    # Loans grouped by facility in one sort; group 0 holds the unassigned loans
+    order = np.argsort(assignment, kind='stable')
+    bounds = np.searchsorted(assignment[order], np.arange(-1, num_facilities + 1))
+    groups = [order[bounds[k]:bounds[k + 1]].tolist() for k in range(num_facilities + 1)]
+    return {
+        'assignments': assignment_pairs(assignment),
+        'loans_by_facility': {j: [loans_to_assign[i] for i in groups[j + 1]] for j in range(num_facilities)},
+        'unassigned_loans': [loans_to_assign[i] for i in groups[0]],
+        'facility_stats': facility_statistics(assignment, loans_to_assign, num_facilities)
+    }
 
 def optimize_sequential(
-    loans_to_assign: List[Loan],
+    loans_to_assign: LoanBook,
     facilities: List[Facility],
-    asset_acc_matrix: List[List[int]],
-    optimization_order_file: pd.DataFrame
+    asset_acc_matrix: Any,
+    optimization_order_file: pd.DataFrame,
+    builder: str = 'sparse',
+    mode: str = 'persistent',
+    tolerance: float = 1e-4,
+    solver: str = 'gurobi',
+    warm_start: str = None,
+    solver_options: Dict[str, Any] = None,
+    formulation: str = 'standard',
+    step_time_limit: float = None,
+    run_time_limit: float = None,
+    mip_gap: float = None,
+    incumbent: Callable[[Dict[str, Any]], None] = None,
+    stopped: Callable[[], bool] = None
 ) -> Dict[str, Any]:
     """
     Perform sequential optimization with detailed results tracking
+
+    mode='rebuild' builds a new model for every step, 'persistent' builds one model,
+    swaps the objective in place and warm-starts each step from the previous one,
+    and 'hierarchical' solves all steps at once with Gurobi's native multi-objective.
+    solver picks the backend from SOLVER_BACKENDS. warm_start='greedy' starts the first
+    step from the greedy allocation and reports its gap to the MIP objective values.
+    solver_options are extra backend arguments, e.g. {'threads': 2} for Gurobi.
+    formulation picks the facility usage linking and covenant scaling (see FORMULATIONS).
+
+    Solves are anytime: step_time_limit and run_time_limit (seconds) budget each step and
+    the whole run, and mip_gap is the relative gap at which a step counts as solved. A step
+    that stops early (a limit, or stopped() turning true) keeps and locks its best
+    incumbent; once the run budget is used up or stopped() is true, the remaining steps are
+    skipped. incumbent(record) receives the step, objective, incumbent, bound and gap of
+    improving solutions. 'step_status' has the status of every recorded step and
+    'stopped_early' tells whether the run ended before solving every step to optimality.
     """
+    solver_options = solver_options or {}
+    run_start = time.perf_counter()
+    stopped_early = False
+    loans_to_assign = as_loan_book(loans_to_assign)
     optimization_steps = optimization_order_file.to_dict('records')
     results = []
-    prev_objectives = []
     final_results = {
         'objective_values': [],
         'assignments': [],
@@ -142,124 +652,403 @@ def optimize_sequential(
         'unassigned_loans': [],
         'facility_stats': {}
     }
-    
-    for step in optimization_steps:
-        print(f"Starting optimization step {step['Order']}: {step['Type']} {step['Input']}")
-        
-        model, x = create_base_model(
-            f"Step_{step['Order']}", 
-            loans_to_assign, 
-            facilities, 
-            asset_acc_matrix
-        )
-        
-        set_objective(
-            model, x, step['Type'], step['Input'],
-            loans_to_assign, facilities, prev_objectives
-        )
 
-        model.setParam('OutputFlag', 0)
-        
-        model.optimize()
-        
-        if model.Status == GRB.OPTIMAL:
-            obj_value = model.ObjVal
-            prev_objectives.append({
-                'input': step['Input'],
-                'value': obj_value
-            })
-            
-            # Track assignments and loans for each facility
-            current_assignments = []
-            facility_loans = {i: [] for i in range(len(facilities))}
-            unassigned = []
-            
-            for i in range(len(loans_to_assign)):
-                assigned = False
-                for j in range(len(facilities)):
-                    if x[i, j].X > 0:
-                        current_assignments.append((i, j))
-                        facility_loans[j].append(loans_to_assign[i])
-                        assigned = True
-                if not assigned:
-                    unassigned.append(loans_to_assign[i])
-            
-            # Calculate facility statistics
-            facility_stats = {}
-            for fac_id, fac_loans in facility_loans.items():
-                if fac_loans:
-                    total_amount = sum(loan.orig_amt for loan in fac_loans)
-                    avg_credit_score = sum(loan.CSCORE_B for loan in fac_loans) / len(fac_loans)
-                    facility_stats[fac_id] = {
-                        'total_amount': total_amount,
-                        'avg_credit_score': avg_credit_score,
-                        'num_loans': len(fac_loans)
-                    }
-            
-            step_result = {
-                'step': step['Order'],
-                'objective_type': step['Type'],
-                'input_field': step['Input'],
-                'objective_value': obj_value,
-                'assignments': current_assignments,
-                'facility_loans': facility_loans,
-                'unassigned_loans': unassigned,
-                'facility_stats': facility_stats
-            }
-            
-            results.append(step_result)
+    if mode == 'hierarchical':
+        check_hierarchical_order(optimization_steps)
+
+    heuristic_assignments = None
+    if warm_start == 'greedy':
+        with telemetry.phase("greedy"):
+            heuristic_assignments, _ = greedy_allocate(loans_to_assign, facilities, asset_acc_matrix, optimization_steps)
+
+    if mode == 'hierarchical':
+        if solver != 'gurobi':
+            raise ValueError("Hierarchical mode needs the Gurobi backend")
+        time_limit = _step_time_limit(
+            None if step_time_limit is None else step_time_limit * len(optimization_steps), run_time_limit, run_start)
+        results = _optimize_hierarchical(loans_to_assign, facilities, asset_acc_matrix,
+                                         optimization_steps, builder, tolerance, formulation,
+                                         time_limit=time_limit, mip_gap=mip_gap, incumbent=incumbent,
+                                         stopped=stopped, start=heuristic_assignments, **solver_options)
+        stopped_early = any(result['status'] != 'OPTIMAL' for result in results)
+    else:
+        def build(step: Dict) -> SolverBackend:
+            return SOLVER_BACKENDS[solver](f"Step_{step['Order']}", loans_to_assign, facilities, asset_acc_matrix,
+                                           builder=builder, formulation=formulation, **solver_options)
+
+        steps, stopped_early, _ = solve_steps(
+            None, optimization_steps, tolerance, build=build, rebuild=mode == 'rebuild', solver=solver,
+            step_time_limit=step_time_limit, run_time_limit=run_time_limit, run_start=run_start, mip_gap=mip_gap,
+            incumbent=incumbent, stopped=stopped, start=heuristic_assignments)
+        results = [result for result in steps if result['objective_value'] is not None]
     
-    # Store final results
+    # Store final results; only the last step's assignment is expanded into loan lists
     if results:
-        final_step = results[-1]
         final_results['objective_values'] = [r['objective_value'] for r in results]
-        final_results['assignments'] = final_step['assignments']
-        final_results['loans_by_facility'] = final_step['facility_loans']
-        final_results['unassigned_loans'] = final_step['unassigned_loans']
-        final_results['facility_stats'] = final_step['facility_stats']
+        final_results.update(solution_details(results[-1]['assignment'], loans_to_assign, facilities))
+    final_results['step_status'] = [r['status'] for r in results]
+    final_results['stopped_early'] = stopped_early
+
+    if heuristic_assignments is not None:
+        heuristic_values = objective_values(heuristic_assignments, loans_to_assign, facilities, optimization_steps)
+        final_results['heuristic_objective_values'] = heuristic_values
+        final_results['heuristic_gaps'] = objective_gaps(heuristic_values, final_results['objective_values'])
     
     return final_results
 
+def optimize_greedy(
+    loans_to_assign: LoanBook,
+    facilities: List[Facility],
+    asset_acc_matrix: Any,
+    optimization_order_file: pd.DataFrame
+) -> Dict[str, Any]:
+    """Preview allocation from the greedy allocator, in the same form as optimize_sequential."""
+    loans_to_assign = as_loan_book(loans_to_assign)
+    optimization_steps = optimization_order_file.to_dict('records')
+    with telemetry.phase("greedy"):
+        assignments, feasible = greedy_allocate(loans_to_assign, facilities, asset_acc_matrix, optimization_steps)
+    if not feasible:
+        logger.warning("Greedy allocation leaves pool covenants the existing loans already break unsatisfied")
+    values = objective_values(assignments, loans_to_assign, facilities, optimization_steps)
+
+    final_results = {
+        'objective_values': values,
+        'assignments': assignments,
+        'loans_by_facility': {},
+        'unassigned_loans': [],
+        'facility_stats': {},
+        'feasible': feasible
+    }
+    if optimization_steps:
+        final_results.update(solution_details(assignment_vector(assignments, len(loans_to_assign)),
+                                              loans_to_assign, facilities))
+    return final_results
+
+def preview_relaxation(
+    loans_to_assign: LoanBook,
+    facilities: List[Facility],
+    asset_acc_matrix: Any,
+    optimization_order_file: pd.DataFrame,
+    tolerance: float = 1e-4,
+    formulation: str = 'standard'
+) -> Dict[str, Any]:
+    """
+    LP relaxation of the optimization steps, as a quick preview before the MIP finishes.
+    The steps are solved in order on one relaxed HiGHS model, locking each step's LP value
+    like optimize_sequential. The first step's value bounds the MIP objective; later steps
+    are locked to LP rather than MIP values, so theirs are estimates.
+
+    Returns 'steps' (step, objective, lp_value, status) and 'covenants': per step and pool
+    covenant its limit, shadow price (objective improvement per unit of extra headroom in
+    the covenant row), slack and whether it binds.
+    """
+    loans_to_assign = as_loan_book(loans_to_assign)
+    optimization_steps = optimization_order_file.to_dict('records')
+    relaxation = HighsBackend("Preview", loans_to_assign, facilities, asset_acc_matrix,
+                              relaxed=True, formulation=formulation)
+    steps, covenants = [], []
+    previous = None
+    for step in optimization_steps:
+        if previous is not None and previous['Input'] != 'facility_cost':
+            relaxation.add_lock(previous['Input'], steps[-1]['lp_value'], tolerance)
+        relaxation.set_objective(step['Type'], step['Input'])
+        relaxation.optimize()
+        status = relaxation.stats()['status']
+        if not relaxation.is_optimal:
+            steps.append({'step': step['Order'], 'objective': f"{step['Type']} {step['Input']}",
+                          'lp_value': None, 'status': status})
+            break
+        steps.append({'step': step['Order'], 'objective': f"{step['Type']} {step['Input']}",
+                      'lp_value': relaxation.objective_value, 'status': status})
+        shadow_prices, slacks = relaxation.covenant_sensitivity()
+        for (j, k), shadow_price, slack in zip(relaxation.problem.covenant_index, shadow_prices, slacks):
+            covenant = facilities[j].pool_covenants[k]
+            covenants.append({
+                'step': step['Order'],
+                'facility': j,
+                'facility_id': facilities[j].facility_id,
+                'covenant': k,
+                'constr_type': covenant.constr_type,
+                'limit': float(covenant.c),
+                # Solver noise around zero reads as zero
+                'shadow_price': float(shadow_price) if abs(shadow_price) > 1e-9 else 0.0,
+                'slack': float(slack),
+                'binding': bool(slack <= tolerance)
+            })
+        previous = step
+    return {'steps': steps, 'covenants': covenants}
+
+def _optimize_hierarchical(
+    loans_to_assign: LoanBook,
+    facilities: List[Facility],
+    asset_acc_matrix: Any,
+    optimization_steps: List[Dict],
+    builder: str,
+    tolerance: float,
+    formulation: str = 'standard',
+    threads: int = None,
+    time_limit: float = None,
+    mip_gap: float = None,
+    incumbent: Callable[[Dict[str, Any]], None] = None,
+    stopped: Callable[[], bool] = None,
+    start: List[Tuple[int, int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Solve all steps in one multi-objective model; every step reports the final assignment.
+    time_limit and mip_gap apply to the whole model, and a solve that stops early keeps its
+    incumbent; incumbents are reported against the first step. start is an optional
+    allocation, e.g. from the greedy allocator, used as the MIP start.
+    """
+    if not optimization_steps:
+        return []
+    logger.info("Starting hierarchical optimization of %d steps", len(optimization_steps))
+    with telemetry.phase("model_build"):
+        model, x = MODEL_BUILDERS[builder]("Hierarchical", loans_to_assign, facilities, asset_acc_matrix,
+                                           formulation)
+        model.setParam('OutputFlag', 0)
+        if threads is not None:
+            model.setParam('Threads', threads)
+        if time_limit is not None:
+            model.setParam('TimeLimit', max(time_limit, 0.0))
+        if mip_gap is not None:
+            model.setParam('MIPGap', mip_gap)
+        set_hierarchical_objectives(model, x, optimization_steps, loans_to_assign, facilities, tolerance)
+        if start is not None:
+            set_assignment_start(x, start, len(facilities))
+    report = _incumbent_reporter(incumbent, optimization_steps[0])
+    callback = solve_callback(report, stopped)
+    with telemetry.phase("solve"):
+        if callback is None:
+            model.optimize()
+        else:
+            model.optimize(callback)
+    _report_final(model, report)
+    stats = gurobi_stats(model)
+    objectives = ", ".join(f"{step['Type']} {step['Input']}" for step in optimization_steps)
+    telemetry.record_solve("hierarchical", objectives, stats, solver='gurobi')
+    if model.SolCount == 0:
+        return []
+    status = 'OPTIMAL' if model.Status == GRB.OPTIMAL else stats['status']
+    if status != 'OPTIMAL':
+        logger.warning("Hierarchical optimization stopped early (%s), keeping its incumbent", status)
+
+    results = []
+    assignment = extract_assignment_vector(model, x, len(loans_to_assign), len(facilities))
+    for index, step in enumerate(optimization_steps):
+        model.Params.ObjNumber = index
+        results.append(_step_result(step, model.ObjNVal, assignment, status))
+    return results
+
+def optimize_batched(
+    loans_to_assign: LoanBook,
+    facilities: List[Facility],
+    asset_acc_matrix: Any,
+    optimization_order_file: pd.DataFrame,
+    batch_size: int = 5000,
+    batch_order: str = 'objective',
+    builder: str = 'sparse',
+    mode: str = 'persistent',
+    tolerance: float = 1e-4,
+    solver: str = 'gurobi',
+    lp_bound: bool = True,
+    warm_start: str = None,
+    solver_options: Dict[str, Any] = None,
+    formulation: str = 'standard',
+    step_time_limit: float = None,
+    run_time_limit: float = None,
+    mip_gap: float = None,
+    incumbent: Callable[[Dict[str, Any]], None] = None,
+    stopped: Callable[[], bool] = None
+) -> Dict[str, Any]:
+    """
+    Decomposed optimize_sequential for pools too large for one MIP.
+
+    Loans are split into batches of `batch_size` (ordered by a BATCH_ORDERS policy) and
+    each batch is solved against the covenant headroom the earlier batches left. The
+    objective values are summed over the batches; with lp_bound the first one is
+    compared with the monolithic LP relaxation in 'lp_bound' and 'bound_gap'.
+    warm_start='greedy' starts every batch from its greedy allocation, and the summed
+    greedy objective values and their gaps are reported as in optimize_sequential.
+    The budgets and callbacks are those of optimize_sequential; run_time_limit covers all
+    batches, and batches left when it is used up (or stopped() is true) are not assigned.
+    """
+    run_start = time.perf_counter()
+    stopped_early = False
+    loans_to_assign = as_loan_book(loans_to_assign)
+    optimization_steps = optimization_order_file.to_dict('records')
+    working = working_facilities(facilities)
+    used = np.zeros(len(facilities), dtype=bool)
+    objective_values = np.zeros(len(optimization_steps))
+    heuristic_values = np.zeros(len(optimization_steps))
+    assignments = []
+    batches = []
+
+    for number, rows in enumerate(make_batches(loans_to_assign, optimization_steps, batch_size, batch_order)):
+        remaining = _step_time_limit(None, run_time_limit, run_start)
+        if (stopped is not None and stopped()) or (remaining is not None and remaining <= 0):
+            logger.warning("Stopped before batch %d, leaving the remaining loans unassigned", number + 1)
+            stopped_early = True
+            break
+        logger.info("Starting batch %d: %d loans", number + 1, len(rows))
+        # Incumbent records also name their batch
+        report = None if incumbent is None else (lambda record, batch=number + 1: incumbent({**record, 'batch': batch}))
+        with telemetry.phase("batch", batch=number + 1, loans=len(rows)):
+            batch = optimize_sequential(
+                loans_to_assign.take(rows),
+                batch_facilities(working, rows, used),
+                take_loans(asset_acc_matrix, rows),
+                optimization_order_file,
+                builder=builder,
+                mode=mode,
+                tolerance=tolerance,
+                solver=solver,
+                warm_start=warm_start,
+                solver_options=solver_options,
+                formulation=formulation,
+                step_time_limit=step_time_limit,
+                run_time_limit=remaining,
+                mip_gap=mip_gap,
+                incumbent=report,
+                stopped=stopped
+            )
+        stopped_early = stopped_early or batch['stopped_early']
+        values = batch['objective_values']
+        objective_values[:len(values)] += values
+        if 'heuristic_objective_values' in batch:
+            heuristic_values += batch['heuristic_objective_values']
+        batch_assignments = [(int(rows[i]), j) for i, j in batch['assignments']]
+        assignments.extend(batch_assignments)
+        batches.append({'loans': len(rows), 'assigned': len(batch_assignments), 'objective_values': values})
+
+        # The batch's loans now count as existing loans of their facilities
+        pairs = np.asarray(batch_assignments, dtype=np.int64).reshape(-1, 2)
+        for j, facility in enumerate(working):
+            loan_indices = pairs[pairs[:, 1] == j, 0]
+            if len(loan_indices):
+                used[j] = True
+                for pool_covenant in facility.pool_covenants:
+                    pool_covenant.add_new_loans(loan_indices)
+
+    assignments.sort()
+    final_results = {
+        'objective_values': [],
+        'assignments': assignments,
+        'loans_by_facility': {},
+        'unassigned_loans': [],
+        'facility_stats': {},
+        'batches': batches,
+        'lp_bound': None,
+        'bound_gap': None,
+        'stopped_early': stopped_early
+    }
+    if optimization_steps:
+        final_results['objective_values'] = objective_values.tolist()
+        final_results.update(solution_details(assignment_vector(assignments, len(loans_to_assign)),
+                                              loans_to_assign, facilities))
+    if warm_start == 'greedy':
+        final_results['heuristic_objective_values'] = heuristic_values.tolist()
+        final_results['heuristic_gaps'] = objective_gaps(heuristic_values.tolist(), final_results['objective_values'])
+
+    if lp_bound and optimization_steps:
+        first_step = optimization_steps[0]
+        with telemetry.phase("lp_bound"):
+            bound = lp_relaxation_bound(loans_to_assign, facilities, asset_acc_matrix, first_step, formulation)
+        final_results['lp_bound'] = bound
+        final_results['bound_gap'] = bound_gap(objective_values[0], bound, first_step['Type'])
+        logger.info("Batched %s: %s, LP bound: %s, gap: %s", first_step['Input'], objective_values[0], bound,
+                    final_results['bound_gap'])
+
+    return final_results
+
 def apply_assignments(assignments: List[Tuple[int, int]], 
-                     loans_to_assign: List[Loan], 
+                     loans_to_assign: LoanBook, 
                      facilities: List[Facility]):
     """
     Apply the optimized assignments to the facilities
     """
-    for assignment in assignments:
-        loan_index = assignment[0]
-        facility_index = assignment[1]
-        loan_to_assign = loans_to_assign[loan_index]
-        facility_to_assign = facilities[facility_index]
-        facility_to_assign.add_existing_loans(existing_loans=[loan_to_assign])
+    if not len(assignments):
+        return
+    pairs = np.asarray(assignments, dtype=np.int64).reshape(-1, 2)
+    for facility_index, facility_to_assign in enumerate(facilities):
+        loan_indices = pairs[pairs[:, 1] == facility_index, 0]
+        if len(loan_indices):
+            facility_to_assign.assign_new_loans(loans_to_assign, loan_indices)
 
 def run_optimization_process(new_loans_df, asset_acc_matrix, facilities, 
-                           existing_loans_file, order_df):
-    """Run complete optimization process"""
-    # Start with empty facilities
-    for facility in facilities:
-        facility.existing_loans = []
-    
-    # First load historical assignments
-    load_existing_loans(facilities, existing_loans_file)
+                           existing_loans_file, order_df, builder='sparse', mode='persistent',
+                           solver='gurobi', batch_size=None, batch_order='objective',
+                           warm_start=None, solver_options=None, formulation='standard',
+                           step_time_limit=None, run_time_limit=None, mip_gap=None, incumbent=None, stopped=None):
+    """
+    Run complete optimization process; tapes larger than batch_size are solved in batches
+    and mode='greedy' only runs the greedy allocator as a quick preview.
+    step_time_limit, run_time_limit, mip_gap, incumbent and stopped make the solves anytime
+    (see optimize_sequential); a run stopped early applies its best assignments.
+    With existing_loans_file=None the facilities already hold the portfolio (an
+    incremental run) and combined_df only has the newly assigned loans.
+    """
+    if existing_loans_file is not None:
+        # Start with empty facilities
+        for facility in facilities:
+            facility.existing_loans = LoanBook.empty()
+
+        # First load historical assignments
+        with telemetry.phase("load_existing_loans"):
+            load_existing_loans(facilities, existing_loans_file)
     
-    # Convert new loans to Loan objects
-    new_loans = [Loan(**new_loans_df.iloc[row]) for row in range(len(new_loans_df))]
-    print(f"Processing {len(new_loans)} new loans")
+    # Convert new loans to a columnar LoanBook
+    new_loans = as_loan_book(new_loans_df)
+    logger.info("Processing %d new loans", len(new_loans))
       
     # Run optimization
-    results = optimize_sequential(
-        loans_to_assign=new_loans,
-        facilities=facilities,
-        asset_acc_matrix=asset_acc_matrix,
-        optimization_order_file = order_df
-    )
-    
-    # Apply new assignments
-    apply_assignments(results['assignments'], new_loans, facilities)
+    if mode == 'greedy':
+        results = optimize_greedy(new_loans, facilities, asset_acc_matrix, order_df)
+    elif batch_size and len(new_loans) > batch_size:
+        results = optimize_batched(
+            loans_to_assign=new_loans,
+            facilities=facilities,
+            asset_acc_matrix=asset_acc_matrix,
+            optimization_order_file=order_df,
+            batch_size=batch_size,
+            batch_order=batch_order,
+            builder=builder,
+            mode=mode,
+            solver=solver,
+            warm_start=warm_start,
+            solver_options=solver_options,
+            formulation=formulation,
+            step_time_limit=step_time_limit,
+            run_time_limit=run_time_limit,
+            mip_gap=mip_gap,
+            incumbent=incumbent,
+            stopped=stopped
+        )
+    else:
+        results = optimize_sequential(
+            loans_to_assign=new_loans,
+            facilities=facilities,
+            asset_acc_matrix=asset_acc_matrix,
+            optimization_order_file = order_df,
+            builder=builder,
+            mode=mode,
+            solver=solver,
+            warm_start=warm_start,
+            solver_options=solver_options,
+            formulation=formulation,
+            step_time_limit=step_time_limit,
+            run_time_limit=run_time_limit,
+            mip_gap=mip_gap,
+            incumbent=incumbent,
+            stopped=stopped
+        )
     
-    # Update existing loans CSV by appending only the new assignments
-    combined_df = update_existing_loans_csv(facilities, existing_loans_file)
+    # Apply new assignments and append only them to the existing loans
+    with telemetry.phase("apply_assignments", assigned=len(results['assignments'])):
+        apply_assignments(results['assignments'], new_loans, facilities)
+        if existing_loans_file is None:
+            combined_df = new_assignments_frame(results['assignments'], new_loans)
+        else:
+            combined_df = update_existing_loans_csv(facilities, existing_loans_file)
 
     
     return results, facilities, combined_df
\ No newline at end of file
@@ -0,0 +1,125 @@
+# Description: The end-to-end allocation pipeline on files, shared by the dashboard jobs and the CLI.
+
+import logging
+from typing import Any, Callable, Dict
+import pandas as pd
+from backend.facility_creation import create_facilities_from_config
+from backend.covenant_engine import build_compatibility_matrix
+from backend.loan_tape import EXISTING_LOAN_COLUMNS, read_loan_tape
+from backend.optimization import preview_relaxation, run_optimization_process
+from backend.portfolio import PortfolioStore, config_key, duplicate_loan_ids
+from backend import telemetry
+
+logger = logging.getLogger("loan_optimizer.pipeline")
+
+
+def run_pipeline(loan_path: str, facility_path: str, order_path: str, existing_loan_path: str,
+                 settings: Dict[str, Any] = None, progress: Callable[[str], None] = None,
+                 portfolio_path: str = None, preview: Callable[[Dict[str, Any]], None] = None,
+                 incumbent: Callable[[Dict[str, Any]], None] = None, stopped: Callable[[], bool] = None) -> Dict[str, Any]:
+    """
+    Read the four input files, build the facilities and the compatibility matrix and run
+    run_optimization_process with `settings` (builder, mode, solver, ...). Phases and
+    solves are recorded by the active telemetry collector, if any.
+
+    With portfolio_path the facility portfolio is kept in that PortfolioStore between
+    runs. A run against a store for the same facility config skips the existing loans
+    file, only evaluates covenants over the new loans, and ignores loans the portfolio
+    already holds; its combined_df then has the newly assigned loans only, which are
+    appended to the store as the run's snapshot. Without a usable store the portfolio is
+    rebuilt from existing_loan_path, or started empty if that is None.
+
+    With a `preview` callback the LP relaxation of the steps (preview_relaxation) is solved
+    before the optimization and handed to it, so a caller can show bounds and covenant
+    shadow prices while the MIP runs; the result's 'preview' holds it too. incumbent and
+    stopped are passed on to run_optimization_process, to follow a run's incumbents and to
+    stop it early while keeping its best allocation. Phase names go to progress, or are
+    logged without it.
+    """
+    progress = progress or logger.info
+    store = None
+    if portfolio_path is not None:
+        key = config_key(facility_path)
+        store = PortfolioStore(portfolio_path)
+        if store.latest_run() is not None and store.config_key != key:
+            logger.info("Facility config changed, rebuilding the portfolio from the existing loans file")
+        if store.config_key != key:
+            store.reset(key)
+    try:
+        return _run(loan_path, facility_path, order_path, existing_loan_path, settings, progress, store, preview,
+                    incumbent, stopped)
+    finally:
+        if store is not None:
+            store.close()
+
+
+def _run(loan_path: str, facility_path: str, order_path: str, existing_loan_path: str,
+         settings: Dict[str, Any], progress: Callable[[str], None], store: PortfolioStore,
+         preview: Callable[[Dict[str, Any]], None], incumbent: Callable[[Dict[str, Any]], None],
+         stopped: Callable[[], bool]) -> Dict[str, Any]:
+    # Incremental when the store already holds a run for this config
+    incremental = store is not None and store.latest_run() is not None
+
+    # Loan tapes are read chunk by chunk with the declared loan schema
+    progress("Reading files")
+    with telemetry.phase("read_files"):
+        loans_to_assign = read_loan_tape(loan_path)
+        if not incremental and existing_loan_path is not None:
+            existing_loan_df = read_loan_tape(existing_loan_path, extra_columns=EXISTING_LOAN_COLUMNS).to_frame()
+        else:
+            existing_loan_df = pd.DataFrame(columns=list(EXISTING_LOAN_COLUMNS))
+        if incremental:
+            held = store.held(loans_to_assign['LOAN_ID'])
+            if held.any():
+                logger.info("Skipping %d loans the portfolio already holds", int(held.sum()))
+                loans_to_assign = loans_to_assign.take(~held)
+        if store is not None:
+            # The store holds every loan once; fail here rather than after the solve
+            loan_ids = list(existing_loan_df.get('LOAN_ID', ())) + list(loans_to_assign['LOAN_ID'])
+            repeated = duplicate_loan_ids(loan_ids)
+            if repeated:
+                raise ValueError(f"The portfolio holds every loan once, but {len(repeated)} LOAN_IDs are repeated "
+                                 f"in the loan tape or existing loans, e.g. {repeated[0]}")
+        pre_facility_df = pd.read_csv(facility_path)
+        order_df = pd.read_csv(order_path)
+
+    progress("Building facilities")
+    facilities = list(create_facilities_from_config(pre_facility_df, existing_loan_df, loans_to_assign).values())
+    if incremental:
+        with telemetry.phase("load_portfolio"):
+            store.restore_facilities(facilities)
+
+    # Matrix of loans x facilities compatibility
+    progress("Checking compatibility")
+    with telemetry.phase("compatibility"):
+        asset_acc_matrix = build_compatibility_matrix(loans_to_assign, facilities)
+
+    relaxation = None
+    if preview is not None and len(loans_to_assign):
+        progress("Solving the LP relaxation")
+        with telemetry.phase("preview"):
+            relaxation = preview_relaxation(loans_to_assign, facilities, asset_acc_matrix, order_df,
+                                            formulation=(settings or {}).get('formulation', 'standard'))
+        preview(relaxation)
+
+    progress("Optimizing")
+    results, facilities, combined_df = run_optimization_process(
+        loans_to_assign, asset_acc_matrix,
+        facilities,
+        None if incremental else existing_loan_df, order_df,
+        incumbent=incumbent, stopped=stopped,
+        **(settings or {})
+    )
+
+    if store is not None:
+        # The first run stores the whole book, later runs append their new loans
+        with telemetry.phase("save_portfolio"):
+            store.append_run(combined_df, facilities, source=loan_path)
+
+    return {
+        'loans': loans_to_assign,
+        'facilities': facilities,
+        'results': results,
+        'combined_df': combined_df,
+        'preview': relaxation,
+    }
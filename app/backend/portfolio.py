@@ -0,0 +1,212 @@
+# Description: Facility portfolio persisted between runs in an embedded SQLite store, so a daily
+# run only processes its new loans. Loans are appended per run and indexed by LOAN_ID and by
+# facility; each run also records the pool covenant aggregates it left, so any earlier run can
+# be read back as a snapshot. The store is tied to the facility config it was built with.
+
+import hashlib
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from backend.loan_book import LOAN_COLUMNS, LOAN_FIELDS, LoanBook
+from backend.models import Facility
+
+# Bump when the schema changes; stores of another version are rebuilt instead of read
+PORTFOLIO_VERSION = 4
+
+# Parameters per IN (...) query, below SQLite's historical limit of 999
+_CHUNK = 900
+
+_COLUMN_TYPES = {'float64': 'REAL', 'int64': 'INTEGER', 'str': 'TEXT'}
+
+
+def _schema() -> List[str]:
+    loan_columns = ", ".join(f'"{field}" {_COLUMN_TYPES[dtype]}' for field, dtype in LOAN_COLUMNS.items())
+    return [
+        "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)",
+        "CREATE TABLE runs (run_id INTEGER PRIMARY KEY, created_at TEXT, source TEXT, num_loans INTEGER)",
+        f"CREATE TABLE loans (facility_id INTEGER NOT NULL, run_id INTEGER NOT NULL, {loan_columns})",
+        # A loan is held by at most one facility, which append_run checks; facility reads are by (facility, run)
+        'CREATE INDEX loans_loan_id ON loans ("LOAN_ID")',
+        "CREATE INDEX loans_facility ON loans (facility_id, run_id)",
+        "CREATE TABLE aggregates (run_id INTEGER, facility_id INTEGER, covenant INTEGER, existing_ab REAL,"
+        " existing_b REAL, existing_count INTEGER, PRIMARY KEY (run_id, facility_id, covenant))",
+    ]
+
+
+def duplicate_loan_ids(loan_ids: Any) -> List[str]:
+    """LOAN_IDs that appear more than once, in the order they first repeat."""
+    loan_ids = pd.Series(np.asarray(loan_ids, dtype=object).astype(str))
+    return loan_ids[loan_ids.duplicated()].unique().tolist()
+
+
+def _id_list(loan_ids: List[str], limit: int = 5) -> str:
+    listed = ", ".join(loan_ids[:limit])
+    return listed if len(loan_ids) <= limit else f"{listed} and {len(loan_ids) - limit} more"
+
+
+def config_key(facility_path: str) -> str:
+    """Hash of the facility config file; a store built with another config is not reused."""
+    digest = hashlib.sha256(f"v{PORTFOLIO_VERSION}".encode())
+    with open(facility_path, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+class PortfolioStore:
+    """
+    The portfolio of one scenario in a SQLite file. Runs only ever append loans and
+    aggregates, so writing a run never rewrites the book, and reads take a run_id to see
+    the portfolio as it was after that run (the latest run by default).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != PORTFOLIO_VERSION:
+            self._create()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> "PortfolioStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _create(self):
+        """(Re)create an empty store, dropping the tables of an older schema."""
+        with self.connection:
+            for (table,) in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                self.connection.execute(f'DROP TABLE "{table}"')
+            for statement in _schema():
+                self.connection.execute(statement)
+            self.connection.execute(f"PRAGMA user_version = {PORTFOLIO_VERSION}")
+
+    @property
+    def config_key(self) -> Optional[str]:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'config_key'").fetchone()
+        return None if row is None else row[0]
+
+    def reset(self, key: str):
+        """Empty the store and tie it to a facility config."""
+        self._create()
+        with self.connection:
+            self.connection.execute("INSERT INTO meta VALUES ('config_key', ?)", (key,))
+
+    def latest_run(self) -> Optional[int]:
+        return self.connection.execute("SELECT MAX(run_id) FROM runs").fetchone()[0]
+
+    def runs(self) -> pd.DataFrame:
+        return pd.read_sql_query("SELECT * FROM runs ORDER BY run_id", self.connection)
+
+    def held(self, loan_ids: Any) -> np.ndarray:
+        """Mask of the given LOAN_IDs the portfolio already holds, looked up by index."""
+        loan_ids = np.asarray(loan_ids, dtype=object).astype(str)
+        found = set()
+        for start in range(0, len(loan_ids), _CHUNK):
+            chunk = loan_ids[start:start + _CHUNK].tolist()
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self.connection.execute(f'SELECT "LOAN_ID" FROM loans WHERE "LOAN_ID" IN ({placeholders})', chunk)
+            found.update(loan_id for (loan_id,) in rows)
+        return np.fromiter((loan_id in found for loan_id in loan_ids), dtype=bool, count=len(loan_ids))
+
+    def facility_book(self, facility_id: int, run_id: int = None) -> LoanBook:
+        """Loans one facility held after a run, in the order they were added."""
+        run_id = self.latest_run() if run_id is None else run_id
+        fields = ", ".join(f'"{field}"' for field in LOAN_FIELDS)
+        frame = pd.read_sql_query(
+            f"SELECT {fields} FROM loans WHERE facility_id = ? AND run_id <= ? ORDER BY rowid",
+            self.connection, params=(int(facility_id), -1 if run_id is None else int(run_id))
+        )
+        return LoanBook.from_frame(frame)
+
+    def snapshot_frame(self, run_id: int = None) -> pd.DataFrame:
+        """The whole portfolio after a run, in the combined existing-loans format."""
+        run_id = self.latest_run() if run_id is None else run_id
+        fields = ", ".join(f'"{field}"' for field in ['facility_id'] + LOAN_FIELDS)
+        return pd.read_sql_query(
+            f"SELECT {fields} FROM loans WHERE run_id <= ? ORDER BY facility_id, rowid",
+            self.connection, params=(-1 if run_id is None else int(run_id),)
+        )
+
+    def aggregates(self, run_id: int = None) -> Dict[int, List[tuple]]:
+        """(existing_ab, existing_b, existing_count) of every pool covenant, by facility, after a run."""
+        run_id = self.latest_run() if run_id is None else run_id
+        rows = self.connection.execute(
+            "SELECT facility_id, existing_ab, existing_b, existing_count FROM aggregates"
+            " WHERE run_id = ? ORDER BY facility_id, covenant", (run_id,)
+        )
+        aggregates = {}
+        for facility_id, existing_ab, existing_b, existing_count in rows:
+            aggregates.setdefault(facility_id, []).append((existing_ab, existing_b, existing_count))
+        return aggregates
+
+    def append_run(self, loans: pd.DataFrame, facilities: List[Facility], source: str = None) -> int:
+        """
+        Record a run in one transaction: its loans (combined format, facility_id first) are
+        appended and the facilities' pool covenant aggregates stored. Returns the run_id.
+        Raises ValueError, leaving the store unchanged, if a LOAN_ID is repeated in the run
+        or already held.
+        """
+        repeated = duplicate_loan_ids(loans['LOAN_ID'])
+        if repeated:
+            raise ValueError(f"LOAN_IDs repeated in the run: {_id_list(repeated)}")
+        held = self.held(loans['LOAN_ID'])
+        if held.any():
+            already = loans['LOAN_ID'][held].astype(str).tolist()
+            raise ValueError(f"LOAN_IDs the portfolio already holds: {_id_list(already)}")
+        run_id = (self.latest_run() or 0) + 1
+        columns = ['facility_id'] + LOAN_FIELDS
+        frame = loans.reindex(columns=columns).astype(object)
+        frame = frame.where(frame.notna(), None)
+        frame.insert(1, 'run_id', run_id)
+        names = ", ".join(f'"{column}"' for column in frame.columns)
+        placeholders = ", ".join("?" * len(frame.columns))
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?)",
+                (run_id, datetime.now(timezone.utc).isoformat(), source, len(frame))
+            )
+            self.connection.executemany(f"INSERT INTO loans ({names}) VALUES ({placeholders})",
+                                        frame.itertuples(index=False, name=None))
+            self.connection.executemany(
+                "INSERT INTO aggregates VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, facility_id, number, float(covenant.existing_ab), float(covenant.existing_b),
+                  int(covenant.existing_count))
+                 for facility_id, facility in enumerate(facilities)
+                 for number, covenant in enumerate(facility.pool_covenants)]
+            )
+        return run_id
+
+    def facility_totals(self, run_id: int = None) -> Dict[int, tuple]:
+        """(count, orig_amt sum, CSCORE_B sum) of every facility's loans after a run, summed in SQLite."""
+        run_id = self.latest_run() if run_id is None else run_id
+        rows = self.connection.execute(
+            'SELECT facility_id, COUNT(*), TOTAL("orig_amt"), TOTAL("CSCORE_B") FROM loans'
+            " WHERE run_id <= ? GROUP BY facility_id", (-1 if run_id is None else int(run_id),)
+        )
+        return {facility_id: (count, value, score) for facility_id, count, value, score in rows}
+
+    def restore_facilities(self, facilities: List[Facility], run_id: int = None):
+        """
+        Give facilities built from the config (without existing loans) their pool covenant
+        aggregates and book totals after a run, instead of re-evaluating every covenant.
+        The held loans themselves are not read: existing_loans stays empty and only
+        collects the loans a new run assigns, so a run's cost follows its own tape.
+        """
+        aggregates = self.aggregates(run_id)
+        totals = self.facility_totals(run_id)
+        for facility_id, facility in enumerate(facilities):
+            facility_aggregates = aggregates.get(facility_id, [])
+            if len(facility_aggregates) != len(facility.pool_covenants):
+                raise ValueError("The portfolio store does not match the facility config")
+            facility.existing_loans = LoanBook.empty()
+            facility.stored_count, facility.stored_value, facility.stored_score = totals.get(facility_id, (0, 0.0, 0.0))
+            for covenant, (existing_ab, existing_b, existing_count) in zip(facility.pool_covenants, facility_aggregates):
+                covenant.existing_ab = existing_ab
+                covenant.existing_b = existing_b
+                covenant.existing_count = existing_count
@@ -0,0 +1,75 @@
+# Description: On-disk, content-addressed cache of optimization results with size-bounded LRU eviction.
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, Iterable
+
+# Bump when the cached result layout changes, so old entries are never read back
+CACHE_VERSION = 4
+
+
+def content_key(contents: Iterable[bytes], settings: Dict[str, Any]) -> str:
+    """Hash of the input files' contents (or their digests), in order, together with the solver settings."""
+    digest = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    for content in contents:
+        # Length prefix, so moving bytes between files changes the key
+        digest.update(len(content).to_bytes(8, 'little'))
+        digest.update(content)
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Results stored one pickle per key. Reads refresh an entry's modification time, and
+    writes evict the least recently used entries until the cache fits in `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key: str) -> Any:
+        """Cached result for a key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(path)
+        return result
+
+    def put(self, key: str, result: Any):
+        # Written to a temporary file first, so readers never see a partial entry
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
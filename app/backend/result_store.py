@@ -0,0 +1,107 @@
+# Description: Server-side store of the loan-level output of dashboard runs. Each run's combined
+# loans are written once as Parquet (CSV without pyarrow) and read back memory-mapped, downloads
+# stream them as CSV batch by batch, and artifacts are evicted after a TTL or when the store
+# outgrows its size limit, so finished jobs only hold a key instead of the frame.
+
+import os
+import tempfile
+import time
+from typing import Iterator, Optional
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Without pyarrow, artifacts are stored as CSV
+    pa = None
+    pq = None
+
+# Rows per streamed CSV chunk
+DOWNLOAD_BATCH_ROWS = 50_000
+
+
+class ResultStore:
+    """
+    Artifacts stored one file per key. Reads refresh an artifact's modification time;
+    writes drop artifacts unused for `ttl_seconds` and then the least recently used ones
+    until the store fits in `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024, ttl_seconds: float = 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.suffix = ".parquet" if pq is not None else ".csv"
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def put(self, key: str, frame: pd.DataFrame) -> str:
+        """Store a frame under a key and return the key."""
+        # Written to a temporary file first, so readers never see a partial artifact
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(handle)
+        if pq is not None:
+            pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), temp_path)
+        else:
+            frame.to_csv(temp_path, index=False)
+        os.replace(temp_path, self._path(key))
+        self._evict()
+        return key
+
+    def exists(self, key: Optional[str]) -> bool:
+        return key is not None and os.path.exists(self._path(key))
+
+    def read(self, key: str) -> pd.DataFrame:
+        """The stored frame; Parquet artifacts are memory-mapped rather than read into a buffer."""
+        path = self._path(key)
+        os.utime(path)
+        if pq is not None:
+            return pq.read_table(path, memory_map=True).to_pandas()
+        return pd.read_csv(path)
+
+    def iter_csv(self, key: str, batch_rows: int = DOWNLOAD_BATCH_ROWS) -> Iterator[bytes]:
+        """The stored frame as CSV, one chunk of encoded rows at a time."""
+        path = self._path(key)
+        os.utime(path)
+        if pq is None:
+            # Already CSV: stream the file as it is
+            with open(path, "rb") as f:
+                while True:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        return
+                    yield chunk
+        parquet = pq.ParquetFile(path, memory_map=True)
+        if parquet.metadata.num_rows == 0:
+            yield parquet.schema_arrow.empty_table().to_pandas().to_csv(index=False).encode()
+            return
+        header = True
+        for batch in parquet.iter_batches(batch_size=batch_rows):
+            yield batch.to_pandas().to_csv(index=False, header=header).encode()
+            header = False
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith((".parquet", ".csv")):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                    if now - stat.st_mtime > self.ttl_seconds:
+                        os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,288 @@
+# Description: Solver backends for the assignment model. The HiGHS backend needs no Gurobi license.
+
+import time
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+from backend.loan_book import LoanBook
+from backend.model_builder import AssignmentProblem, assignment_pairs, build_assignment_problem
+from backend.models import Facility
+
+
+class SolverBackend:
+    """
+    One assignment model held by a solver. optimize_sequential drives it step by step:
+    lock earlier objectives, set the step's objective, optionally warm-start, optimize.
+    """
+    name = None
+
+    def add_lock(self, input_field: str, value: float, tolerance: float):
+        """Keep a previous step's objective at `value - tolerance` or better."""
+        raise NotImplementedError
+
+    def clear_locks(self):
+        """Drop every lock, so the steps can be solved again from the first."""
+        raise NotImplementedError
+
+    def update_parameters(self):
+        """
+        Re-read facility costs and pool covenant limits from the facilities after they
+        changed. The variables and rows are kept: only right-hand sides, the coefficients
+        of changed covenant rows and objective coefficients are updated.
+        """
+        raise NotImplementedError
+
+    def set_objective(self, objective_type: str, input_field: str):
+        raise NotImplementedError
+
+    def set_start(self):
+        """Use the last solution as the start of the next solve, where the solver supports it."""
+
+    def set_start_assignments(self, assignments: List[Tuple[int, int]]):
+        """Start the next solve from given (loan, facility) pairs, where the solver supports it."""
+
+    def set_limits(self, time_limit: float = None, mip_gap: float = None):
+        """Time limit (seconds) and relative MIP gap target of the next solves; None keeps the current one."""
+        raise NotImplementedError
+
+    def optimize(self, incumbent: Callable[[float, float], None] = None, stopped: Callable[[], bool] = None):
+        """
+        Solve the model. incumbent(value, bound) is called with improving solutions and the
+        objective bound as the solver finds them; the solve ends early, keeping its best
+        solution, once stopped() returns True. Both are honoured as far as the solver allows.
+        """
+        raise NotImplementedError
+
+    @property
+    def is_optimal(self) -> bool:
+        raise NotImplementedError
+
+    @property
+    def has_solution(self) -> bool:
+        raise NotImplementedError
+
+    @property
+    def objective_value(self) -> float:
+        raise NotImplementedError
+
+    def assignment_vector(self) -> np.ndarray:
+        """Facility of every loan in the last solution, -1 if unassigned."""
+        raise NotImplementedError
+
+    def assignments(self) -> List[Tuple[int, int]]:
+        """(loan, facility) pairs of the last solution, ordered by loan."""
+        return assignment_pairs(self.assignment_vector())
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Model size and statistics of the last solve: num_vars, num_constrs, num_nonzeros,
+        runtime (seconds), mip_gap, node_count and status. Unknown values are None.
+        """
+        raise NotImplementedError
+
+
+def _optional(convert: Any, value: Any) -> Any:
+    return None if value is None else convert(value)
+
+
+def objective_vectors(problem: AssignmentProblem, input_field: str, loans_to_assign: LoanBook,
+                      facilities: List[Facility]) -> Tuple[np.ndarray, np.ndarray]:
+    """Objective coefficients on the pair variables and on the facility usage variables."""
+    if input_field == 'facility_cost':
+        costs = np.array([float(facility.facility_cost) for facility in facilities])
+        return np.zeros(problem.num_vars), costs
+    return problem.field_coefficients(loans_to_assign[input_field]), np.zeros(problem.num_facilities)
+
+
+class HighsBackend(SolverBackend):
+    """
+    The sparse assignment model solved with HiGHS through scipy.optimize.milp.
+
+    The variable vector is the pair variables followed by one facility usage binary
+    per facility; the usage variables are only linked to the pairs once a
+    facility_cost objective is used. milp takes no MIP start, so set_start is a no-op, and
+    no callback, so optimize only reports the final incumbent and cannot be stopped.
+    With relaxed=True every variable is continuous and the model is its LP relaxation,
+    solved with linprog, which also reports row duals (covenant_sensitivity).
+    formulation is one of model_builder.FORMULATIONS.
+    """
+    name = 'highs'
+
+    # scipy.optimize.milp status codes
+    STATUS_NAMES = {0: 'OPTIMAL', 1: 'LIMIT_REACHED', 2: 'INFEASIBLE', 3: 'UNBOUNDED', 4: 'OTHER'}
+
+    def __init__(self, name: str, loans_to_assign: LoanBook, facilities: List[Facility],
+                 asset_acc_matrix: Any, builder: str = 'sparse', mip_rel_gap: float = 1e-4,
+                 time_limit: float = None, relaxed: bool = False, formulation: str = 'standard'):
+        if builder != 'sparse':
+            raise ValueError("The HiGHS backend only supports the sparse model builder")
+        self.model_name = name
+        self.loans_to_assign = loans_to_assign
+        self.facilities = facilities
+        self.problem = build_assignment_problem(len(loans_to_assign), facilities, asset_acc_matrix, formulation)
+        self.options = {'disp': False, 'mip_rel_gap': mip_rel_gap}
+        if time_limit is not None:
+            self.options['time_limit'] = time_limit
+
+        self.num_columns = self.problem.num_vars + self.problem.num_facilities
+        self.relaxed = relaxed
+        self.integrality = np.zeros(self.num_columns) if relaxed else np.ones(self.num_columns)
+        self.rows, self.lower, self.upper = [], [], []
+        self._add_rows(self.problem.one_per_loan, -np.inf, self.problem.one_per_loan_rhs)
+        self.covenant_block = len(self.rows)
+        self._add_rows(self.problem.covenant_matrix, -np.inf, self.problem.covenant_rhs)
+        # Locks are kept apart from the model rows, so clear_locks can drop them
+        self.locks, self.lock_lower = [], []
+        self.usage_linked = False
+        self.objective = np.zeros(self.num_columns)
+        self.maximize = False
+        self.result = None
+        self.runtime = None
+
+    def _add_rows(self, pair_matrix: sp.spmatrix, lower: Any, upper: Any):
+        """Add rows given over the pair variables, padded with zero facility columns."""
+        num_rows = pair_matrix.shape[0]
+        if not num_rows:
+            return
+        padding = sp.csr_matrix((num_rows, self.problem.num_facilities))
+        self.rows.append(sp.hstack([pair_matrix, padding], format='csr'))
+        self.lower.append(np.broadcast_to(lower, num_rows))
+        self.upper.append(np.broadcast_to(upper, num_rows))
+
+    def _objective_row(self, input_field: str) -> np.ndarray:
+        pair_coef, facility_coef = objective_vectors(self.problem, input_field, self.loans_to_assign, self.facilities)
+        if input_field == 'facility_cost' and not self.usage_linked:
+            # Facility usage: the pairs of an unused facility must be 0
+            pair_matrix, usage_matrix = self.problem.usage_links()
+            self.rows.append(sp.hstack([pair_matrix, usage_matrix], format='csr'))
+            self.lower.append(np.full(pair_matrix.shape[0], -np.inf))
+            self.upper.append(np.zeros(pair_matrix.shape[0]))
+            self.usage_linked = True
+        return np.concatenate([pair_coef, facility_coef])
+
+    def add_lock(self, input_field: str, value: float, tolerance: float):
+        row = self._objective_row(input_field)
+        self.locks.append(sp.csr_matrix(row))
+        self.lock_lower.append(float(value) - tolerance)
+
+    def clear_locks(self):
+        self.locks, self.lock_lower = [], []
+
+    def update_parameters(self):
+        # Objective rows read the facility costs when they are set; only the covenant block changes
+        covenant_matrix, covenant_rhs = self.problem.covenants(self.facilities)
+        if covenant_matrix.shape[0]:
+            padding = sp.csr_matrix((covenant_matrix.shape[0], self.problem.num_facilities))
+            self.rows[self.covenant_block] = sp.hstack([covenant_matrix, padding], format='csr')
+            self.upper[self.covenant_block] = covenant_rhs
+        # Kept current, as the Gurobi backend does, for covenant_sensitivity and later updates
+        self.problem.covenant_matrix, self.problem.covenant_rhs = covenant_matrix, covenant_rhs
+
+    def set_objective(self, objective_type: str, input_field: str):
+        self.objective = self._objective_row(input_field)
+        self.maximize = objective_type == 'Max'
+
+    def set_limits(self, time_limit: float = None, mip_gap: float = None):
+        if time_limit is not None:
+            self.options['time_limit'] = max(time_limit, 0.0)
+        if mip_gap is not None:
+            self.options['mip_rel_gap'] = mip_gap
+
+    def optimize(self, incumbent: Callable[[float, float], None] = None, stopped: Callable[[], bool] = None):
+        if self.relaxed:
+            self._optimize_relaxation()
+        else:
+            self._optimize_mip()
+        if incumbent is not None and self.has_solution:
+            incumbent(self.objective_value, self.objective_bound)
+
+    def _optimize_mip(self):
+        constraints = []
+        if self.rows:
+            constraints.append(LinearConstraint(
+                sp.vstack(self.rows, format='csr'),
+                np.concatenate(self.lower),
+                np.concatenate(self.upper)
+            ))
+        if self.locks:
+            constraints.append(LinearConstraint(sp.vstack(self.locks, format='csr'), self.lock_lower, np.inf))
+        start = time.perf_counter()
+        self.result = milp(
+            -self.objective if self.maximize else self.objective,
+            integrality=self.integrality,
+            bounds=Bounds(0, 1),
+            constraints=constraints,
+            options=self.options
+        )
+        self.runtime = time.perf_counter() - start
+
+    def _optimize_relaxation(self):
+        # linprog takes `A_ub @ x <= b_ub` only: model rows keep their upper bounds, in order,
+        # ahead of the negated lock rows, so the covenant rows' duals are easy to find
+        matrix = sp.vstack(self.rows, format='csr') if self.rows else sp.csr_matrix((0, self.num_columns))
+        blocks, rhs = [matrix], [np.concatenate(self.upper) if self.upper else np.zeros(0)]
+        if self.locks:
+            blocks.append(-sp.vstack(self.locks, format='csr'))
+            rhs.append(-np.asarray(self.lock_lower))
+        a_ub = sp.vstack(blocks, format='csr')
+        start = time.perf_counter()
+        self.result = linprog(
+            -self.objective if self.maximize else self.objective,
+            A_ub=a_ub if a_ub.shape[0] else None,
+            b_ub=np.concatenate(rhs) if a_ub.shape[0] else None,
+            bounds=(0, 1),
+            method='highs',
+            options={key: value for key, value in self.options.items() if key != 'mip_rel_gap'}
+        )
+        self.runtime = time.perf_counter() - start
+
+    def covenant_sensitivity(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Shadow price and slack of every covenant row (problem.covenant_index order) after a
+        relaxed solve, in the unscaled row's units: the objective improvement per unit of
+        extra covenant headroom, and the headroom left (0 when the covenant binds).
+        """
+        if not self.relaxed:
+            raise ValueError("Covenant shadow prices need the relaxed model")
+        offset = sum(rows.shape[0] for rows in self.rows[:self.covenant_block])
+        count = self.problem.covenant_matrix.shape[0]
+        marginals = np.asarray(self.result.ineqlin.marginals[offset:offset + count])
+        residual = np.asarray(self.result.ineqlin.residual[offset:offset + count])
+        # Rows were multiplied by covenant_scale; linprog minimizes, so an improvement is -marginal
+        scale = self.problem.covenant_scale
+        return -marginals * scale, residual / scale
+
+    @property
+    def is_optimal(self) -> bool:
+        return self.result is not None and self.result.status == 0
+
+    @property
+    def has_solution(self) -> bool:
+        return self.result is not None and self.result.x is not None
+
+    @property
+    def objective_value(self) -> float:
+        return float(self.objective @ self.result.x)
+
+    @property
+    def objective_bound(self) -> float:
+        """Dual bound of the last MIP solve in the objective's sense; an LP is its own bound."""
+        bound = getattr(self.result, 'mip_dual_bound', None)
+        if self.relaxed or bound is None:
+            return self.objective_value
+        return -float(bound) if self.maximize else float(bound)
+
+    def assignment_vector(self) -> np.ndarray:
+        return self.problem.assignment_vector(self.result.x)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'num_vars': int(self.num_columns),
+            'num_constrs': int(sum(rows.shape[0] for rows in self.rows) + len(self.locks)),
+            'num_nonzeros': int(sum(rows.nnz for rows in self.rows + self.locks)),
+            'runtime': self.runtime,
+            'mip_gap': None if self.relaxed else _optional(float, getattr(self.result, 'mip_gap', None)),
+            'node_count': None if self.relaxed else _optional(int, getattr(self.result, 'mip_node_count', None)),
+            'status': None if self.result is None else self.STATUS_NAMES.get(self.result.status, 'OTHER'),
+        }
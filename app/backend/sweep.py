@@ -0,0 +1,192 @@
+# Description: What-if sweeps over facility sizes, pool covenant limits and facility costs.
+# Each worker process builds the model once, then for every scenario of its share of the grid
+# only updates right-hand sides and coefficients, re-solves the optimization steps and warm-starts
+# from the previous (neighbouring) scenario's solution.
+
+import copy
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from backend.loan_book import LoanBook, as_loan_book
+from backend.metrics import grouped_sums
+from backend.models import Facility
+from backend.optimization import SOLVER_BACKENDS, solve_steps
+
+# Parameters a scenario can override, keyed as (parameter, facility) or
+# ('covenant_limit', facility, covenant index); facilities are positions in the list
+PARAMETERS = ('facility_size', 'covenant_limit', 'facility_cost')
+
+
+def parameter_grid(axes: Dict[Tuple, Sequence[float]]) -> List[Dict[Tuple, float]]:
+    """
+    Every combination of the given values, e.g.
+    {('facility_size', 0): [4e6, 5e6], ('covenant_limit', 1, 0): [650, 700]} gives four scenarios.
+    The last axis varies fastest, so consecutive scenarios differ in one value.
+    """
+    keys = list(axes)
+    for key in keys:
+        if key[0] not in PARAMETERS:
+            raise ValueError(f"Unknown parameter {key[0]!r}, expected one of {', '.join(PARAMETERS)}")
+    return [dict(zip(keys, values)) for values in itertools.product(*(axes[key] for key in keys))]
+
+
+def _column(key: Tuple) -> str:
+    return "_".join(str(part) for part in key)
+
+
+def size_covenants(facility: Facility) -> List[int]:
+    """
+    Pool covenants that carry the facility size: weighted-sum covenants whose limit equals
+    facility_size (the config writes facility_space into both).
+    """
+    return [k for k, covenant in enumerate(facility.pool_covenants)
+            if covenant.constr_type and float(covenant.c) == float(facility.facility_size)]
+
+
+def apply_overrides(facilities: List[Facility], base: List[Dict[str, Any]], overrides: Dict[Tuple, float]):
+    """Reset the facilities to their base parameters, then apply a scenario's overrides."""
+    for facility, parameters in zip(facilities, base):
+        facility.facility_size = parameters['facility_size']
+        facility.facility_cost = parameters['facility_cost']
+        for covenant, limit in zip(facility.pool_covenants, parameters['limits']):
+            covenant.c = limit
+    for key, value in overrides.items():
+        facility = facilities[key[1]]
+        if key[0] == 'facility_cost':
+            facility.facility_cost = value
+        elif key[0] == 'covenant_limit':
+            facility.pool_covenants[key[2]].c = value
+        else:
+            for k in base[key[1]]['size_covenants']:
+                facility.pool_covenants[k].c = value
+            facility.facility_size = value
+
+
+def _base_parameters(facilities: List[Facility]) -> List[Dict[str, Any]]:
+    return [{
+        'facility_size': facility.facility_size,
+        'facility_cost': facility.facility_cost,
+        'limits': [covenant.c for covenant in facility.pool_covenants],
+        'size_covenants': size_covenants(facility),
+    } for facility in facilities]
+
+
+def _scenario_outcome(results: List[Dict[str, Any]]) -> Tuple[List[float], np.ndarray, str]:
+    """
+    Objective values (NaN for a step without a solution), the last solved assignment and the
+    status of a scenario's solve_steps results: OPTIMAL, or the first step's status that is not.
+    """
+    values = [np.nan if result['objective_value'] is None else result['objective_value'] for result in results]
+    solved = [result['assignment'] for result in results if result['assignment'] is not None]
+    statuses = [result['status'] for result in results if result['status'] != 'OPTIMAL']
+    return values, solved[-1] if solved else None, statuses[0] if statuses else 'OPTIMAL'
+
+
+def _sweep_chunk(loans: LoanBook, facilities: List[Facility], asset_acc_matrix: Any, steps: List[Dict],
+                 scenarios: List[Tuple[int, Dict[Tuple, float]]], solver: str, formulation: str,
+                 tolerance: float, solver_options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Worker body: one model for a contiguous share of the grid."""
+    base = _base_parameters(facilities)
+    backend = None
+    rows = []
+
+    def build(step: Dict) -> Any:
+        return SOLVER_BACKENDS[solver]("sweep", loans, facilities, asset_acc_matrix,
+                                       formulation=formulation, **solver_options)
+
+    for index, overrides in scenarios:
+        apply_overrides(facilities, base, overrides)
+        if backend is not None:
+            # Start from the neighbouring scenario's solution; then only parameters change
+            if backend.has_solution:
+                backend.set_start()
+            backend.clear_locks()
+            backend.update_parameters()
+        results, _, backend = solve_steps(backend, steps, tolerance, build=build, solver=solver)
+        values, assignment, status = _scenario_outcome(results)
+        rows.append({'scenario': index, 'overrides': overrides, 'objective_values': values,
+                     'assignment': assignment, 'status': status,
+                     'facility_sizes': [float(facility.facility_size) for facility in facilities]})
+    return rows
+
+
+def _split(items: List[Any], parts: int) -> List[List[Any]]:
+    """Contiguous, near-equal shares, so neighbouring scenarios stay in one worker."""
+    bounds = np.linspace(0, len(items), parts + 1).round().astype(int)
+    return [items[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def run_sweep(
+    loans_to_assign: Any,
+    facilities: List[Facility],
+    asset_acc_matrix: Any,
+    optimization_order_file: pd.DataFrame,
+    scenarios: List[Dict[Tuple, float]],
+    solver: str = 'gurobi',
+    formulation: str = 'standard',
+    tolerance: float = 1e-4,
+    workers: int = 1,
+    solver_options: Dict[str, Any] = None
+) -> pd.DataFrame:
+    """
+    Solve the optimization steps for every scenario of overrides (see parameter_grid) and
+    return a tidy table: one row per scenario and facility with the scenario's overrides,
+    status and objective values, and the facility's new loans, value and utilisation
+    (existing plus new value over facility size). The facilities are not modified.
+
+    The grid is split into `workers` contiguous shares, each solved by one process with
+    one model; workers=1 solves in this process.
+    """
+    loans = as_loan_book(loans_to_assign)
+    steps = optimization_order_file.to_dict('records')
+    indexed = list(enumerate(scenarios))
+    arguments = (loans, facilities, asset_acc_matrix, steps)
+    options = (solver, formulation, tolerance, solver_options or {})
+
+    if workers <= 1:
+        # Work on copies, like the worker processes do, so the caller's facilities keep their parameters
+        results = _sweep_chunk(loans, copy.deepcopy(facilities), asset_acc_matrix, steps, indexed, *options)
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(_sweep_chunk, *arguments, chunk, *options) for chunk in _split(indexed, workers)]
+            results = [row for future in futures for row in future.result()]
+    return _sweep_table(results, loans, facilities, steps)
+
+
+def _sweep_table(results: List[Dict[str, Any]], loans: LoanBook, facilities: List[Facility],
+                 steps: List[Dict]) -> pd.DataFrame:
+    num_facilities = len(facilities)
+    existing_value = np.array([float(np.sum(facility.existing_loans['orig_amt'])) + facility.stored_value
+                               for facility in facilities])
+    amounts = np.asarray(loans['orig_amt'], dtype=float)
+    objective_columns = [f"{step['Type']} {step['Input']}" for step in steps]
+
+    frames = []
+    for result in results:
+        assignment = result['assignment']
+        if assignment is None:
+            assignment = np.full(len(loans), -1, dtype=np.int64)
+        assigned = assignment >= 0
+        new = grouped_sums(assignment[assigned], num_facilities, orig_amt=amounts[assigned])
+        sizes = np.asarray(result['facility_sizes'])
+        total = existing_value + new['orig_amt']
+        frame = pd.DataFrame({
+            'scenario': result['scenario'],
+            **{_column(key): value for key, value in result['overrides'].items()},
+            'status': result['status'],
+            **{column: (result['objective_values'][number] if number < len(result['objective_values']) else np.nan)
+               for number, column in enumerate(objective_columns)},
+            'facility': np.arange(num_facilities),
+            'facility_id': [facility.facility_id for facility in facilities],
+            'facility_size': sizes,
+            'new_loans': new['count'],
+            'new_value': new['orig_amt'],
+            'total_value': total,
+            'utilisation': np.divide(total, sizes, out=np.full(num_facilities, np.nan), where=sizes > 0),
+        })
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True).sort_values(['scenario', 'facility'], ignore_index=True)
@@ -0,0 +1,121 @@
+# Description: Structured run telemetry. Phases record wall time and memory, solve steps
+# record model size and solver statistics; every record is logged as one JSON line and
+# kept by the active collector, so the dashboard and the CLI can show it per run.
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; memory fields are then None
+    resource = None
+
+logger = logging.getLogger("loan_optimizer.telemetry")
+
+# File the JSON records are appended to; without it they go to stderr
+LOG_PATH = os.environ.get("LOAN_OPTIMIZER_TELEMETRY_LOG")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far (ru_maxrss is in KB on Linux), where available."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb() -> Optional[float]:
+    """Current resident memory, where /proc is available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def configure_logging(path: Optional[str] = LOG_PATH):
+    """
+    Write the records as bare JSON lines, and the progress messages of the other
+    loan_optimizer loggers (e.g. the solve steps) as plain lines to stderr. Later calls in
+    the same process do nothing.
+    """
+    progress = logging.getLogger("loan_optimizer")
+    if not progress.handlers:
+        progress_handler = logging.StreamHandler()
+        progress_handler.setFormatter(logging.Formatter("%(message)s"))
+        progress.addHandler(progress_handler)
+        progress.setLevel(logging.INFO)
+    if logger.handlers:
+        return
+    handler = logging.FileHandler(path) if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class RunTelemetry:
+    """Phase and solve records of one run."""
+
+    def __init__(self):
+        self.phases = []
+        self.solves = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'phases': self.phases, 'solves': self.solves}
+
+
+_active: ContextVar[Optional[RunTelemetry]] = ContextVar("telemetry", default=None)
+
+
+def _emit(kind: str, record: Dict[str, Any]):
+    logger.info(json.dumps({'event': kind, **record}, default=str))
+
+
+@contextmanager
+def collect() -> Iterator[RunTelemetry]:
+    """Collect the records of everything run inside the block."""
+    telemetry = RunTelemetry()
+    token = _active.set(telemetry)
+    try:
+        yield telemetry
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def phase(name: str, **details):
+    """Time a pipeline phase and record the memory it left behind."""
+    peak_before = peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        peak_after = peak_rss_mb()
+        record = {
+            'phase': name,
+            'seconds': time.perf_counter() - start,
+            'rss_mb': current_rss_mb(),
+            'peak_rss_mb': peak_after,
+            'peak_growth_mb': None if peak_after is None else peak_after - peak_before,
+            **details,
+        }
+        telemetry = _active.get()
+        if telemetry is not None:
+            telemetry.phases.append(record)
+        _emit('phase', record)
+
+
+def record_solve(step: Any, objective: str, stats: Dict[str, Any], **details):
+    """Record the model size and solver statistics of one optimization step."""
+    record = {'step': step, 'objective': objective, **details, **stats}
+    telemetry = _active.get()
+    if telemetry is not None:
+        telemetry.solves.append(record)
+    _emit('solve', record)
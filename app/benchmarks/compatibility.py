@@ -0,0 +1,53 @@
+# Description: Benchmark of the compatibility-matrix build, per-loan loop vs. the covenant engine.
+# Run from the app directory: python -m benchmarks.compatibility --loans 200000
+
+import argparse
+import time
+import numpy as np
+from backend.facility_creation import create_facilities_from_config
+from backend.covenant_engine import build_compatibility_matrix
+from backend.models import Loan
+from benchmarks.synthetic import resample_loans, replicate_facility_config, empty_existing_loans
+
+
+def loop_compatibility(loans_df, facilities):
+    """The original handle_upload path: one Loan object and asset_check call per pair."""
+    loans = [Loan(**loans_df.iloc[row]) for row in range(len(loans_df))]
+    asset_acc_matrix = np.zeros((len(loans), len(facilities)))
+    for i, loan in enumerate(loans):
+        for j, facility in enumerate(facilities):
+            if facility.asset_check(loan):
+                asset_acc_matrix[i][j] = 1
+    return asset_acc_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compatibility-matrix build benchmark")
+    parser.add_argument("--loans", type=int, default=20000, help="Number of loans in the synthetic tape")
+    parser.add_argument("--facilities", type=int, default=40, help="Number of facilities")
+    parser.add_argument("--loop-limit", type=int, default=20000,
+                        help="Skip the per-loan loop above this many loans (it is extrapolated instead)")
+    args = parser.parse_args()
+
+    loans_df = resample_loans(args.loans)
+    config_df = replicate_facility_config(args.facilities)
+    facilities = list(create_facilities_from_config(config_df, empty_existing_loans(), loans_df).values())
+
+    start = time.perf_counter()
+    compat = build_compatibility_matrix(loans_df, facilities)
+    engine_time = time.perf_counter() - start
+    print(f"engine: {engine_time:.4f}s, {compat.nnz} compatible pairs, {compat.packed.nbytes} bytes packed")
+
+    loop_n = min(args.loans, args.loop_limit)
+    start = time.perf_counter()
+    dense = loop_compatibility(loans_df.iloc[:loop_n], facilities)
+    loop_time = (time.perf_counter() - start) * args.loans / loop_n
+    label = "loop" if loop_n == args.loans else f"loop (extrapolated from {loop_n} loans)"
+    print(f"{label}: {loop_time:.4f}s, {args.loans * len(facilities) * dense.itemsize} bytes dense")
+
+    assert np.array_equal(dense, compat.to_dense()[:loop_n]), "engine and loop disagree"
+    print(f"speedup: {loop_time / engine_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Description: Benchmark of the model formulations: LP root bound, node count and solve time per
+# optimization step, for each solver backend.
+# Run from the app directory:
+#     python -m benchmarks.formulations --tapes subset_1.csv subset_2.csv
+#     python -m benchmarks.formulations --tapes --synthetic 2000 10 --solvers highs
+# (the pip gurobipy license is size-limited to 2000 variables and constraints)
+
+import argparse
+import os
+import pandas as pd
+from backend.facility_creation import create_facilities_from_config
+from backend.covenant_engine import build_compatibility_matrix
+from backend.loan_book import LoanBook
+from backend.model_builder import FORMULATIONS
+from backend.optimization import SOLVER_BACKENDS
+from backend.solvers import HighsBackend
+from benchmarks.synthetic import SAMPLE_DIRECTORY, empty_existing_loans, generate_loans, generate_facility_config
+
+
+def run_formulation(solver, formulation, loans, facilities, compat, steps, time_limit=None, tolerance=1e-4):
+    """
+    Solve the steps in persistent mode. Each step's root bound is the optimal value of
+    the same model's LP relaxation (same formulation and locks), solved with HiGHS.
+    """
+    backend = SOLVER_BACKENDS[solver]("bench", loans, facilities, compat, formulation=formulation,
+                                      time_limit=time_limit)
+    relaxation = HighsBackend("bench_lp", loans, facilities, compat, relaxed=True, formulation=formulation)
+    rows = []
+    prev = None
+    for step in steps:
+        if prev is not None:
+            backend.set_start()
+            if prev['input'] != 'facility_cost':
+                backend.add_lock(prev['input'], prev['value'], tolerance)
+                relaxation.add_lock(prev['input'], prev['value'], tolerance)
+        backend.set_objective(step['Type'], step['Input'])
+        relaxation.set_objective(step['Type'], step['Input'])
+        backend.optimize()
+        relaxation.optimize()
+
+        stats = backend.stats()
+        # Steps stopped by the time limit still lock their best solution
+        value = backend.objective_value if backend.has_solution else None
+        bound = relaxation.objective_value if relaxation.is_optimal else None
+        rows.append({
+            'step': step['Order'],
+            'objective': f"{step['Type']} {step['Input']}",
+            'value': value,
+            'root_bound': bound,
+            'root_gap': None if value is None or bound is None else abs(bound - value) / max(abs(value), 1e-9),
+            'status': stats['status'],
+            'nodes': stats['node_count'],
+            'seconds': stats['runtime'],
+            'constraints': stats['num_constrs'],
+        })
+        if value is not None:
+            prev = {'input': step['Input'], 'value': value}
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model formulation benchmark")
+    parser.add_argument("--tapes", nargs="*", default=["subset_1.csv", "subset_2.csv"], help="Loan tapes in sample_data")
+    parser.add_argument("--config", default="facilities_dec.csv", help="Facility config in sample_data")
+    parser.add_argument("--existing", default="combined_data(3).csv", help="Existing loans file in sample_data")
+    parser.add_argument("--synthetic", type=int, nargs=2, action="append", default=[], metavar=("LOANS", "FACILITIES"),
+                        help="Also run a synthetic instance of this size")
+    parser.add_argument("--solvers", nargs="+", default=list(SOLVER_BACKENDS), choices=list(SOLVER_BACKENDS))
+    parser.add_argument("--time-limit", type=float, default=60.0, help="Seconds per solve step")
+    parser.add_argument("--formulations", nargs="+", default=list(FORMULATIONS), choices=list(FORMULATIONS))
+    args = parser.parse_args()
+
+    steps = pd.read_csv(os.path.join(SAMPLE_DIRECTORY, "opt_order.csv")).to_dict('records')
+    instances = []
+    config_df = pd.read_csv(os.path.join(SAMPLE_DIRECTORY, args.config))
+    existing_df = pd.read_csv(os.path.join(SAMPLE_DIRECTORY, args.existing))
+    for tape in args.tapes:
+        instances.append((tape, pd.read_csv(os.path.join(SAMPLE_DIRECTORY, tape)), config_df, existing_df))
+    for num_loans, num_facilities in args.synthetic:
+        loans_df = generate_loans(num_loans)
+        instances.append((f"synthetic {num_loans}x{num_facilities}", loans_df,
+                          generate_facility_config(num_facilities, loans_df), empty_existing_loans()))
+
+    pd.set_option('display.width', 200)
+    for name, loans_df, instance_config, instance_existing in instances:
+        loans = LoanBook.from_frame(loans_df)
+        for solver in args.solvers:
+            for formulation in args.formulations:
+                facilities = list(create_facilities_from_config(instance_config, instance_existing, loans_df).values())
+                compat = build_compatibility_matrix(loans, facilities)
+                table = pd.DataFrame(run_formulation(solver, formulation, loans, facilities, compat, steps,
+                                                     args.time_limit))
+                print(f"{name} {solver} {formulation}:")
+                print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
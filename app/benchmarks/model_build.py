@@ -0,0 +1,60 @@
+# Description: Benchmark of the model builders, dense create_base_model vs. sparse create_sparse_model.
+# Run from the app directory: python -m benchmarks.model_build --loans 20000 --facilities 40
+
+import argparse
+import multiprocessing
+import time
+from backend.facility_creation import create_facilities_from_config
+from backend.covenant_engine import build_compatibility_matrix
+from backend.loan_book import LoanBook
+from backend.optimization import MODEL_BUILDERS
+from backend.telemetry import peak_rss_mb
+from benchmarks.synthetic import resample_loans, replicate_facility_config, empty_existing_loans
+
+
+def measure_build(builder, num_loans, num_facilities):
+    """Build one model in this process and report time and peak memory."""
+    loans_df = resample_loans(num_loans)
+    facilities = list(create_facilities_from_config(
+        replicate_facility_config(num_facilities), empty_existing_loans(), loans_df).values())
+    loans = LoanBook.from_frame(loans_df)
+    compat = build_compatibility_matrix(loans, facilities)
+
+    # The growth of the peak is what the build added
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    model, _ = MODEL_BUILDERS[builder]("bench", loans, facilities, compat)
+    model.update()
+    build_time = time.perf_counter() - start
+    rss_after = peak_rss_mb()
+
+    return {
+        'builder': builder,
+        'build_time': build_time,
+        'peak_rss_growth_mb': None if rss_after is None else rss_after - rss_before,
+        'solver_peak_mb': model.MaxMemUsed * 1024,
+        'vars': model.NumVars,
+        'constrs': model.NumConstrs,
+        'nonzeros': model.NumNZs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model build benchmark")
+    parser.add_argument("--loans", type=int, default=20000, help="Number of loans in the synthetic tape")
+    parser.add_argument("--facilities", type=int, default=40, help="Number of facilities")
+    parser.add_argument("--builders", nargs="+", default=list(MODEL_BUILDERS), choices=list(MODEL_BUILDERS))
+    args = parser.parse_args()
+
+    # Each builder runs in a fresh process so peak memory is not shared between them
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        for builder in args.builders:
+            r = pool.apply(measure_build, (builder, args.loans, args.facilities))
+            growth = "n/a" if r['peak_rss_growth_mb'] is None else f"+{r['peak_rss_growth_mb']:.1f} MB"
+            print(f"{r['builder']:>6}: {r['build_time']:.3f}s build, "
+                  f"{growth} peak RSS, {r['solver_peak_mb']:.1f} MB solver peak, "
+                  f"{r['vars']} vars, {r['constrs']} constrs, {r['nonzeros']} nonzeros")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# Description: End-to-end scaling benchmark on synthetic tapes, timing every pipeline phase.
+# Run from the app directory:
+#     python -m benchmarks.scaling --loans 1000 10000 100000 --facilities 5 20 --solver highs
+#     python -m benchmarks.scaling --loans 1000000 --facilities 100 --no-solve
+#     python -m benchmarks.scaling --compare benchmarks/results/scaling_<old>.json
+# Results are written as JSON (default benchmarks/results/scaling_<commit>.json) so runs
+# on different commits can be compared with --compare.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Any, Dict
+import pandas as pd
+from backend.facility_creation import create_facilities_from_config
+from backend.covenant_engine import build_compatibility_matrix
+from backend.loan_tape import EXISTING_LOAN_COLUMNS, read_loan_tape
+from backend.heuristic import greedy_allocate
+from backend.model_builder import assignment_vector
+from backend.optimization import SOLVER_BACKENDS, apply_assignments, solution_details, solve_steps
+from backend.existing_loans_handle import update_existing_loans_csv
+from backend.metrics import dashboard_metrics
+from backend.telemetry import peak_rss_mb
+from frontend.callback import generate_visualizations
+from benchmarks.synthetic import SAMPLE_DIRECTORY, generate_loans, generate_facility_config
+
+RESULTS_DIRECTORY = os.path.join(os.path.abspath(os.path.dirname(__file__)), "results")
+
+
+class PhaseTimer:
+    """Wall time of named phases, in the order they ran."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def __call__(self, name: str):
+        timer = self
+
+        class Phase:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                timer.phases[name] = timer.phases.get(name, 0.0) + time.perf_counter() - self.start
+
+        return Phase()
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_inputs(directory: str, num_loans: int, num_facilities: int, seed: int) -> Dict[str, str]:
+    """Synthetic input files, written like uploads so parsing is part of the measurement."""
+    loans = generate_loans(num_loans, seed)
+    paths = {
+        'loans': os.path.join(directory, "loans.csv"),
+        'facilities': os.path.join(directory, "facilities.csv"),
+        'existing': os.path.join(directory, "existing.csv"),
+    }
+    loans.to_csv(paths['loans'], index=False)
+    generate_facility_config(num_facilities, loans, seed).to_csv(paths['facilities'], index=False)
+    pd.DataFrame(columns=list(EXISTING_LOAN_COLUMNS) + list(loans.columns)).to_csv(paths['existing'], index=False)
+    return paths
+
+
+def run_size(num_loans: int, num_facilities: int, args: Any) -> Dict[str, Any]:
+    """One benchmark run: every pipeline phase on one synthetic instance."""
+    timer = PhaseTimer()
+    run = {'loans': num_loans, 'facilities': num_facilities, 'seed': args.seed, 'solver': args.solver, 'steps': []}
+    steps = pd.read_csv(os.path.join(SAMPLE_DIRECTORY, "opt_order.csv")).to_dict('records')
+    rss_before = peak_rss_mb()
+
+    with tempfile.TemporaryDirectory() as directory:
+        with timer("generate"):
+            paths = write_inputs(directory, num_loans, num_facilities, args.seed)
+        with timer("parse"):
+            loans = read_loan_tape(paths['loans'])
+            existing_df = read_loan_tape(paths['existing'], extra_columns=EXISTING_LOAN_COLUMNS).to_frame()
+            config_df = pd.read_csv(paths['facilities'])
+
+    with timer("facility_creation"):
+        facilities = list(create_facilities_from_config(config_df, existing_df, loans).values())
+    with timer("compatibility"):
+        compat = build_compatibility_matrix(loans, facilities)
+    run['compatible_pairs'] = compat.nnz
+
+    if args.no_solve:
+        with timer("greedy"):
+            assignments, _ = greedy_allocate(loans, facilities, compat, steps)
+            assignment = assignment_vector(assignments, len(loans))
+    else:
+        options = {} if args.time_limit is None else {'time_limit': args.time_limit}
+        with timer("model_build"):
+            backend = SOLVER_BACKENDS[args.solver]("scaling", loans, facilities, compat, **options)
+        assignment = assignment_vector([], len(loans))
+        results, _, _ = solve_steps(backend, steps, 1e-4, solver=args.solver)
+        for result in results:
+            timer.phases[f"solve_step_{result['step']}"] = result['seconds']
+            run['steps'].append({
+                'step': result['step'],
+                'input': result['input_field'],
+                'seconds': result['seconds'],
+                'optimal': result['status'] == 'OPTIMAL',
+                'objective_value': result['objective_value'],
+            })
+            if result['assignment'] is not None:
+                assignment = result['assignment']
+
+    with timer("extraction"):
+        assignments = solution_details(assignment, loans, facilities)['assignments']
+        apply_assignments(assignments, loans, facilities)
+        update_existing_loans_csv(facilities, existing_df)
+    with timer("dashboard_metrics"):
+        metrics = dashboard_metrics(loans, facilities, assignments)
+        generate_visualizations(metrics['facility_df'])
+
+    run['assigned_loans'] = len(assignments)
+    run['phases'] = timer.phases
+    rss_after = peak_rss_mb()
+    run['peak_rss_growth_mb'] = None if rss_after is None else rss_after - rss_before
+    return run
+
+
+def compare(current: Dict[str, Any], baseline_path: str):
+    """Print the phase times of matching runs as current / baseline ratios."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(run['loans'], run['facilities'], run['solver']): run for run in baseline['runs']}
+    print(f"Compared with {baseline['commit']} ({baseline_path}):")
+    for run in current['runs']:
+        old = previous.get((run['loans'], run['facilities'], run['solver']))
+        if old is None:
+            continue
+        ratios = ", ".join(
+            f"{phase} {seconds / old['phases'][phase]:.2f}x"
+            for phase, seconds in run['phases'].items()
+            if old['phases'].get(phase)
+        )
+        print(f"  {run['loans']} loans x {run['facilities']} facilities: {ratios}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline scaling benchmark on synthetic data")
+    parser.add_argument("--loans", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--facilities", type=int, nargs="+", default=[5, 20])
+    parser.add_argument("--solver", default="highs", choices=list(SOLVER_BACKENDS))
+    parser.add_argument("--time-limit", type=float, default=60.0, help="Seconds per solve step")
+    parser.add_argument("--no-solve", action="store_true", help="Use the greedy allocator instead of the MIP")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="JSON output path")
+    parser.add_argument("--compare", default=None, help="Earlier JSON result to compare with")
+    args = parser.parse_args()
+
+    commit = current_commit()
+    result = {
+        'commit': commit,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'runs': [],
+    }
+    for num_facilities in args.facilities:
+        for num_loans in args.loans:
+            run = run_size(num_loans, num_facilities, args)
+            result['runs'].append(run)
+            phases = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in run['phases'].items())
+            print(f"{num_loans} loans x {num_facilities} facilities: {phases}")
+
+    out = args.out or os.path.join(RESULTS_DIRECTORY, f"scaling_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {out}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Description: Benchmark of build and solve times per solver backend on the same instances.
+# Run from the app directory: python -m benchmarks.solvers --tapes subset_1.csv subset_2.csv
+# (the pip gurobipy license is size-limited to 2000 variables and constraints)
+
+import argparse
+import os
+import time
+import pandas as pd
+from backend.facility_creation import create_facilities_from_config
+from backend.covenant_engine import build_compatibility_matrix
+from backend.loan_book import LoanBook
+from backend.optimization import SOLVER_BACKENDS, solve_steps
+from benchmarks.synthetic import SAMPLE_DIRECTORY
+
+
+def run_backend(solver, loans, facilities, compat, steps, tolerance=1e-4):
+    """Build one backend and solve the steps in persistent mode, timing each phase."""
+    start = time.perf_counter()
+    backend = SOLVER_BACKENDS[solver]("bench", loans, facilities, compat)
+    timings = {'build': time.perf_counter() - start}
+    results, _, _ = solve_steps(backend, steps, tolerance, solver=solver)
+    objectives = []
+    for result in results:
+        timings[f"step {result['step']}"] = result['seconds']
+        objectives.append(result['objective_value'] if result['status'] == 'OPTIMAL' else None)
+    return timings, objectives
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solver backend benchmark")
+    parser.add_argument("--tapes", nargs="+", default=["subset_1.csv", "subset_2.csv"], help="Loan tapes in sample_data")
+    parser.add_argument("--config", default="facilities_dec.csv", help="Facility config in sample_data")
+    parser.add_argument("--existing", default="combined_data(3).csv", help="Existing loans file in sample_data")
+    parser.add_argument("--solvers", nargs="+", default=list(SOLVER_BACKENDS), choices=list(SOLVER_BACKENDS))
+    args = parser.parse_args()
+
+    steps = pd.read_csv(os.path.join(SAMPLE_DIRECTORY, "opt_order.csv")).to_dict('records')
+    config_df = pd.read_csv(os.path.join(SAMPLE_DIRECTORY, args.config))
+    existing_df = pd.read_csv(os.path.join(SAMPLE_DIRECTORY, args.existing))
+    for tape in args.tapes:
+        loans_df = pd.read_csv(os.path.join(SAMPLE_DIRECTORY, tape))
+        facilities = list(create_facilities_from_config(config_df, existing_df, loans_df).values())
+        loans = LoanBook.from_frame(loans_df)
+        compat = build_compatibility_matrix(loans, facilities)
+        for solver in args.solvers:
+            timings, objectives = run_backend(solver, loans, facilities, compat, steps)
+            phases = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in timings.items())
+            print(f"{tape} {solver:>6}: {phases}; objectives {objectives}")
+
+
+if __name__ == "__main__":
+    main()
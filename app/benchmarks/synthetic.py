@@ -0,0 +1,109 @@
+# Description: Synthetic inputs for the benchmarks, scaled up from the sample data.
+
+import os
+import numpy as np
+import pandas as pd
+from backend.loan_book import LOAN_COLUMNS
+
+SAMPLE_DIRECTORY = os.path.join(os.path.abspath(os.path.dirname(__file__)), "../../sample_data")
+
+
+def resample_loans(num_loans, seed=0):
+    """A loan tape of num_loans rows resampled from the sample tape."""
+    sample = pd.read_csv(os.path.join(SAMPLE_DIRECTORY, "subset_1.csv"))
+    return sample.sample(n=num_loans, replace=True, random_state=seed).reset_index(drop=True)
+
+
+def replicate_facility_config(num_facilities, name="facilities_dec.csv"):
+    """A facility config with num_facilities facilities, repeating the sample config."""
+    config_df = pd.read_csv(os.path.join(SAMPLE_DIRECTORY, name))
+    base = config_df['Number'].nunique()
+    copies = []
+    for k in range(-(-num_facilities // base)):
+        copy = config_df.copy()
+        copy['Number'] = copy['Number'] + k * base
+        copies.append(copy)
+    config_df = pd.concat(copies, ignore_index=True)
+    return config_df[config_df['Number'] < num_facilities].reset_index(drop=True)
+
+
+def empty_existing_loans():
+    return pd.DataFrame(columns=['facility_id'])
+
+
+# Columns of the facilities_*.csv config files
+CONFIG_COLUMNS = ['Command', 'Number', 'Cost', 'constr_prop', 'constr_op', 'constr_val', 'crit_prop',
+                  'crit_op', 'crit_val', 'a', 'b', 'c', 'constr_type', 'constr_op.1', 'facility_space']
+
+# Asset covenant templates: (constr_prop, constr_op, candidate values, criteria or None)
+ASSET_COVENANTS = [
+    ('orig_rt', '>=', [5.5, 6.0, 6.5, 7.0], None),
+    ('oltv', '<=', [75, 80, 85, 90, 95], None),
+    ('CSCORE_B', '>=', [660, 680, 700, 720], None),
+    ('dti', '<=', [40, 43, 45, 50], None),
+    # High-LTV loans need a better credit score
+    ('CSCORE_B', '>=', [700, 720, 740], ('oltv', '>=', 80)),
+]
+
+
+def sample_loans():
+    """Both sample tapes, with LOAN_ID kept as text."""
+    return pd.concat([
+        pd.read_csv(os.path.join(SAMPLE_DIRECTORY, name), dtype={'LOAN_ID': str})
+        for name in ("subset_1.csv", "subset_2.csv")
+    ], ignore_index=True)
+
+
+def generate_loans(num_loans, seed=0):
+    """
+    A synthetic tape with the LOAN_COLUMNS schema: whole sample rows are drawn (so related
+    fields stay consistent), then amounts, rates, LTVs and scores are jittered and every
+    loan gets a fresh 12-digit LOAN_ID.
+    """
+    rng = np.random.default_rng(seed)
+    sample = sample_loans()
+    loans = sample.iloc[rng.integers(0, len(sample), num_loans)].reset_index(drop=True)
+
+    loans['LOAN_ID'] = [f"{loan_id:012d}" for loan_id in rng.choice(10**11, num_loans, replace=False)]
+    loans['orig_amt'] = np.clip(np.round(loans['orig_amt'] * rng.lognormal(0, 0.25, num_loans), -3), 10000, 2000000)
+    loans['orig_rt'] = np.round(loans['orig_rt'] + rng.choice([-0.375, -0.25, -0.125, 0, 0.125, 0.25, 0.375], num_loans), 3)
+    loans['oltv'] = np.clip(loans['oltv'] + rng.integers(-5, 6, num_loans), 5, 97)
+    loans['ocltv'] = np.maximum(loans['ocltv'], loans['oltv'])
+    loans['dti'] = np.clip(loans['dti'] + rng.integers(-3, 4, num_loans), 1, 50)
+    loans['CSCORE_B'] = np.clip(loans['CSCORE_B'] + rng.integers(-15, 16, num_loans), 300, 850)
+    return loans[list(LOAN_COLUMNS)]
+
+
+def generate_facility_config(num_facilities, loans, seed=0, fill_ratio=0.6):
+    """
+    A facility config in the facilities_*.csv format: one or two asset covenants per
+    facility, a weighted-average credit score covenant, a CA concentration limit and a
+    size covenant. Facility sizes add up to about fill_ratio of the tape's value.
+    """
+    rng = np.random.default_rng(seed)
+    total_value = float(loans['orig_amt'].sum())
+    sizes = rng.dirichlet(np.full(num_facilities, 2.0)) * total_value * fill_ratio
+    rows = []
+    for number in range(num_facilities):
+        name = f"facility{number}"
+        cost = int(rng.integers(40000, 160000))
+        space = int(sizes[number])
+        base = {'Number': number, 'Cost': cost}
+
+        for template in rng.choice(len(ASSET_COVENANTS), int(rng.integers(1, 3)), replace=False):
+            prop, op, values, criteria = ASSET_COVENANTS[template]
+            row = dict(base, Command=f"{name}.add_asset_covenants", constr_prop=prop, constr_op=op,
+                       constr_val=rng.choice(values))
+            if criteria is not None:
+                row.update(crit_prop=criteria[0], crit_op=criteria[1], crit_val=str(criteria[2]))
+            rows.append(row)
+
+        pool = f"{name}.add_pool_covenants"
+        rows.append(dict(base, Command=pool, a="random_df['CSCORE_B'].to_list()",
+                         b="random_df['orig_amt'].to_list()", c=int(rng.choice([700, 720, 740, 760])),
+                         constr_type=0, **{'constr_op.1': 1}, facility_space=space))
+        rows.append(dict(base, Command=pool, a="(random_df['state']=='CA')*1", b="random_df['orig_amt'].to_list()",
+                         c=float(rng.choice([0.15, 0.2, 0.3])), constr_type=0, **{'constr_op.1': 0}, facility_space=space))
+        rows.append(dict(base, Command=pool, a="[1]*len(random_df)", b="random_df['orig_amt'].to_list()",
+                         c=space, constr_type=1, **{'constr_op.1': 0}, facility_space=space))
+    return pd.DataFrame(rows, columns=CONFIG_COLUMNS)
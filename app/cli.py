@@ -0,0 +1,185 @@
+# Description: Headless batch runner. Runs the allocation pipeline on every scenario of a
+# manifest, in parallel worker processes, and writes the results and a JSON summary.
+#
+#     python app/cli.py scenarios.csv --out results --workers 4 --threads 2
+#
+# The manifest (CSV or JSON list) has one scenario per row with the columns name, loans,
+# facilities, order and existing (file paths, relative to the manifest), and optionally
+# builder, mode, solver, formulation, batch_size, warm_start, step_time_limit, run_time_limit and
+# mip_gap to override the command-line defaults.
+# A portfolio column names a SQLite portfolio store kept between runs (see backend/portfolio.py); once
+# it exists, the scenario's existing loans file is not read and may be left out.
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+from backend.metrics import dashboard_metrics
+from backend.model_builder import FORMULATIONS
+from backend.pipeline import run_pipeline
+from backend import telemetry
+
+FILE_COLUMNS = ('loans', 'facilities', 'order', 'existing')
+OPTIONAL_FILE_COLUMNS = ('portfolio',)
+SETTING_COLUMNS = ('builder', 'mode', 'solver', 'formulation', 'batch_size', 'warm_start',
+                   'step_time_limit', 'run_time_limit', 'mip_gap')
+# Settings read from the manifest as numbers
+FLOAT_SETTINGS = ('step_time_limit', 'run_time_limit', 'mip_gap')
+# Headline numbers of the dashboard, repeated in the summary
+METRIC_KEYS = ('total_loans', 'total_facilities', 'total_value_assigned', 'total_new_loans', 'average_credit_score')
+
+# Worker processes import this module too, so their telemetry is logged as well
+telemetry.configure_logging()
+
+
+def read_manifest(path: str) -> List[Dict[str, Any]]:
+    """Scenarios of a CSV or JSON manifest, with file paths made absolute."""
+    if path.lower().endswith('.json'):
+        with open(path) as f:
+            scenarios = json.load(f)
+    else:
+        scenarios = pd.read_csv(path, dtype=str).to_dict('records')
+
+    base = os.path.dirname(os.path.abspath(path))
+    for number, scenario in enumerate(scenarios):
+        scenario = {key: value for key, value in scenario.items() if not pd.isna(value)}
+        required = [column for column in FILE_COLUMNS if column != 'existing' or 'portfolio' not in scenario]
+        missing = [column for column in required if column not in scenario]
+        if missing:
+            raise ValueError(f"Scenario {number + 1} in {path} is missing: {', '.join(missing)}")
+        for column in FILE_COLUMNS + OPTIONAL_FILE_COLUMNS:
+            if column in scenario:
+                scenario[column] = os.path.join(base, scenario[column])
+        scenario.setdefault('name', f"scenario_{number + 1}")
+        scenarios[number] = scenario
+    names = [scenario['name'] for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Scenario names in {path} must be unique")
+    # Scenarios run in parallel, so two of them must never update the same portfolio
+    portfolios = [scenario['portfolio'] for scenario in scenarios if 'portfolio' in scenario]
+    if len(set(portfolios)) != len(portfolios):
+        raise ValueError(f"Portfolio files in {path} must be unique")
+    return scenarios
+
+
+def scenario_settings(scenario: Dict[str, Any], defaults: Dict[str, Any], threads: int) -> Dict[str, Any]:
+    """run_optimization_process settings of a scenario: its own columns over the defaults."""
+    settings = dict(defaults)
+    settings.update({key: scenario[key] for key in SETTING_COLUMNS if key in scenario})
+    if 'batch_size' in settings and settings['batch_size'] is not None:
+        settings['batch_size'] = int(settings['batch_size'])
+    for key in FLOAT_SETTINGS:
+        if settings.get(key) is not None:
+            settings[key] = float(settings[key])
+    if threads and settings.get('solver', 'gurobi') == 'gurobi':
+        # HiGHS through SciPy has no thread setting
+        settings['solver_options'] = {'threads': threads}
+    return settings
+
+
+def write_table(df: pd.DataFrame, path: str, file_format: str) -> str:
+    path = f"{path}.{file_format}"
+    if file_format == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def run_scenario(scenario: Dict[str, Any], settings: Dict[str, Any], out_directory: str,
+                 file_format: str) -> Dict[str, Any]:
+    """Run one scenario in a worker process and write its outputs; never raises."""
+    summary = {'name': scenario['name'], 'settings': settings, 'status': 'failed'}
+    start = time.perf_counter()
+    try:
+        with telemetry.collect() as run_telemetry:
+            run = run_pipeline(scenario['loans'], scenario['facilities'], scenario['order'], scenario.get('existing'),
+                               settings, progress=lambda phase: None, portfolio_path=scenario.get('portfolio'))
+            results, facilities, loans = run['results'], run['facilities'], run['loans']
+            with telemetry.phase("dashboard_metrics"):
+                metrics = dashboard_metrics(loans, facilities, results['assignments'])
+
+            with telemetry.phase("write_results"):
+                directory = os.path.join(out_directory, scenario['name'])
+                os.makedirs(directory, exist_ok=True)
+                pairs = np.asarray(results['assignments'], dtype=np.int64).reshape(-1, 2)
+                assignments = pd.DataFrame({
+                    'LOAN_ID': loans['LOAN_ID'][pairs[:, 0]],
+                    'facility': pairs[:, 1],
+                    'facility_id': [facilities[j].facility_id for j in pairs[:, 1]],
+                })
+                summary['files'] = {
+                    'assignments': write_table(assignments, os.path.join(directory, 'assignments'), file_format),
+                    'combined_loans': write_table(run['combined_df'], os.path.join(directory, 'combined_loans'),
+                                                  file_format),
+                    'facility_metrics': write_table(metrics['facility_df'], os.path.join(directory, 'facility_metrics'),
+                                                    file_format),
+                }
+        summary.update(
+            status='done',
+            objective_values=[float(value) for value in results['objective_values']],
+            stopped_early=bool(results.get('stopped_early')),
+            new_loans=len(loans),
+            assigned_loans=len(pairs),
+            metrics={key: metrics[key] for key in METRIC_KEYS},
+        )
+    except Exception as e:
+        summary['error'] = str(e)
+    summary['diagnostics'] = run_telemetry.to_dict()
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the loan allocation on a manifest of scenarios")
+    parser.add_argument("manifest", help="CSV or JSON manifest of scenarios")
+    parser.add_argument("--out", default="results", help="Output directory")
+    parser.add_argument("--workers", type=int, default=max(os.cpu_count() // 2, 1), help="Scenarios solved at once")
+    parser.add_argument("--threads", type=int, default=1, help="Solver threads per scenario (0 = solver default)")
+    parser.add_argument("--format", default="parquet", choices=["parquet", "csv"], help="Format of the result tables")
+    parser.add_argument("--builder", default="sparse", choices=["dense", "sparse"])
+    parser.add_argument("--mode", default="persistent", choices=["rebuild", "persistent", "hierarchical", "greedy"])
+    parser.add_argument("--solver", default="gurobi", choices=["gurobi", "highs"])
+    parser.add_argument("--formulation", default="standard", choices=list(FORMULATIONS),
+                        help="Facility usage linking and covenant row scaling")
+    parser.add_argument("--step-time-limit", type=float, help="Seconds per optimization step; a step keeps its best incumbent")
+    parser.add_argument("--run-time-limit", type=float, help="Seconds per scenario over all steps")
+    parser.add_argument("--mip-gap", type=float, help="Relative MIP gap at which a step counts as solved")
+    args = parser.parse_args()
+
+    scenarios = read_manifest(args.manifest)
+    defaults = {'builder': args.builder, 'mode': args.mode, 'solver': args.solver, 'formulation': args.formulation,
+                'step_time_limit': args.step_time_limit, 'run_time_limit': args.run_time_limit, 'mip_gap': args.mip_gap}
+    os.makedirs(args.out, exist_ok=True)
+
+    start = time.perf_counter()
+    summaries = []
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+        futures = [
+            pool.submit(run_scenario, scenario, scenario_settings(scenario, defaults, args.threads),
+                        os.path.abspath(args.out), args.format)
+            for scenario in scenarios
+        ]
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries.append(summary)
+            detail = summary.get('objective_values', summary.get('error'))
+            print(f"{summary['name']}: {summary['status']} in {summary['seconds']:.1f}s, {detail}")
+
+    order = {scenario['name']: number for number, scenario in enumerate(scenarios)}
+    summaries.sort(key=lambda summary: order[summary['name']])
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump({'seconds': time.perf_counter() - start, 'scenarios': summaries}, f, indent=2)
+    failed = sum(summary['status'] != 'done' for summary in summaries)
+    print(f"{len(summaries) - failed} of {len(summaries)} scenarios done; summary in {os.path.join(args.out, 'summary.json')}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
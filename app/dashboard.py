@@ -17,6 +17,9 @@ def dashboard_page():
                             children=dbc.Button("Select Loan File", color="primary", className="mt-2"),
                             style={"width": "100%"},
                         ),
+                        # A tape on shared server storage, read in place instead of uploaded
+                        dbc.Input(id="loan-path", placeholder="or a server path to the loan tape", type="text",
+                                  debounce=True, className="mt-2"),
                         dbc.Alert("Loan file uploaded successfully!", id="loan-upload-alert", is_open=False, color="success", className="mt-2")
                     ]),
                 ], className="mb-4"),
@@ -107,6 +110,15 @@ def dashboard_page():
             dbc.Col([
                 dbc.Alert(id="upload-alert", is_open=False, duration=4000),
                 dbc.Spinner(html.Div(id="processing-spinner"), size="lg", color="primary"),
+                # Background optimization job: its id, a progress poll and a cancel button
+                dcc.Store(id="job-id"),
+                dcc.Interval(id="job-poll", interval=1000, disabled=True),
+                html.Div([
+                    html.Span(id="job-status", className="me-3"),
+                    # Stop keeps the best allocation found so far; cancel discards the run
+                    dbc.Button("Stop and Keep Best", id="stop-job", color="warning", size="sm", className="me-2"),
+                    dbc.Button("Cancel Optimization", id="cancel-job", color="secondary", size="sm"),
+                ], className="text-center mt-2"),
                 html.H2("Facility-Specific Metrics", className="text-center mt-4", style={"color": "white"}),
                 html.Div(
                     dash_table.DataTable(
@@ -160,8 +172,27 @@ def dashboard_page():
     ]),
         dbc.Row([
             dbc.Col([
-                dbc.Button("Download Allocation Data", id="download-button", color="primary", className="mt-4"),
-                dcc.Download(id="download-csv")  # Component to handle file download
+                dbc.Card([
+                    dbc.CardHeader(html.H4("Relaxation Preview")),
+                    # LP bounds and covenant shadow prices, shown while the MIP is still running
+                    dbc.CardBody(html.Div(id="relaxation-preview")),
+                ], className="mt-4"),
+            ], width=12),
+        ]),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(html.H4("Run Diagnostics")),
+                    # Phase timings and solver statistics of the last run
+                    dbc.CardBody(html.Div(id="run-diagnostics")),
+                ], className="mt-4"),
+            ], width=12),
+        ]),
+        dbc.Row([
+            dbc.Col([
+                # Links to the finished job's CSV, streamed by the /download route
+                dbc.Button("Download Allocation Data", id="download-button", color="primary", className="mt-4",
+                           external_link=True, disabled=True),
             ], width=12, className="text-center"),
         ]),
 
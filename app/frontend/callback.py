@@ -1,15 +1,26 @@
 import os
 import base64
+import binascii
+import hashlib
+import logging
+import tempfile
+import uuid
 import numpy as np
 import pandas as pd
-from dash import Input, Output, no_update, Dash, dcc
+from dash import Input, Output, State, no_update, Dash, html
+from flask import Response, abort
 import dash_bootstrap_components as dbc
-from backend.facility_creation import create_facilities_from_config
-from backend.optimization import run_optimization_process
-from backend.models import Loan
+from backend.pipeline import run_pipeline
+from backend.metrics import dashboard_metrics
+from backend.jobs import JobManager, QUEUED, RUNNING, DONE, CANCELLED
+from backend.result_cache import ResultCache, content_key
+from backend.result_store import ResultStore
+from backend import telemetry
 import plotly.graph_objects as go
 
 
+logger = logging.getLogger("loan_optimizer.dashboard")
+
 # Path for saving uploaded files
 UPLOAD_DIRECTORY = os.path.join(os.path.abspath(os.path.dirname(__file__)), "../uploads")
 
@@ -18,15 +29,87 @@ if not os.path.exists(UPLOAD_DIRECTORY):
 
 CALLBACKS_REGISTERED = False
 
-def save_file(name, content):
-    """Decode and store a file uploaded via Dash."""
-    data = content.split(",")[1]
-    decoded = base64.b64decode(data)
-    save_path = os.path.join(UPLOAD_DIRECTORY, name)
-    with open(save_path, "wb") as f:
-        f.write(decoded)
-
-    return save_path
+# Optimization runs that may execute at the same time
+JOB_WORKERS = int(os.environ.get("LOAN_OPTIMIZER_WORKERS", 2))
+JOB_MANAGER = None
+
+# Settings passed to run_optimization_process; part of the result cache key
+SOLVER_SETTINGS = {'builder': 'sparse', 'mode': 'persistent', 'solver': 'gurobi', 'formulation': 'standard'}
+# Optional solve budgets (seconds per step and per run) and MIP gap target; unset means none
+SOLVER_SETTINGS.update({
+    setting: float(os.environ[variable])
+    for setting, variable in (('step_time_limit', "LOAN_OPTIMIZER_STEP_TIME_LIMIT"),
+                              ('run_time_limit', "LOAN_OPTIMIZER_RUN_TIME_LIMIT"),
+                              ('mip_gap', "LOAN_OPTIMIZER_MIP_GAP"))
+    if os.environ.get(variable)
+})
+
+# Results of earlier runs, keyed by the uploaded contents and SOLVER_SETTINGS
+RESULT_CACHE = ResultCache(
+    os.path.join(UPLOAD_DIRECTORY, "result_cache"),
+    max_bytes=int(os.environ.get("LOAN_OPTIMIZER_CACHE_MB", 512)) * 1024 * 1024
+)
+
+# Loan-level output of each run, kept on disk; results only carry its key
+RESULT_STORE = ResultStore(
+    os.path.join(UPLOAD_DIRECTORY, "result_store"),
+    max_bytes=int(os.environ.get("LOAN_OPTIMIZER_RESULTS_MB", 1024)) * 1024 * 1024,
+    ttl_seconds=float(os.environ.get("LOAN_OPTIMIZER_RESULT_TTL_HOURS", 24)) * 3600
+)
+
+# Directory tapes may be read from by server path instead of being uploaded; unset disables it
+INGEST_ROOT = os.environ.get("LOAN_OPTIMIZER_INGEST_ROOT")
+
+# Base64 characters decoded at a time (a multiple of 4, so every piece decodes on its own)
+DECODE_CHUNK = 4 * 1024 * 1024
+
+def save_upload(name, content):
+    """
+    Decode a dcc.Upload data URL into the upload directory piece by piece, so the decoded
+    file is never held in memory. Files are named by their content hash: concurrent
+    sessions never overwrite each other's uploads and identical uploads share one file.
+    Returns the path and the sha256 digest.
+    """
+    digest = hashlib.sha256()
+    start = content.index(",") + 1
+    handle, temp_path = tempfile.mkstemp(dir=UPLOAD_DIRECTORY, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            pending = ""
+            for offset in range(start, len(content), DECODE_CHUNK):
+                # Base64 decodes in whole 4-character groups; a partial group waits for the next chunk
+                pending += content[offset:offset + DECODE_CHUNK]
+                usable = len(pending) - len(pending) % 4
+                piece = base64.b64decode(pending[:usable])
+                pending = pending[usable:]
+                digest.update(piece)
+                f.write(piece)
+            if pending:
+                raise ValueError(f"Upload {name} is not valid base64")
+    except (ValueError, binascii.Error):
+        os.remove(temp_path)
+        raise
+    # The original name is kept, so compression is still recognised by its extension
+    save_path = os.path.join(UPLOAD_DIRECTORY, f"{digest.hexdigest()[:32]}-{os.path.basename(name)}")
+    if os.path.exists(save_path):
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, save_path)
+    return save_path, digest.digest()
+
+def ingest_path(path):
+    """
+    A tape already on server storage, read in place. Returns the resolved path and a
+    digest of its path, size and modification time (the tape itself is not read here).
+    """
+    if not INGEST_ROOT:
+        raise ValueError("Reading tapes by server path is disabled (set LOAN_OPTIMIZER_INGEST_ROOT)")
+    root = os.path.realpath(INGEST_ROOT)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root or not os.path.isfile(resolved):
+        raise ValueError(f"No loan tape {path} under the ingest directory")
+    stat = os.stat(resolved)
+    return resolved, hashlib.sha256(f"{resolved}\0{stat.st_size}\0{stat.st_mtime_ns}".encode()).digest()
 def generate_visualizations(facility_metrics):
     # Data preparation
     facilities = facility_metrics['Facility']
@@ -124,28 +207,141 @@ def pool_constraint_visualization():
 
     return fig
 
+def diagnostics_panel(diagnostics):
+    """Run diagnostics: a table of the pipeline phases and one of the solver steps."""
+    if not diagnostics:
+        return ""
+    phases = pd.DataFrame([{
+        'Phase': record['phase'] + (f" {record['step']}" if 'step' in record else "")
+                 + (f" (batch {record['batch']})" if 'batch' in record else ""),
+        'Wall Time (s)': f"{record['seconds']:.3f}",
+        'Peak Memory (MB)': "" if record['peak_rss_mb'] is None else f"{record['peak_rss_mb']:.0f}",
+        'Peak Growth (MB)': "" if record['peak_growth_mb'] is None else f"{record['peak_growth_mb']:.0f}",
+    } for record in diagnostics['phases']])
+    children = [html.H5("Phases"), dbc.Table.from_dataframe(phases, striped=True, bordered=True, size="sm")]
+    if diagnostics['solves']:
+        solves = pd.DataFrame([{
+            'Step': record['step'],
+            'Objective': record['objective'],
+            'Status': record['status'],
+            'Variables': record['num_vars'],
+            'Constraints': record['num_constrs'],
+            'Nonzeros': record['num_nonzeros'],
+            'Runtime (s)': "" if record['runtime'] is None else f"{record['runtime']:.3f}",
+            'MIP Gap': "" if record['mip_gap'] is None else f"{record['mip_gap']:.2e}",
+            'Nodes': "" if record['node_count'] is None else int(record['node_count']),
+        } for record in diagnostics['solves']])
+        children += [html.H5("Solver Steps"), dbc.Table.from_dataframe(solves, striped=True, bordered=True, size="sm")]
+    return children
+
+def preview_panel(preview):
+    """LP relaxation of a run: the value of every step and the first step's covenant shadow prices."""
+    if not preview or not preview['steps']:
+        return ""
+    steps = pd.DataFrame([{
+        'Step': record['step'],
+        'Objective': record['objective'],
+        'Status': record['status'],
+        'LP Value': "" if record['lp_value'] is None else f"{record['lp_value']:,.2f}",
+    } for record in preview['steps']])
+    children = [html.P("The first step's LP value bounds the optimization; later steps are estimates."),
+                dbc.Table.from_dataframe(steps, striped=True, bordered=True, size="sm")]
+    first_step = preview['steps'][0]['step']
+    covenants = [record for record in preview['covenants'] if record['step'] == first_step]
+    if covenants:
+        shadow_prices = pd.DataFrame([{
+            'Facility': f"Facility {record['facility'] + 1}",
+            'Covenant': record['covenant'],
+            'Type': "Sum" if record['constr_type'] else "Weighted average",
+            'Limit': record['limit'],
+            'Shadow Price': f"{record['shadow_price']:.4g}",
+            'Slack': f"{record['slack']:,.2f}",
+            'Binding': "Yes" if record['binding'] else "",
+        } for record in covenants])
+        children += [html.H5(f"Covenant Shadow Prices ({preview['steps'][0]['objective']})"),
+                     dbc.Table.from_dataframe(shadow_prices, striped=True, bordered=True, size="sm")]
+    return children
+
+def incumbent_message(record):
+    """Progress line of an improving incumbent."""
+    message = f"Step {record['step']} {record['objective']}: incumbent {record['incumbent']:,.2f}"
+    if record['bound'] is not None:
+        message += f", bound {record['bound']:,.2f}"
+    if record['gap'] is not None:
+        message += f", gap {record['gap']:.2%}"
+    return message
+
+def run_upload_job(loan_path, facility_path, order_path, existing_loan_path, cache_key=None, progress=None,
+                   publish=None, stopped=None):
+    """
+    Process one set of uploaded files; runs in a background worker process, publishes the LP
+    preview and reports incumbents as progress (logged without it). A run stopped early
+    returns its best allocation.
+    """
+    progress = progress or logger.info
+    with telemetry.collect() as run_telemetry:
+        run = run_pipeline(loan_path, facility_path, order_path, existing_loan_path, SOLVER_SETTINGS, progress,
+                           preview=publish, incumbent=lambda record: progress(incumbent_message(record)),
+                           stopped=stopped)
+        loans_to_assign = run['loans']
+        results, facilities, combined_df = run['results'], run['facilities'], run['combined_df']
+
+        progress("Preparing results")
+        final_assignments = results['assignments']
+        with telemetry.phase("dashboard_metrics"):
+            metrics = dashboard_metrics(loans_to_assign, facilities, final_assignments)
+
+        with telemetry.phase("figures"):
+            fig1, fig2 = generate_visualizations(metrics['facility_df'])
+            fig3 = pool_constraint_visualization()
+
+        # Identical inputs share one artifact, like they share the cached result. A run stopped
+        # early is not that result: it gets its own artifact, so a cached complete run keeps its download
+        stopped_early = bool(results.get('stopped_early'))
+        with telemetry.phase("store_results"):
+            shared = cache_key is not None and not stopped_early
+            artifact = RESULT_STORE.put(cache_key if shared else uuid.uuid4().hex, combined_df)
+
+    result = {
+        'assignments': final_assignments,
+        'table_data': metrics['table_data'],
+        'table_columns': metrics['table_columns'],
+        'total_loans': metrics['total_loans'],
+        'total_facilities': metrics['total_facilities'],
+        'total_value_assigned': metrics['total_value_assigned'],
+        'total_new_loans': metrics['total_new_loans'],
+        'average_credit_score': metrics['average_credit_score'],
+        'figures': (fig1, fig2, fig3),
+        'artifact': artifact,
+        'preview': run['preview'],
+        'stopped_early': stopped_early,
+        'diagnostics': run_telemetry.to_dict(),
+    }
+    # A run stopped early is not the answer for these inputs, so it is solved again next time
+    if cache_key is not None and not stopped_early:
+        RESULT_CACHE.put(cache_key, result)
+    return result
+
+def get_job_manager():
+    """The process's JobManager, created on first use so worker processes never start one."""
+    global JOB_MANAGER
+    if JOB_MANAGER is None:
+        JOB_MANAGER = JobManager(max_workers=JOB_WORKERS)
+    return JOB_MANAGER
+
 def register_callbacks(app: Dash):
-    global combined_df
     global CALLBACKS_REGISTERED  # Use the global flag
     if CALLBACKS_REGISTERED:
         return  # Skip registration if already registered
     
     @app.callback(
-        [Output("data-table", "data"),
-         Output("data-table", "columns"),
+        [Output("job-id", "data"),
+         Output("job-poll", "disabled"),
+         Output("job-poll", "n_intervals"),
+         Output("job-status", "children"),
          Output("upload-alert", "children"),
          Output("upload-alert", "is_open"),
-         Output("upload-alert", "color"),
-         Output("processing-spinner", "children"),
-         Output("total-loans", "children"),
-         Output("total-facilities", "children"),
-         Output("total-value-assigned", "children"),
-         Output("total-new-loans", "children"),
-         Output("average-credit-score", "children"),
-         Output("visualization-1", "figure"),
-         Output("visualization-2", "figure"),
-         Output("visualization-3", "figure")
-         ],
+         Output("upload-alert", "color")],
         [Input("upload-loan", "contents"),
          Input("upload-loan", "filename"),
          Input("upload-facility", "contents"),
@@ -153,124 +349,125 @@ def register_callbacks(app: Dash):
          Input("upload-order", "contents"),
          Input("upload-order", "filename"),
          Input("upload-existing-loans", "contents"),
-         Input("upload-existing-loans", "filename")],
+         Input("upload-existing-loans", "filename"),
+         Input("loan-path", "value")],
         prevent_initial_call=True
     )
-    def handle_upload(loan_content, loan_name, facility_content, facility_name, order_content, order_name, existing_loan_content, existing_loan_name):
-        # If not all files are uploaded, return empty DataTable
-        if not loan_content or not facility_content or not order_content or not existing_loan_content:
-            return no_update, no_update, "Please upload all four files.", True, "warning", "", "", "", "", "", "", go.Figure(), go.Figure(), go.Figure()
-        spinner = dbc.Spinner(size="lg", color="primary")
+    def handle_upload(loan_content, loan_name, facility_content, facility_name, order_content, order_name, existing_loan_content, existing_loan_name, loan_server_path=None):
+        # If not all files are uploaded, wait for the rest
+        if not (loan_content or loan_server_path) or not facility_content or not order_content or not existing_loan_content:
+            return no_update, no_update, no_update, no_update, "Please upload all four files.", True, "warning"
 
         try:
-            # Save uploaded files
-            loan_path = save_file(loan_name, loan_content)
-            facility_path = save_file(facility_name, facility_content)
-            order_path = save_file(order_name, order_content)
-            existing_loan_path = save_file(existing_loan_name, existing_loan_content)
-
-            # Preprocess loan file as an example
-            preprocessed_df = pd.read_csv(loan_path)
-            pre_facility_df = pd.read_csv(facility_path)
-            order_df = pd.read_csv(order_path)
-            existing_loan_df = pd.read_csv(existing_loan_path)
-
-            loans_to_assign = [Loan(**preprocessed_df.iloc[row]) for row in range(len(preprocessed_df))]
-
-            facilities1 = create_facilities_from_config(pre_facility_df, existing_loan_df, preprocessed_df)
-
-            facilities = []  # Initialize an empty list
-
-            # Iterate through the dictionary's values and add them to the facilities list
-            for key, value in facilities1.items():
-                facilities.append(value)  # Append the value (facility) to the list
-
-            # Matrix of loans x facilities compatibility
-            asset_acc_matrix = np.zeros((len(loans_to_assign), len(facilities)))
-           
-
-            for i, loan in enumerate(loans_to_assign):
-                for j, facility in enumerate(facilities):
-                #existing_loans = pd.DataFrame([loan.__dict__ for loan in facility.existing_loans])
-                    if facility.asset_check(loan):
-                        asset_acc_matrix[i][j] = 1
-            
-            global combined_df
-            results, facilities, combined_df = run_optimization_process(
-                preprocessed_df, asset_acc_matrix,
-                facilities,
-                existing_loan_df,order_df
-            )
-
-            # Create facility-specific metrics
-            final_assignments = results['assignments']
-
-            # Calculate total loan value and average credit score
-            assigned_loans = []
-            for facility in facilities:
-                assigned_loans.extend(facility.existing_loans)
-
-            # Get total newly assigned loans and their metrics
-            all_assigned_loans = []
-            for facility in facilities:
-                all_assigned_loans.extend(facility.existing_loans)
-
-            # Create facility-specific metrics
-            facility_data = []
-            for i, facility in enumerate(facilities):
-                # Count new assignments for this facility from the current run
-                new_assignments = len([a for a in final_assignments if a[1] == i])
-                new_value = sum(loans_to_assign[a[0]].orig_amt for a in final_assignments if a[1] == i)
-    
-                # Get total loans and values including historical assignments
-                total_loans = len(facility.existing_loans)
-                total_value = sum(loan.orig_amt for loan in facility.existing_loans)
-    
-                # Calculate average credit score
-                facility_avg_score = (
-                    sum(loan.CSCORE_B for loan in facility.existing_loans) / len(facility.existing_loans)
-                    if facility.existing_loans else 0
-                )
-
-                facility_size = facility.facility_size
-                facility_data.append({
-                    'Facility ID': i,
-                    'Facility': f'Facility {i+1}',
-                    'Loans Assigned (New)': new_assignments,
-                    'Value Filled (New)': new_value,
-                    'Total Loans': total_loans,  # This includes historical + new
-                    'Total Value': total_value,
-                    'Average Credit Score': facility_avg_score,
-                    'Facility Size': facility_size
-                })
-
-            # Create DataFrame
-            facility_df = pd.DataFrame(facility_data)
-            table_data = facility_df.to_dict("records")
-            table_columns = [{"name": col, "id": col} for col in facility_df.columns]
-
-            total_loans = len(all_assigned_loans)
-            total_facilities = len(facilities)
-            total_value_assigned = sum([facility['Total Value'] for facility in facility_data])
-            total_new_loans = len(final_assignments)
-            average_credit_score = sum([facility['Average Credit Score'] for facility in facility_data]) / len(facility_data)
-
-            facility_metrics = pd.DataFrame(facility_data)  # Replace with actual facility data generation logic
-            fig1, fig2 = generate_visualizations(facility_metrics)
-            fig3 = pool_constraint_visualization()
-
-            return table_data, table_columns, "Files processed successfully!", True, "success", "", total_loans, total_facilities, f"${total_value_assigned}", total_new_loans, f"{average_credit_score:.2f}", fig1, fig2, fig3
+            # Uploads are decoded straight to disk, where the job's worker process reads them;
+            # a server path is read in place
+            if loan_server_path:
+                loan_path, loan_digest = ingest_path(loan_server_path)
+            else:
+                loan_path, loan_digest = save_upload(loan_name, loan_content)
+            facility_path, facility_digest = save_upload(facility_name, facility_content)
+            order_path, order_digest = save_upload(order_name, order_content)
+            existing_loan_path, existing_loan_digest = save_upload(existing_loan_name, existing_loan_content)
+
+            # Identical inputs and settings reuse the cached result; setting n_intervals polls it at once
+            cache_key = content_key([loan_digest, facility_digest, order_digest, existing_loan_digest], SOLVER_SETTINGS)
+            cached = RESULT_CACHE.get(cache_key)
+            # A result whose artifact was evicted is run again
+            if cached is not None and RESULT_STORE.exists(cached.get('artifact')):
+                job_id = get_job_manager().add_finished(cached)
+                return job_id, False, 0, "Loaded from cache", "Loaded a cached result for these files.", True, "info"
+
+            # The optimization runs in a background worker; job-poll picks up its progress
+            job_id = get_job_manager().submit(run_upload_job, loan_path, facility_path, order_path, existing_loan_path,
+                                              cache_key=cache_key)
+            return job_id, False, 0, "Queued", f"Optimization job {job_id} started.", True, "info"
 
         except Exception as e:
-            # Log the error and return an empty table
-            print(f"An error occurred: {e}")
-            return no_update, no_update, f"An error occurred: {str(e)}", True, "danger", "","", "", "$0", "", "", go.Figure(), go.Figure(), go.Figure()
+            logger.exception("Upload failed: %s", e)
+            return no_update, True, no_update, "", f"An error occurred: {str(e)}", True, "danger"
+
+    @app.callback(
+        [Output("data-table", "data"),
+         Output("data-table", "columns"),
+         Output("upload-alert", "children", allow_duplicate=True),
+         Output("upload-alert", "is_open", allow_duplicate=True),
+         Output("upload-alert", "color", allow_duplicate=True),
+         Output("processing-spinner", "children"),
+         Output("total-loans", "children"),
+         Output("total-facilities", "children"),
+         Output("total-value-assigned", "children"),
+         Output("total-new-loans", "children"),
+         Output("average-credit-score", "children"),
+         Output("visualization-1", "figure"),
+         Output("visualization-2", "figure"),
+         Output("visualization-3", "figure"),
+         Output("job-status", "children", allow_duplicate=True),
+         Output("job-poll", "disabled", allow_duplicate=True),
+         Output("run-diagnostics", "children"),
+         Output("download-button", "href"),
+         Output("download-button", "disabled"),
+         Output("relaxation-preview", "children")],
+        Input("job-poll", "n_intervals"),
+        State("job-id", "data"),
+        prevent_initial_call=True
+    )
+    def poll_job(n_intervals, job_id):
+        status = get_job_manager().status(job_id)
+        if status['status'] in (QUEUED, RUNNING):
+            phase = status['phase'] or ('Starting' if status['status'] == RUNNING else 'Queued')
+            progress = f"{phase} ({status['elapsed']:.0f}s)"
+            # The preview appears once the worker has published it
+            preview = preview_panel(status['partial']) if status['partial'] else no_update
+            return (no_update,) * 14 + (progress, False, no_update, None, True, preview)
+        if status['status'] == DONE:
+            result = get_job_manager().result(job_id)
+            fig1, fig2, fig3 = result['figures']
+            if result.get('stopped_early'):
+                message, color = "Stopped early: showing the best allocation found so far.", "warning"
+            else:
+                message, color = "Files processed successfully!", "success"
+            return (result['table_data'], result['table_columns'], message, True, color, "",
+                    result['total_loans'], result['total_facilities'], f"${result['total_value_assigned']}",
+                    result['total_new_loans'], f"{result['average_credit_score']:.2f}", fig1, fig2, fig3,
+                    f"Finished in {status['elapsed']:.0f}s", True, diagnostics_panel(result.get('diagnostics')),
+                    f"/download/{job_id}", False, preview_panel(result.get('preview')))
+        if status['status'] == CANCELLED:
+            message, color = "Optimization job cancelled.", "warning"
+        else:
+            message, color = f"An error occurred: {status['error'] or 'unknown job'}", "danger"
+        return (no_update, no_update, message, True, color, "", "", "", "$0", "", "",
+                go.Figure(), go.Figure(), go.Figure(), "", True, "", None, True, "")
+
+    @app.callback(
+        Output("job-status", "children", allow_duplicate=True),
+        Input("cancel-job", "n_clicks"),
+        State("job-id", "data"),
+        prevent_initial_call=True
+    )
+    def cancel_job(n_clicks, job_id):
+        if job_id and get_job_manager().cancel(job_id):
+            return "Cancelling"
+        return no_update
+
     @app.callback(
-        Output("download-csv", "data"),
-        Input("download-button", "n_clicks"),
+        Output("job-status", "children", allow_duplicate=True),
+        Input("stop-job", "n_clicks"),
+        State("job-id", "data"),
         prevent_initial_call=True
     )
-    def download_csv(n_clicks):
-        return dcc.send_data_frame(combined_df.to_csv, "combined_data.csv", index=False)
+    def stop_job(n_clicks, job_id):
+        if job_id and get_job_manager().stop(job_id):
+            return "Stopping, keeping the best allocation found so far"
+        return no_update
+
+    # Served by Flask rather than a dcc.Download callback, so the CSV is streamed from the
+    # stored artifact instead of being built and base64-encoded in memory
+    @app.server.route("/download/<job_id>")
+    def download_csv(job_id):
+        result = get_job_manager().result(job_id)
+        if result is None or not RESULT_STORE.exists(result.get('artifact')):
+            abort(404)
+        return Response(RESULT_STORE.iter_csv(result['artifact']), mimetype="text/csv",
+                        headers={"Content-Disposition": 'attachment; filename="combined_data.csv"'})
 
     CALLBACKS_REGISTERED = True
@@ -0,0 +1,30 @@
+# Description: Shared fixtures. The app is imported the way app/app.py runs it, with app/ on the path.
+
+import os
+import sys
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+SAMPLE_DATA = os.path.join(ROOT, "sample_data")
+
+
+def sample_path(name: str) -> str:
+    return os.path.join(SAMPLE_DATA, name)
+
+
+@pytest.fixture
+def loans_df() -> pd.DataFrame:
+    return pd.read_csv(sample_path("subset_1.csv"))
+
+
+@pytest.fixture
+def existing_df() -> pd.DataFrame:
+    return pd.read_csv(sample_path("combined_data(3).csv"))
+
+
+@pytest.fixture(params=["facilities_dec.csv", "facilities_nov.csv"])
+def config_df(request) -> pd.DataFrame:
+    return pd.read_csv(sample_path(request.param))
@@ -0,0 +1,68 @@
+# Description: The vectorized covenant engine and the running pool covenant aggregates against
+# the scalar per-loan checks and the full rescans they replaced.
+
+import numpy as np
+import pandas as pd
+import pytest
+from backend.covenant_engine import build_compatibility_matrix
+from backend.existing_loans_handle import load_existing_loans
+from backend.facility_creation import create_facilities_from_config
+from backend.models import AssetCovenant, Facility
+
+
+def _scalar_matrix(loans_df: pd.DataFrame, facilities) -> np.ndarray:
+    """The original compatibility check: Facility.asset_check loan by loan."""
+    return np.array([[1.0 if facility.asset_check(loan) else 0.0 for facility in facilities]
+                     for loan in loans_df.itertuples(index=False)]).reshape(len(loans_df), len(facilities))
+
+
+def test_config_matrix_matches_asset_check(loans_df, existing_df, config_df):
+    facilities = list(create_facilities_from_config(config_df, existing_df.iloc[:0], loans_df).values())
+    matrix = build_compatibility_matrix(loans_df, facilities)
+    np.testing.assert_array_equal(matrix.to_dense(), _scalar_matrix(loans_df, facilities))
+
+
+@pytest.mark.parametrize("covenant", [
+    AssetCovenant('oltv', '<=', 80.0, [], [], []),
+    AssetCovenant('CSCORE_B', '>=', 740.0, ['orig_amt'], ['>='], [400000.0]),
+    AssetCovenant('dti', '<=', 40.0, ['num_bo', 'orig_rt'], ['==', '>='], [1.0, 7.0]),
+    AssetCovenant('NUM_UNIT', '!=', 1.0, ['oltv'], ['<='], [60.0]),
+    AssetCovenant('zip_3', '<=', 500.0, [], [], []),
+    AssetCovenant('orig_rt', '<', 7.0, [], [], []),
+])
+def test_covenant_matches_asset_check(loans_df, covenant):
+    facility = Facility(0, 0, 1e9)
+    facility.add_asset_covenants(covenant)
+    other = Facility(1, 0, 1e9)
+    facilities = [facility, other]
+    matrix = build_compatibility_matrix(loans_df, facilities)
+    np.testing.assert_array_equal(matrix.to_dense(), _scalar_matrix(loans_df, facilities))
+
+
+def test_existing_aggregates_match_rescan(loans_df, existing_df, config_df):
+    facilities = list(create_facilities_from_config(config_df, existing_df, loans_df).values())
+    load_existing_loans(facilities, existing_df)
+    for j, facility in enumerate(facilities):
+        book = existing_df[existing_df['facility_id'] == j]
+        rows = config_df[config_df['Command'].str.contains('add_pool_covenants') & (config_df['Number'] == j)]
+        rows = rows.dropna(subset=['a', 'b', 'c'])
+        assert len(rows) == len(facility.pool_covenants)
+        for (_, row), covenant in zip(rows.iterrows(), facility.pool_covenants):
+            # The original covenants kept every existing a_e and b_e and summed them per solve
+            a_e = np.asarray(eval(row['a'], {}, {'random_df': book}), dtype=float)
+            b_e = np.asarray(eval(row['b'], {}, {'random_df': book}), dtype=float)
+            assert covenant.existing_ab == pytest.approx(float(np.dot(a_e, b_e)))
+            assert covenant.existing_b == pytest.approx(float(b_e.sum()))
+            assert covenant.existing_count == len(b_e)
+
+
+def test_new_loans_update_aggregates(loans_df, existing_df, config_df):
+    facilities = list(create_facilities_from_config(config_df, existing_df.iloc[:0], loans_df).values())
+    covenant = facilities[0].pool_covenants[0]
+    before = (covenant.existing_ab, covenant.existing_b, covenant.existing_count)
+    rows = np.arange(0, len(loans_df), 3)
+    covenant.add_new_loans(rows)
+    a, b = np.asarray(covenant.a, dtype=float)[rows], np.asarray(covenant.b, dtype=float)[rows]
+    assert covenant.existing_ab == pytest.approx(before[0] + float(np.dot(a, b)))
+    assert covenant.existing_b == pytest.approx(before[1] + float(b.sum()))
+    assert covenant.existing_count == before[2] + len(rows)
@@ -0,0 +1,59 @@
+# Description: The covenant expression language against Python eval, which it replaced.
+
+import numpy as np
+import pandas as pd
+import pytest
+from backend.expressions import ColumnTable, ExpressionError, compile_expression
+
+EXPRESSIONS = [
+    "random_df['CSCORE_B'].to_list()",
+    "((random_df['state']=='CA')*(random_df['orig_amt'])).to_list()",
+    "[1]*len(random_df)",
+    "random_df['orig_amt'] / 1000 - random_df['oltv']",
+    "((random_df['oltv'] >= 80) & (random_df['purpose'] != 'C')).to_list()",
+    "-random_df['dti']",
+    "600",
+]
+
+
+def _eval(text: str, df: pd.DataFrame) -> np.ndarray:
+    """The original evaluation: eval with the loan table as random_df."""
+    result = np.asarray(eval(text, {}, {'random_df': df}), dtype=float)
+    return np.full(len(df), float(result)) if result.ndim == 0 else result
+
+
+@pytest.mark.parametrize("text", EXPRESSIONS)
+def test_matches_eval(loans_df, text):
+    np.testing.assert_array_equal(compile_expression(text)(ColumnTable(loans_df)), _eval(text, loans_df))
+
+
+def test_config_expressions_match_eval(loans_df, config_df):
+    for text in pd.concat([config_df['a'], config_df['b']]).dropna().unique():
+        np.testing.assert_array_equal(compile_expression(text)(ColumnTable(loans_df)), _eval(text, loans_df))
+
+
+def test_row_subset_matches_eval(existing_df):
+    rows = np.flatnonzero(existing_df['facility_id'] == 1)
+    table = ColumnTable(existing_df).take(rows)
+    text = "((random_df['state']=='CA')*(random_df['orig_amt'])).to_list()"
+    np.testing.assert_array_equal(compile_expression(text)(table), _eval(text, existing_df.iloc[rows]))
+
+
+@pytest.mark.parametrize("text", [
+    "__import__('os').system('true')",
+    "random_df.to_csv('out.csv')",
+    "[1, 2]*len(random_df)",
+    "random_df[random_df.columns[0]]",
+    "[1]*10**10",
+    "(lambda: 1)()",
+])
+def test_rejects_syntax_outside_the_language(loans_df, text):
+    with pytest.raises(ExpressionError):
+        compile_expression(text)(ColumnTable(loans_df))
+
+
+@pytest.mark.parametrize("text", ["[1]*10000000000", "[1]*(len(random_df)+1)", "[1]*-1"])
+def test_rejects_repetition_beyond_the_table(loans_df, text):
+    with pytest.raises(ExpressionError):
+        compile_expression(text)(ColumnTable(loans_df))
+
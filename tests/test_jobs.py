@@ -0,0 +1,108 @@
+# Description: The background job manager with trivial targets in spawned worker processes.
+
+import multiprocessing.util
+import time
+import pytest
+from backend.jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobManager
+
+
+def double(value, progress, publish, stopped):
+    progress("doubling")
+    publish({'half_done': True})
+    return value * 2
+
+
+def fail(progress, publish, stopped):
+    raise ValueError("bad input")
+
+
+def wait_for_stop(progress, publish, stopped):
+    while not stopped():
+        time.sleep(0.05)
+    return "stopped"
+
+
+def sleep(seconds, progress, publish, stopped):
+    time.sleep(seconds)
+
+
+def linger(seconds, progress, publish, stopped):
+    """Returns at once, but the worker only exits `seconds` after its outcome is sent."""
+    # Run at exit after the message queue is flushed (its finalizers have higher priority)
+    multiprocessing.util.Finalize(None, time.sleep, args=(seconds,), exitpriority=-100)
+    return "done"
+
+
+def wait_until(manager, job_id, statuses, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = manager.status(job_id)
+        if status['status'] in statuses:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {manager.status(job_id)['status']}")
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=1, poll_interval=0.05)
+    yield manager
+    for job_id in list(manager.jobs):
+        manager.cancel(job_id)
+
+
+def test_submit_runs_the_target(manager):
+    job_id = manager.submit(double, 21)
+    status = wait_until(manager, job_id, (DONE, FAILED))
+    assert status['status'] == DONE and status['phase'] == "doubling"
+    assert status['partial'] == {'half_done': True}
+    assert manager.result(job_id) == 42
+
+
+def test_failing_target(manager):
+    job_id = manager.submit(fail)
+    status = wait_until(manager, job_id, (DONE, FAILED))
+    assert status['status'] == FAILED and "bad input" in status['error']
+    assert manager.result(job_id) is None
+
+
+def test_unknown_job(manager):
+    assert manager.status("missing")['status'] is None
+    assert not manager.cancel("missing")
+    assert not manager.stop("missing")
+
+
+def test_cancel_queued_and_running_jobs(manager):
+    running = manager.submit(sleep, 60)
+    queued = manager.submit(double, 1)
+    wait_until(manager, running, (RUNNING,))
+    assert manager.status(queued)['status'] == QUEUED
+
+    assert manager.cancel(queued)
+    assert manager.status(queued)['status'] == CANCELLED
+    assert manager.cancel(running)
+    assert manager.status(running)['status'] == CANCELLED
+    assert not manager.cancel(running)
+
+
+def test_stop_returns_the_result(manager):
+    job_id = manager.submit(wait_for_stop)
+    wait_until(manager, job_id, (RUNNING,))
+    assert manager.stop(job_id)
+    wait_until(manager, job_id, (DONE,))
+    assert manager.result(job_id) == "stopped"
+
+
+def test_status_is_not_held_up_while_a_worker_exits(manager):
+    job_id = manager.submit(linger, 2.0)
+    slowest = 0.0
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        start = time.perf_counter()
+        status = manager.status(job_id)['status']
+        slowest = max(slowest, time.perf_counter() - start)
+        if status == DONE:
+            break
+        time.sleep(0.02)
+    assert manager.result(job_id) == "done"
+    assert slowest < 0.5
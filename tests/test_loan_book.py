@@ -0,0 +1,81 @@
+# Description: The columnar LoanBook and the typed tape reader against the pandas rows and Loan
+# objects they replaced.
+
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from backend.covenant_engine import build_compatibility_matrix
+from backend.facility_creation import create_facilities_from_config
+from backend.loan_book import LOAN_COLUMNS, LOAN_FIELDS, LoanBook
+from backend.loan_tape import read_loan_tape
+from backend.models import AssetCovenant, Facility, Loan
+from conftest import sample_path
+
+
+@pytest.fixture
+def book() -> LoanBook:
+    return read_loan_tape(sample_path("subset_1.csv"))
+
+
+def test_numeric_columns_match_pandas(book, loans_df):
+    for field, dtype in LOAN_COLUMNS.items():
+        if dtype != 'str':
+            np.testing.assert_array_equal(np.asarray(book[field], dtype=float), loans_df[field].to_numpy(dtype=float))
+
+
+def test_rows_match_loan_objects(book, loans_df):
+    # Loan objects were built from the values of each pandas row
+    for row, record in enumerate(loans_df.to_dict('records')):
+        loan = Loan(**{field: record[field] for field in LOAN_FIELDS})
+        view = book[row]
+        for field in LOAN_FIELDS:
+            expected = getattr(loan, field)
+            if LOAN_COLUMNS[field] == 'str':
+                # Strings keep leading zeros (LOAN_ID) that pandas drops
+                assert pd.isna(expected) == (getattr(view, field) is None)
+            elif pd.isna(expected):
+                assert np.isnan(getattr(view, field))
+            else:
+                assert getattr(view, field) == expected
+
+
+def test_take_concat_and_frame_round_trip(book):
+    rows = np.array([5, 0, 17])
+    part = book.take(rows)
+    assert [part[i].LOAN_ID for i in range(3)] == [book[i].LOAN_ID for i in rows]
+    both = LoanBook.concat([part, book.take(np.array([1]))])
+    assert len(both) == 4 and both[3].LOAN_ID == book[1].LOAN_ID
+    again = LoanBook.from_frame(book.to_frame())
+    for field in LOAN_FIELDS:
+        np.testing.assert_array_equal(again[field], book[field])
+
+
+def test_zip_3_is_numeric(book, loans_df):
+    assert book['zip_3'].dtype == np.int64
+    np.testing.assert_array_equal(book['zip_3'], loans_df['zip_3'].to_numpy())
+
+
+@pytest.mark.parametrize("op", ['<=', '>=', '==', '!='])
+def test_zip_3_covenant_matches_pandas(book, loans_df, op):
+    # Config values are read as floats, so zip_3 must compare as a number
+    covenants = [AssetCovenant('zip_3', op, 605.0, [], [], []),
+                 AssetCovenant('CSCORE_B', '>=', 700.0, ['zip_3'], [op], [300.0])]
+    facilities = []
+    for j, covenant in enumerate(covenants):
+        facilities.append(Facility(j, 0, 1e9))
+        facilities[-1].add_asset_covenants(covenant)
+    np.testing.assert_array_equal(build_compatibility_matrix(book, facilities).to_dense(),
+                                  build_compatibility_matrix(loans_df, facilities).to_dense())
+
+
+def test_zip_3_config_covenant(book, loans_df):
+    config = pd.read_csv(io.StringIO(
+        "Command,Number,Cost,constr_prop,constr_op,constr_val,crit_prop,crit_op,crit_val,a,b,c,constr_type,constr_op.1,facility_space\n"
+        "facility0.add_asset_covenants,0,100,zip_3,<=,600,,,,,,,,,\n"
+        "facility0.add_pool_covenants,0,100,,,,,,,[1]*len(random_df),random_df['orig_amt'].to_list(),1000000,1,0,1000000\n"
+    ))
+    facilities = list(create_facilities_from_config(config, pd.DataFrame(columns=['facility_id']), book).values())
+    mask = build_compatibility_matrix(book, facilities).to_dense()[:, 0]
+    np.testing.assert_array_equal(mask, (loans_df['zip_3'] <= 600).to_numpy(dtype=float))
+    assert 0 < mask.sum() < len(book)
@@ -0,0 +1,222 @@
+# Description: Optimization modes and the greedy warm start on a small tape.
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import sample_path
+
+pytest.importorskip("gurobipy")
+
+from backend.covenant_engine import build_compatibility_matrix
+from backend.existing_loans_handle import load_existing_loans
+from backend.facility_creation import create_facilities_from_config
+from backend.decomposition import BATCH_ORDERS
+from backend.model_builder import FORMULATIONS, covenant_rows
+from backend.models import Facility, PoolCovenant
+from backend.optimization import optimize_batched, optimize_sequential, preview_relaxation, solve_steps
+from backend.solvers import SolverBackend
+
+
+def _order(steps) -> pd.DataFrame:
+    return pd.DataFrame([{'Order': number, 'Type': kind, 'Input': field}
+                         for number, (kind, field) in enumerate(steps, start=1)])
+
+
+def _sample_problem(tape, config, existing_df):
+    loans_df = pd.read_csv(sample_path(tape))
+    config_df = pd.read_csv(sample_path(config))
+    facilities = list(create_facilities_from_config(config_df, existing_df, loans_df).values())
+    load_existing_loans(facilities, existing_df)
+    order_df = pd.read_csv(sample_path("opt_order.csv"))
+    return loans_df, facilities, build_compatibility_matrix(loans_df, facilities), order_df
+
+
+@pytest.fixture
+def problem(existing_df):
+    return _sample_problem("subset_2.csv", "facilities_dec.csv", existing_df)
+
+
+@pytest.mark.parametrize("mode", ["persistent", "hierarchical"])
+def test_greedy_warm_start_reports_heuristic_gaps(problem, mode):
+    loans_df, facilities, matrix, order_df = problem
+    results = optimize_sequential(loans_df, facilities, matrix, order_df, mode=mode, warm_start='greedy')
+    cold = optimize_sequential(loans_df, facilities, matrix, order_df, mode=mode)
+
+    assert results['objective_values'] == pytest.approx(cold['objective_values'])
+    assert len(results['heuristic_objective_values']) == len(order_df)
+    assert len(results['heuristic_gaps']) == len(order_df)
+    assert all(gap >= 0 for gap in results['heuristic_gaps'])
+
+
+def test_batched_greedy_warm_start(problem):
+    loans_df, facilities, matrix, order_df = problem
+    results = optimize_batched(loans_df, facilities, matrix, order_df, batch_size=50, warm_start='greedy',
+                               lp_bound=False)
+
+    assert len(results['batches']) > 1
+    assert len(results['heuristic_objective_values']) == len(order_df)
+    assert len(results['heuristic_gaps']) == len(order_df)
+
+
+@pytest.mark.parametrize("batch_size", [25, 50])
+@pytest.mark.parametrize("batch_order", BATCH_ORDERS)
+def test_batches_stay_within_the_lp_bound_and_covenant_headroom(problem, batch_size, batch_order):
+    loans_df, facilities, matrix, order_df = problem
+    results = optimize_batched(loans_df, facilities, matrix, order_df, batch_size=batch_size,
+                               batch_order=batch_order)
+
+    assert len(results['batches']) > 1
+    # The first step maximizes orig_amt, which the monolithic LP relaxation bounds from above
+    assert results['objective_values'][0] <= results['lp_bound'] * (1 + 1e-6)
+    assert results['bound_gap'] >= -1e-6
+    # All batches together, on top of the existing loans, stay within every pool covenant
+    pairs = np.asarray(results['assignments'], dtype=np.int64).reshape(-1, 2)
+    assert len(np.unique(pairs[:, 0])) == len(pairs)
+    covenant_matrix, covenant_rhs, _ = covenant_rows(facilities, pairs[:, 0], pairs[:, 1])
+    usage = covenant_matrix @ np.ones(len(pairs))
+    assert np.all(usage <= covenant_rhs + 1e-6 * np.maximum(1.0, np.abs(covenant_rhs)))
+
+
+@pytest.mark.parametrize("tape", ["subset_1.csv", "subset_2.csv"])
+@pytest.mark.parametrize("config", ["facilities_dec.csv", "facilities_nov.csv"])
+def test_formulations_reach_the_same_optimum(existing_df, tape, config):
+    loans_df, facilities, matrix, order_df = _sample_problem(tape, config, existing_df)
+    values = {formulation: optimize_sequential(loans_df, facilities, matrix, order_df, formulation=formulation,
+                                               mip_gap=0.0)['objective_values']
+              for formulation in FORMULATIONS}
+
+    for formulation in FORMULATIONS:
+        np.testing.assert_allclose(values[formulation], values['standard'], rtol=1e-6)
+
+
+@pytest.mark.parametrize("order", [
+    [('Max', 'orig_amt'), ('Min', 'CSCORE_B'), ('Min', 'facility_cost')],
+    [('Max', 'orig_amt'), ('Min', 'facility_cost')],
+    [('Max', 'CSCORE_B'), ('Max', 'orig_amt'), ('Min', 'facility_cost')],
+])
+def test_modes_reach_the_same_objective_values(problem, order):
+    loans_df, facilities, matrix, _ = problem
+    order_df = _order(order)
+    # Solved to optimality, so the default relative gap cannot tell the modes apart
+    values = {mode: optimize_sequential(loans_df, facilities, matrix, order_df, mode=mode,
+                                        mip_gap=0.0)['objective_values']
+              for mode in ("rebuild", "persistent", "hierarchical")}
+
+    assert values["persistent"] == pytest.approx(values["rebuild"])
+    assert values["hierarchical"] == pytest.approx(values["rebuild"])
+
+
+def test_hierarchical_rejects_facility_cost_before_other_steps(problem):
+    loans_df, facilities, matrix, _ = problem
+    order_df = _order([('Min', 'facility_cost'), ('Max', 'orig_amt')])
+    # The sequential modes leave facility_cost unlocked, so the later step still assigns loans
+    rebuild = optimize_sequential(loans_df, facilities, matrix, order_df, mode="rebuild")
+    persistent = optimize_sequential(loans_df, facilities, matrix, order_df, mode="persistent")
+    assert persistent['objective_values'] == pytest.approx(rebuild['objective_values'])
+    assert rebuild['objective_values'][0] == 0.0 and rebuild['objective_values'][1] > 0
+    assert len(persistent['assignments']) > 0
+    with pytest.raises(ValueError, match="facility_cost as the last step"):
+        optimize_sequential(loans_df, facilities, matrix, order_df, mode="hierarchical")
+
+
+@pytest.mark.parametrize("formulation", FORMULATIONS)
+def test_preview_shadow_price_of_a_binding_size_covenant(loans_df, formulation):
+    loans_df = loans_df.head(3).assign(orig_amt=[100.0, 200.0, 300.0])
+    facility = Facility(0, 1000, 250.0)
+    # The size covenant binds; the looser weighted sum keeps 750 of headroom
+    facility.add_pool_covenants(PoolCovenant([1] * 3, loans_df['orig_amt'].to_list(), 250.0, 1, 0))
+    facility.add_pool_covenants(PoolCovenant([1] * 3, loans_df['orig_amt'].to_list(), 1000.0, 1, 0))
+    preview = preview_relaxation(loans_df, [facility], np.ones((3, 1)), _order([('Max', 'orig_amt')]),
+                                 formulation=formulation)
+
+    assert preview['steps'][0]['lp_value'] == pytest.approx(250.0)
+    size, loose = preview['covenants']
+    # Every extra dollar of facility size is one more dollar of orig_amt, whatever the row scaling
+    assert size['shadow_price'] == pytest.approx(1.0) and size['binding']
+    assert size['slack'] == pytest.approx(0.0, abs=1e-6)
+    assert loose['shadow_price'] == 0.0 and not loose['binding']
+    assert loose['slack'] == pytest.approx(750.0)
+
+
+class ScriptedBackend(SolverBackend):
+    """A backend that replays (status, value) per solve and records what the step loop asked of it."""
+    name = 'scripted'
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.locks, self.limits = [], []
+        self.status, self.value = None, None
+
+    def add_lock(self, input_field, value, tolerance):
+        self.locks.append((input_field, value))
+
+    def set_objective(self, objective_type, input_field):
+        pass
+
+    def set_limits(self, time_limit=None, mip_gap=None):
+        self.limits.append(time_limit)
+
+    def optimize(self, incumbent=None, stopped=None):
+        self.status, self.value = self.outcomes.pop(0)
+
+    @property
+    def is_optimal(self):
+        return self.status == 'OPTIMAL'
+
+    @property
+    def has_solution(self):
+        return self.value is not None
+
+    @property
+    def objective_value(self):
+        return self.value
+
+    def assignment_vector(self):
+        return np.array([0 if self.value else -1])
+
+    def stats(self):
+        return {'status': self.status}
+
+
+STEPS = [{'Order': 1, 'Type': 'Max', 'Input': 'orig_amt'},
+         {'Order': 2, 'Type': 'Min', 'Input': 'CSCORE_B'},
+         {'Order': 3, 'Type': 'Min', 'Input': 'facility_cost'}]
+
+
+def test_step_time_limit_is_capped_by_the_run_budget():
+    backend = ScriptedBackend([('OPTIMAL', 10.0), ('OPTIMAL', 5.0), ('OPTIMAL', 1.0)])
+    results, stopped_early, _ = solve_steps(backend, STEPS, step_time_limit=30.0, run_time_limit=3600.0)
+    assert [result['status'] for result in results] == ['OPTIMAL'] * 3
+    assert not stopped_early
+    assert len(backend.limits) == 3 and all(0 < limit <= 30.0 for limit in backend.limits)
+
+    backend = ScriptedBackend([('OPTIMAL', 10.0)] * 3)
+    solve_steps(backend, STEPS, step_time_limit=30.0, run_time_limit=10.0)
+    assert all(limit <= 10.0 for limit in backend.limits)
+
+    # A spent run budget skips every step
+    results, stopped_early, _ = solve_steps(ScriptedBackend([]), STEPS, run_time_limit=0.0)
+    assert results == [] and stopped_early
+
+
+def test_interrupted_step_keeps_its_incumbent_and_the_earlier_steps():
+    backend = ScriptedBackend([('OPTIMAL', 10.0), ('INTERRUPTED', 7.0)])
+    # Stop is requested while the second step runs, which then ends at its incumbent
+    results, stopped_early, _ = solve_steps(backend, STEPS, stopped=lambda: backend.status == 'INTERRUPTED')
+
+    assert stopped_early
+    assert [(result['objective_value'], result['status']) for result in results] == \
+        [(10.0, 'OPTIMAL'), (7.0, 'INTERRUPTED')]
+    # The second step ran under the first one's lock; the third was never started
+    assert backend.locks == [('orig_amt', 10.0)]
+
+
+def test_stopped_run_keeps_the_best_allocation(problem):
+    loans_df, facilities, matrix, order_df = problem
+    incumbents = []
+    results = optimize_sequential(loans_df, facilities, matrix, order_df, incumbent=incumbents.append,
+                                  stopped=lambda: len(incumbents) > 0)
+
+    assert results['stopped_early']
+    assert len(results['objective_values']) == 1 and results['objective_values'][0] > 0
+    assert len(results['assignments']) > 0
@@ -0,0 +1,74 @@
+# Description: The portfolio store keeps every loan once and rejects runs that would repeat one.
+
+import pandas as pd
+import pytest
+from conftest import sample_path
+from backend.metrics import facility_frame
+from backend.pipeline import run_pipeline
+from backend.portfolio import PortfolioStore, duplicate_loan_ids
+
+
+@pytest.fixture
+def store(tmp_path):
+    with PortfolioStore(str(tmp_path / "portfolio.db")) as store:
+        store.reset("config")
+        yield store
+
+
+def test_duplicate_loan_ids():
+    assert duplicate_loan_ids([3, "1", 2, 1, 3, 3]) == ["1", "3"]
+    assert duplicate_loan_ids([]) == []
+
+
+def test_append_run_rejects_repeated_loans(store, existing_df):
+    repeated = pd.concat([existing_df, existing_df.iloc[:2]], ignore_index=True)
+    with pytest.raises(ValueError, match="repeated in the run"):
+        store.append_run(repeated, [])
+    assert store.latest_run() is None
+
+    store.append_run(existing_df, [])
+    with pytest.raises(ValueError, match="already holds"):
+        store.append_run(existing_df.iloc[:1], [])
+    assert store.latest_run() == 1
+    assert len(store.snapshot_frame()) == len(existing_df)
+
+
+def test_pipeline_rejects_repeated_loans_before_optimizing(tmp_path, existing_df):
+    loans = pd.read_csv(sample_path("subset_1.csv"))
+    loans = pd.concat([loans, loans.iloc[:1]], ignore_index=True)
+    loan_path = tmp_path / "loans.csv"
+    loans.to_csv(loan_path, index=False)
+    with pytest.raises(ValueError, match="repeated"):
+        run_pipeline(str(loan_path), sample_path("facilities_dec.csv"), sample_path("opt_order.csv"),
+                     sample_path("combined_data(3).csv"), progress=lambda message: None,
+                     portfolio_path=str(tmp_path / "portfolio.db"))
+
+
+def test_incremental_run_restores_totals_without_reading_the_book(tmp_path, monkeypatch):
+    def run(loans, existing, portfolio=None):
+        return run_pipeline(sample_path(loans), sample_path("facilities_dec.csv"), sample_path("opt_order.csv"),
+                            existing, progress=lambda message: None, portfolio_path=portfolio)
+
+    portfolio = str(tmp_path / "portfolio.db")
+    first = run("subset_1.csv", sample_path("combined_data(3).csv"), portfolio)
+    first["combined_df"].to_csv(tmp_path / "book.csv", index=False)
+
+    def read_book(*args, **kwargs):
+        raise AssertionError("restore read the held loans")
+
+    monkeypatch.setattr(PortfolioStore, "facility_book", read_book)
+    monkeypatch.setattr(PortfolioStore, "snapshot_frame", read_book)
+    incremental = run("subset_2.csv", None, portfolio)
+    monkeypatch.undo()
+    rebuilt = run("subset_2.csv", str(tmp_path / "book.csv"))
+
+    # Only this run's new loans are loaded, yet the facility metrics match a full rebuild
+    assert sum(len(facility.existing_loans) for facility in incremental["facilities"]) == \
+        len(incremental["results"]["assignments"])
+    pd.testing.assert_frame_equal(
+        facility_frame(incremental["loans"], incremental["facilities"], incremental["results"]["assignments"]),
+        facility_frame(rebuilt["loans"], rebuilt["facilities"], rebuilt["results"]["assignments"]))
+    for restored, full in zip(incremental["facilities"], rebuilt["facilities"]):
+        for covenant, expected in zip(restored.pool_covenants, full.pool_covenants):
+            assert covenant.existing_ab == pytest.approx(expected.existing_ab)
+            assert covenant.existing_count == expected.existing_count
@@ -0,0 +1,41 @@
+# Description: Content keys and the LRU eviction of the on-disk result cache.
+
+import os
+from backend.result_cache import ResultCache, content_key
+
+
+def test_content_key():
+    settings = {'mode': 'persistent', 'solver': 'gurobi'}
+    key = content_key([b"loans", b"facilities"], settings)
+    assert content_key([b"loans", b"facilities"], dict(reversed(list(settings.items())))) == key
+    # Moving bytes between files, reordering them or changing a setting is a different key
+    assert content_key([b"loan", b"sfacilities"], settings) != key
+    assert content_key([b"facilities", b"loans"], settings) != key
+    assert content_key([b"loans", b"facilities"], {**settings, 'mode': 'rebuild'}) != key
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert cache.get("missing") is None
+    cache.put("key", {'objective_values': [1.0, 2.0]})
+    assert cache.get("key") == {'objective_values': [1.0, 2.0]}
+    # A damaged entry reads as a miss
+    with open(tmp_path / "broken.pkl", "wb") as f:
+        f.write(b"not a pickle")
+    assert cache.get("broken") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.put("a", b"x" * 1000)
+    entry_size = os.path.getsize(tmp_path / "a.pkl")
+    cache.max_bytes = int(2.5 * entry_size)
+    cache.put("b", b"y" * 1000)
+    os.utime(tmp_path / "a.pkl", (1000, 1000))
+    os.utime(tmp_path / "b.pkl", (2000, 2000))
+
+    # Reading a makes b the least recently used entry, so b goes when c does not fit
+    assert cache.get("a") is not None
+    cache.put("c", b"z" * 1000)
+    assert sorted(os.listdir(tmp_path)) == ["a.pkl", "c.pkl"]
+    assert cache.get("b") is None
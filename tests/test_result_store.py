@@ -0,0 +1,86 @@
+# Description: Run artifacts: Parquet (or CSV) round-trips, streamed CSV downloads and eviction.
+
+import io
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from dash import Dash, html
+from backend import result_store
+from backend.jobs import JobManager
+from backend.result_store import ResultStore
+
+
+@pytest.fixture
+def frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'facility_id': np.arange(7) % 3,
+        'LOAN_ID': [f"L{i}" for i in range(7)],
+        'orig_amt': np.linspace(1e5, 7e5, 7),
+        'CSCORE_C': [700.0, np.nan, 710.0, np.nan, 720.0, 730.0, 740.0],
+    })
+
+
+@pytest.fixture(params=["parquet", "csv"])
+def store(request, tmp_path, monkeypatch) -> ResultStore:
+    if request.param == "csv":
+        monkeypatch.setattr(result_store, "pq", None)
+        monkeypatch.setattr(result_store, "pa", None)
+    else:
+        pytest.importorskip("pyarrow")
+    return ResultStore(str(tmp_path))
+
+
+def test_round_trip(store, frame):
+    key = store.put("run", frame)
+    assert store.exists(key) and not store.exists("other") and not store.exists(None)
+    pd.testing.assert_frame_equal(store.read(key), frame)
+
+
+def test_streamed_csv_matches_the_frame(store, frame):
+    store.put("run", frame)
+    chunks = list(store.iter_csv("run", batch_rows=3))
+    if result_store.pq is not None:
+        assert len(chunks) > 1
+    assert b"".join(chunks).decode() == frame.to_csv(index=False)
+
+    store.put("empty", frame.iloc[:0])
+    assert pd.read_csv(io.BytesIO(b"".join(store.iter_csv("empty")))).columns.tolist() == frame.columns.tolist()
+
+
+def test_expired_and_least_recently_used_artifacts_are_evicted(store, frame, tmp_path):
+    store.put("old", frame)
+    store.put("kept", frame)
+    os.utime(store._path("old"), (1000, 1000))
+    store.ttl_seconds = 3600
+    store.put("new", frame)
+    assert not store.exists("old") and store.exists("kept")
+
+    store.max_bytes = os.path.getsize(store._path("new"))
+    os.utime(store._path("kept"), (os.path.getmtime(store._path("new")) - 10,) * 2)
+    store.put("newest", frame)
+    assert not store.exists("kept") and not store.exists("new") and store.exists("newest")
+
+
+def test_download_route_streams_the_artifact(tmp_path, monkeypatch, frame):
+    from frontend import callback
+
+    store = ResultStore(str(tmp_path))
+    manager = JobManager(max_workers=1)
+    monkeypatch.setattr(callback, "RESULT_STORE", store)
+    monkeypatch.setattr(callback, "get_job_manager", lambda: manager)
+    monkeypatch.setattr(callback, "CALLBACKS_REGISTERED", False)
+    app = Dash(__name__)
+    app.layout = html.Div()
+    callback.register_callbacks(app)
+    client = app.server.test_client()
+
+    job_id = manager.add_finished({'artifact': store.put("run", frame)})
+    response = client.get(f"/download/{job_id}")
+    assert response.status_code == 200
+    assert "combined_data.csv" in response.headers["Content-Disposition"]
+    assert response.data.decode() == frame.to_csv(index=False)
+
+    assert client.get("/download/unknown").status_code == 404
+    evicted = manager.add_finished({'artifact': "evicted"})
+    assert client.get(f"/download/{evicted}").status_code == 404
@@ -0,0 +1,63 @@
+# Description: The HiGHS and Gurobi backends solve the same model to the same objectives.
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import sample_path
+
+pytest.importorskip("gurobipy")
+
+from backend.covenant_engine import build_compatibility_matrix
+from backend.existing_loans_handle import load_existing_loans
+from backend.facility_creation import create_facilities_from_config
+from backend.optimization import GurobiBackend, optimize_sequential
+from backend.solvers import HighsBackend
+from backend.sweep import _base_parameters, apply_overrides
+
+
+def _problem(tape, config, existing_df):
+    loans_df = pd.read_csv(sample_path(tape))
+    facilities = list(create_facilities_from_config(pd.read_csv(sample_path(config)), existing_df,
+                                                    loans_df).values())
+    load_existing_loans(facilities, existing_df)
+    return loans_df, facilities, build_compatibility_matrix(loans_df, facilities)
+
+
+@pytest.mark.parametrize("tape", ["subset_1.csv", "subset_2.csv"])
+@pytest.mark.parametrize("config", ["facilities_dec.csv", "facilities_nov.csv"])
+def test_highs_matches_gurobi(tape, config, existing_df):
+    loans_df, facilities, matrix = _problem(tape, config, existing_df)
+    order_df = pd.read_csv(sample_path("opt_order.csv"))
+    values = {solver: optimize_sequential(loans_df, facilities, matrix, order_df, solver=solver,
+                                          mip_gap=0.0)['objective_values']
+              for solver in ("highs", "gurobi")}
+
+    assert len(values["highs"]) == len(order_df)
+    np.testing.assert_allclose(values["highs"], values["gurobi"], rtol=1e-6)
+
+
+def test_highs_parameter_update_matches_a_fresh_model(existing_df):
+    loans_df, facilities, matrix = _problem("subset_2.csv", "facilities_dec.csv", existing_df)
+    highs = HighsBackend("Updated", loans_df, facilities, matrix, relaxed=True)
+    gurobi = GurobiBackend("Updated", loans_df, facilities, matrix, builder='sparse')
+    # Grow a facility and relax a ratio covenant, which changes coefficients as well as the RHS
+    j, k, ratio = next((j, k, covenant) for j, facility in enumerate(facilities)
+                       for k, covenant in enumerate(facility.pool_covenants) if not covenant.constr_type)
+    apply_overrides(facilities, _base_parameters(facilities), {
+        ('facility_size', 0): facilities[0].facility_size * 1.5,
+        ('covenant_limit', j, k): ratio.c * (0.98 if ratio.constr_op else 1.02),
+    })
+    highs.update_parameters()
+    gurobi.update_parameters()
+
+    fresh = HighsBackend("Fresh", loans_df, facilities, matrix, relaxed=True)
+    for problem in (highs.problem, gurobi.x.problem):
+        np.testing.assert_allclose(problem.covenant_rhs, fresh.problem.covenant_rhs)
+        assert (problem.covenant_matrix != fresh.problem.covenant_matrix).nnz == 0
+
+    for backend in (highs, fresh):
+        backend.set_objective('Max', 'orig_amt')
+        backend.optimize()
+    assert highs.objective_value == pytest.approx(fresh.objective_value)
+    for updated, expected in zip(highs.covenant_sensitivity(), fresh.covenant_sensitivity()):
+        np.testing.assert_allclose(updated, expected, atol=1e-6)
@@ -0,0 +1,41 @@
+# Description: What-if sweeps re-solve one model per worker; every scenario must match a fresh solve.
+
+import copy
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import sample_path
+
+pytest.importorskip("gurobipy")
+
+from backend.covenant_engine import build_compatibility_matrix
+from backend.existing_loans_handle import load_existing_loans
+from backend.facility_creation import create_facilities_from_config
+from backend.optimization import optimize_sequential
+from backend.sweep import _base_parameters, apply_overrides, parameter_grid, run_sweep
+
+
+def test_sweep_matches_fresh_solves(existing_df):
+    loans_df = pd.read_csv(sample_path("subset_2.csv"))
+    facilities = list(create_facilities_from_config(pd.read_csv(sample_path("facilities_dec.csv")),
+                                                    existing_df, loans_df).values())
+    load_existing_loans(facilities, existing_df)
+    matrix = build_compatibility_matrix(loans_df, facilities)
+    order_df = pd.read_csv(sample_path("opt_order.csv"))
+    scenarios = parameter_grid({('facility_size', 0): [facilities[0].facility_size, 6e6],
+                                ('facility_cost', 1): [facilities[1].facility_cost]})
+
+    table = run_sweep(loans_df, facilities, matrix, order_df, scenarios)
+    columns = [f"{kind} {field}" for kind, field in zip(order_df['Type'], order_df['Input'])]
+    swept = table.groupby('scenario').first()
+
+    base = _base_parameters(facilities)
+    for index, overrides in enumerate(scenarios):
+        fresh_facilities = copy.deepcopy(facilities)
+        apply_overrides(fresh_facilities, base, overrides)
+        fresh = optimize_sequential(loans_df, fresh_facilities, matrix, order_df)
+        assert swept.loc[index, 'status'] == 'OPTIMAL'
+        np.testing.assert_allclose(swept.loc[index, columns].to_numpy(dtype=float), fresh['objective_values'],
+                                   rtol=1e-4)
+    # The caller's facilities keep their parameters
+    assert [facility.facility_size for facility in facilities] == [parameters['facility_size'] for parameters in base]
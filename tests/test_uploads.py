@@ -0,0 +1,100 @@
+# Description: Saving dashboard uploads and reading tapes by server path.
+
+import base64
+import gzip
+import os
+import pytest
+from backend.loan_tape import read_loan_tape
+from conftest import sample_path
+from frontend import callback
+
+
+def _data_url(data: bytes) -> str:
+    return "data:application/octet-stream;base64," + base64.b64encode(data).decode()
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(callback, "UPLOAD_DIRECTORY", str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.parametrize("chunk", [4, 10, 4097, 4 * 1024 * 1024])
+def test_chunked_decode_matches_the_upload(uploads, monkeypatch, chunk):
+    monkeypatch.setattr(callback, "DECODE_CHUNK", chunk)
+    with open(sample_path("subset_1.csv"), "rb") as f:
+        data = f.read()
+    path, digest = callback.save_upload("subset_1.csv", _data_url(data))
+
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert os.path.dirname(path) == str(uploads) and path.endswith("-subset_1.csv")
+    # The same content saves to the same file and leaves no temporary files behind
+    assert callback.save_upload("subset_1.csv", _data_url(data)) == (path, digest)
+    assert os.listdir(uploads) == [os.path.basename(path)]
+
+
+def test_invalid_upload_leaves_no_file(uploads, monkeypatch):
+    monkeypatch.setattr(callback, "DECODE_CHUNK", 8)
+    with pytest.raises(ValueError):
+        callback.save_upload("tape.csv", "data:text/csv;base64,bG9hbnM=x")
+    assert os.listdir(uploads) == []
+
+
+def test_compressed_upload_reads_as_the_plain_tape(uploads):
+    with open(sample_path("subset_1.csv"), "rb") as f:
+        data = f.read()
+    path, _ = callback.save_upload("subset_1.csv.gz", _data_url(gzip.compress(data)))
+
+    expected = read_loan_tape(sample_path("subset_1.csv")).to_frame()
+    assert read_loan_tape(path).to_frame().equals(expected)
+
+
+def test_zstd_upload_reads_as_the_plain_tape(uploads):
+    zstandard = pytest.importorskip("zstandard")
+    with open(sample_path("subset_1.csv"), "rb") as f:
+        data = f.read()
+    path, _ = callback.save_upload("subset_1.csv.zst", _data_url(zstandard.ZstdCompressor().compress(data)))
+
+    expected = read_loan_tape(sample_path("subset_1.csv")).to_frame()
+    assert read_loan_tape(path).to_frame().equals(expected)
+
+
+@pytest.fixture
+def ingest_root(tmp_path, monkeypatch):
+    root = tmp_path / "tapes"
+    (root / "2024").mkdir(parents=True)
+    (root / "2024" / "tape.csv").write_text("LOAN_ID\n1\n")
+    (tmp_path / "outside.csv").write_text("LOAN_ID\n2\n")
+    monkeypatch.setattr(callback, "INGEST_ROOT", str(root))
+    return root
+
+
+def test_ingest_path_reads_tapes_under_the_root(ingest_root):
+    path, digest = callback.ingest_path("2024/tape.csv")
+    assert path == os.path.realpath(ingest_root / "2024" / "tape.csv")
+    assert callback.ingest_path(str(ingest_root / "2024" / "tape.csv")) == (path, digest)
+
+    # A changed tape is a different cache key
+    (ingest_root / "2024" / "tape.csv").write_text("LOAN_ID\n1\n3\n")
+    assert callback.ingest_path("2024/tape.csv")[1] != digest
+
+
+@pytest.mark.parametrize("path", ["../outside.csv", "2024/../../outside.csv", "2024", "missing.csv", "outside"])
+def test_ingest_path_rejects_paths_outside_the_root(ingest_root, path):
+    os.symlink(ingest_root.parent / "outside.csv", ingest_root / "outside")
+    with pytest.raises(ValueError, match="under the ingest directory"):
+        callback.ingest_path(path)
+
+
+def test_ingest_path_rejects_absolute_paths_outside_the_root(ingest_root):
+    with pytest.raises(ValueError, match="under the ingest directory"):
+        callback.ingest_path(str(ingest_root.parent / "outside.csv"))
+    with pytest.raises(ValueError, match="under the ingest directory"):
+        callback.ingest_path("/etc/passwd")
+
+
+def test_ingest_path_is_disabled_without_a_root(monkeypatch):
+    monkeypatch.setattr(callback, "INGEST_ROOT", None)
+    with pytest.raises(ValueError, match="disabled"):
+        callback.ingest_path("tape.csv")